@@ -385,7 +385,9 @@ def main():
     try:
         script_dir = os.path.dirname(os.path.abspath(__file__))
         project_root = os.path.abspath(os.path.join(script_dir, '..'))
-        sciezka_modelu = os.path.join(project_root, 'ai', 'gotowe_tabele', 'model.pkl')
+        sciezka_modelu = os.path.join(project_root, 'ai', 'gotowe_tabele', 'model.qtab')
+        if not os.path.exists(sciezka_modelu):
+            sciezka_modelu = os.path.join(project_root, 'ai', 'gotowe_tabele', 'model.pkl')
 
         loguj("🔍 WCZYTYWANIE AGENTA AI:", nowy_akapit=True)
         agent = wczytaj_agenta(sciezka_modelu)
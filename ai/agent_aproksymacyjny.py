@@ -0,0 +1,313 @@
+import os
+import sys
+import time
+import pickle
+import argparse
+from functools import lru_cache
+from datetime import datetime
+from typing import Tuple, Optional, Dict, List
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(current_dir, '..')))
+
+from gra.logika import StanGry
+from gra.linie import indeks_linii
+from ai.agent_q_learning import (AgentQLearning, PulaTreningowa, trenuj_doskonaly_agent, weryfikacja_miedzyetapowa,
+                                 zapisz_atomowo, zapisz_punkt_kontrolny, wczytaj_punkt_kontrolny,
+                                 znajdz_ostatni_punkt_kontrolny, PLIK_PUNKTU_KONTROLNEGO, konfiguruj_logowanie,
+                                 loguj_i_drukuj)
+from ai.replay import BuforPowtorek
+from ai.tabela_q import WspoldzielonaTabelaQ
+from ai.telemetria import Telemetria
+from ai.zbieznosc import MigawkaPolityki
+
+
+def liczba_cech(warunek_wygranej: int) -> int:
+    # Wzorce linii (własne, obce) + waga pozycyjna pola + groźby obu stron w całej pozycji + wyraz wolny
+    return warunek_wygranej * warunek_wygranej + 4
+
+
+@lru_cache(maxsize=None)
+def _macierze_pol(rozmiar_planszy: int, warunek_wygranej: int) -> Tuple[np.ndarray, np.ndarray]:
+    # Incydencja pole x linia oraz liczba linii przez pole względem maksimum
+    linie, _, linie_przez_pole = indeks_linii(rozmiar_planszy, warunek_wygranej)
+    incydencja = np.zeros((rozmiar_planszy * rozmiar_planszy, len(linie)), dtype=np.float32)
+    for pole, ids in enumerate(linie_przez_pole):
+        incydencja[pole, list(ids)] = 1.0
+    pozycyjne = incydencja.sum(axis=1) / max(1.0, float(incydencja.sum(axis=1).max()))
+    incydencja.setflags(write=False)
+    pozycyjne.setflags(write=False)
+    return incydencja, pozycyjne
+
+
+def cechy_akcji(plansze: np.ndarray, rozmiar_planszy: int, warunek_wygranej: int) -> np.ndarray:
+    # Plansze (B x pola) z perspektywy gracza na ruchu: 1 własne, -1 przeciwnika. Wynik (B x pola x cechy):
+    # dla każdego pola histogram wzorców linii przez nie przechodzących, niezależny od symetrii planszy.
+    linie, _, _ = indeks_linii(rozmiar_planszy, warunek_wygranej)
+    incydencja, pozycyjne = _macierze_pol(rozmiar_planszy, warunek_wygranej)
+    wartosci_linii = plansze[:, linie]
+    wlasne = (wartosci_linii == 1).sum(axis=2)
+    obce = (wartosci_linii == -1).sum(axis=2)
+    wzorce = np.minimum(wlasne, warunek_wygranej - 1) * warunek_wygranej + np.minimum(obce, warunek_wygranej - 1)
+    histogramy = incydencja @ np.eye(warunek_wygranej * warunek_wygranej, dtype=np.float32)[wzorce]
+
+    liczba_plansz, liczba_pol = plansze.shape
+    grozby_wlasne = ((wlasne == warunek_wygranej - 1) & (obce == 0)).sum(axis=1)
+    grozby_obce = ((obce == warunek_wygranej - 1) & (wlasne == 0)).sum(axis=1)
+    pozycja = np.empty((liczba_plansz, liczba_pol, 4), dtype=np.float32)
+    pozycja[:, :, 0] = pozycyjne
+    pozycja[:, :, 1] = grozby_wlasne[:, None]
+    pozycja[:, :, 2] = grozby_obce[:, None]
+    pozycja[:, :, 3] = 1.0
+    return np.concatenate([histogramy, pozycja], axis=2)
+
+
+class AproksymatorQ:
+    # Q(s, a) jako funkcja cech pola: model liniowy (ukryte=0) albo sieć z jedną warstwą tanh.
+    # Liczba parametrów zależy tylko od warunku wygranej, więc te same wagi grają na każdym rozmiarze planszy.
+    def __init__(self, warunek_wygranej: int = 3, ukryte: int = 0, ziarno: int = 0):
+        self.warunek_wygranej = warunek_wygranej
+        self.ukryte = ukryte
+        self.generator = np.random.default_rng(ziarno)
+        liczba = liczba_cech(warunek_wygranej)
+        if ukryte:
+            self.parametry = {
+                'W1': self.generator.normal(0.0, 1.0 / np.sqrt(liczba), (liczba, ukryte)).astype(np.float32),
+                'b1': np.zeros(ukryte, dtype=np.float32),
+                'w2': self.generator.normal(0.0, 1.0 / np.sqrt(ukryte), ukryte).astype(np.float32),
+                'b2': np.zeros(1, dtype=np.float32),
+            }
+        else:
+            self.parametry = {'w': np.zeros(liczba, dtype=np.float32)}
+
+    def __len__(self) -> int:
+        return sum(parametr.size for parametr in self.parametry.values())
+
+    @property
+    def nbytes(self) -> int:
+        return sum(parametr.nbytes for parametr in self.parametry.values())
+
+    def ustaw_parametry(self, parametry: Dict[str, np.ndarray]) -> None:
+        self.parametry = {nazwa: np.array(wartosc, dtype=np.float32) for nazwa, wartosc in parametry.items()}
+
+    def _przod(self, cechy: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        if not self.ukryte:
+            return cechy @ self.parametry['w'], None
+        aktywacje = np.tanh(cechy @ self.parametry['W1'] + self.parametry['b1'])
+        return aktywacje @ self.parametry['w2'] + self.parametry['b2'][0], aktywacje
+
+    def wartosci_z_cech(self, cechy: np.ndarray) -> np.ndarray:
+        return self._przod(cechy)[0]
+
+    def wartosci(self, plansze: np.ndarray, rozmiar_planszy: int) -> np.ndarray:
+        return self.wartosci_z_cech(cechy_akcji(plansze, rozmiar_planszy, self.warunek_wygranej))
+
+    def _krok(self, cechy: np.ndarray, cele: np.ndarray, wspolczynnik_uczenia: float) -> None:
+        # Spadek gradientu średniego błędu kwadratowego na minipaczce
+        wyjscie, aktywacje = self._przod(cechy)
+        blad = (wyjscie - cele) / len(cele)
+        if not self.ukryte:
+            self.parametry['w'] -= wspolczynnik_uczenia * (cechy.T @ blad)
+            return
+        blad_ukryty = np.outer(blad, self.parametry['w2']) * (1.0 - aktywacje * aktywacje)
+        self.parametry['w2'] -= wspolczynnik_uczenia * (aktywacje.T @ blad)
+        self.parametry['b2'] -= wspolczynnik_uczenia * blad.sum()
+        self.parametry['W1'] -= wspolczynnik_uczenia * (cechy.T @ blad_ukryty)
+        self.parametry['b1'] -= wspolczynnik_uczenia * blad_ukryty.sum(axis=0)
+
+    def trenuj(self, cechy: np.ndarray, cele: np.ndarray, wspolczynnik_uczenia: float,
+               rozmiar_minipaczki: int = 256, przebiegi: int = 2) -> np.ndarray:
+        # Cele są ustalone przed pierwszym krokiem (jak sieć docelowa); zwraca błędy TD sprzed aktualizacji
+        bledy_td = cele - self.wartosci_z_cech(cechy)
+        for _ in range(przebiegi):
+            kolejnosc = self.generator.permutation(len(cele))
+            for poczatek in range(0, len(cele), rozmiar_minipaczki):
+                indeksy = kolejnosc[poczatek:poczatek + rozmiar_minipaczki]
+                self._krok(cechy[indeksy], cele[indeksy], wspolczynnik_uczenia)
+        return bledy_td.astype(np.float32)
+
+
+class AgentAproksymacyjny(AgentQLearning):
+    # Ten sam interfejs co AgentQLearning, ale tabela_q to aproksymator o stałym rozmiarze.
+    # Klucz stanu to surowa plansza z perspektywy gracza na ruchu; cechy linii są już niezależne od symetrii.
+    def __init__(self, wspolczynnik_uczenia: float = 0.05, wspolczynnik_dyskontujacy: float = 0.95,
+                 wspolczynnik_eksploracji: float = 0.1, rozmiar_planszy: int = 3, warunek_wygranej: int = 3,
+                 ukryte: int = 0, ziarno: int = 0, kroki_zwrotu: int = 1, lambda_sladu: Optional[float] = None):
+        super().__init__(wspolczynnik_uczenia, wspolczynnik_dyskontujacy, wspolczynnik_eksploracji,
+                         normalizacja_koloru=True, kroki_zwrotu=kroki_zwrotu, lambda_sladu=lambda_sladu,
+                         rozmiar_planszy=rozmiar_planszy, warunek_wygranej=warunek_wygranej)
+        self.ukryte = ukryte
+        self.ziarno = ziarno
+        self.tabela_q = AproksymatorQ(warunek_wygranej, ukryte, ziarno)
+        self._plansze_probne = None
+
+    def konfiguracja(self) -> Dict:
+        return {'aproksymacja': True, 'rozmiar_planszy': self.rozmiar_planszy,
+                'warunek_wygranej': self.warunek_wygranej, 'ukryte': self.ukryte, 'ziarno': self.ziarno,
+                'kroki_zwrotu': self.kroki_zwrotu, 'lambda_sladu': self.lambda_sladu}
+
+    def ladunek_dla_workerow(self, wspoldzielona: WspoldzielonaTabelaQ) -> Dict[str, np.ndarray]:
+        # Kilkadziesiąt liczb - kopiowanie jest tańsze niż pamięć współdzielona
+        return {nazwa: parametr.copy() for nazwa, parametr in self.tabela_q.parametry.items()}
+
+    @classmethod
+    def z_ladunku(cls, konfiguracja: Dict, ladunek) -> 'AgentAproksymacyjny':
+        agent = cls(**konfiguracja)
+        agent.tabela_q.ustaw_parametry(ladunek)
+        return agent
+
+    def kanonizuj_stan(self, plansza: np.ndarray, gracz: int) -> Tuple[tuple, int]:
+        return tuple((plansza.ravel() * gracz).tolist()), 0
+
+    def wartosci_q(self, klucz_stanu: tuple, ruchy: List[Tuple[int, int]]) -> List[float]:
+        wartosci = self.tabela_q.wartosci(np.array([klucz_stanu], dtype=np.int8), self.rozmiar_planszy)[0]
+        return wartosci[[rzad * self.rozmiar_planszy + kolumna for rzad, kolumna in ruchy]].tolist()
+
+    def aktualizuj(self, klucz_stanu: tuple, akcja: Tuple[int, int],
+                   nagroda: float, nastepny_klucz_stanu: tuple, zakonczone: bool) -> float:
+        return float(self.aktualizuj_paczki([[(klucz_stanu, akcja, nagroda, nastepny_klucz_stanu, zakonczone)]])[0])
+
+    def aktualizuj_paczki(self, paczki: List, bufor: Optional[BuforPowtorek] = None) -> np.ndarray:
+        self.sprawdz_bufor(bufor)
+        przejscia = [przejscie for paczka in paczki for przejscie in paczka]
+        if not przejscia:
+            return np.zeros(0, dtype=np.float32)
+        stany = np.array([przejscie[0] for przejscie in przejscia], dtype=np.int8)
+        akcje = np.array([rzad * self.rozmiar_planszy + kolumna for _, (rzad, kolumna), _, _, _ in przejscia])
+        nagrody = np.array([przejscie[2] for przejscie in przejscia], dtype=np.float32)
+        nastepne = np.array([przejscie[3] for przejscie in przejscia], dtype=np.int8)
+        zakonczone = np.array([przejscie[4] for przejscie in przejscia], dtype=bool)
+
+        wartosci_nastepnych = np.where(nastepne == 0, self.tabela_q.wartosci(nastepne, self.rozmiar_planszy), -np.inf)
+        maks_nastepnych = wartosci_nastepnych.max(axis=1)
+        maks_nastepnych[~np.isfinite(maks_nastepnych)] = 0.0
+        # Następny stan z nieparzystą liczbą nowych pionów należy do przeciwnika: jego wartość z naszej
+        # perspektywy ma przeciwny znak (negamax), bo klucze są normalizowane do gracza na ruchu
+        znak = np.where((np.count_nonzero(nastepne, axis=1) - np.count_nonzero(stany, axis=1)) % 2 == 1, -1.0, 1.0)
+        cele = np.where(zakonczone, nagrody, nagrody + self.dyskonto_przejsc * znak * maks_nastepnych)
+
+        cechy = cechy_akcji(stany, self.rozmiar_planszy, self.warunek_wygranej)[np.arange(len(akcje)), akcje]
+        return self.tabela_q.trenuj(cechy, cele.astype(np.float32), self.wspolczynnik_uczenia)
+
+    def migawka_polityki(self, liczba_plansz: int = 512) -> MigawkaPolityki:
+        # Aproksymator nie ma listy stanów - polityka porównywana na stałym zbiorze plansz z losowych partii
+        if self._plansze_probne is None:
+            generator = np.random.default_rng(self.ziarno)
+            plansze = []
+            while len(plansze) < liczba_plansz:
+                stan_gry = StanGry(self.rozmiar_planszy, self.warunek_wygranej)
+                for _ in range(generator.integers(self.rozmiar_planszy ** 2)):
+                    ruchy = stan_gry.otrzymaj_mozliwe_ruchy()
+                    stan_gry.wykonaj_ruch(*ruchy[generator.integers(len(ruchy))])
+                    if stan_gry.czy_koniec_gry():
+                        break
+                else:
+                    plansze.append(stan_gry.plansza.ravel() * stan_gry.obecny_gracz)
+            self._plansze_probne = np.array(plansze, dtype=np.int8)
+        plansze = self._plansze_probne
+        return MigawkaPolityki([tuple(plansza) for plansza in plansze.tolist()],
+                               self.tabela_q.wartosci(plansze, self.rozmiar_planszy).astype(np.float32), plansze == 0)
+
+    def liczba_stanow_osiagalnych(self) -> Optional[int]:
+        # Pokrycie nie ma sensu dla modelu bez tabeli stanów
+        return None
+
+    def stan_tabeli(self) -> Dict[str, np.ndarray]:
+        return self.ladunek_dla_workerow(None)
+
+    def wczytaj_stan_tabeli(self, stan: Dict[str, np.ndarray]) -> None:
+        self.tabela_q.ustaw_parametry(stan)
+
+    def dane_modelu(self) -> Dict:
+        return {'approximator': self.ladunek_dla_workerow(None), 'konfiguracja_agenta': self.konfiguracja(),
+                'wspolczynnik_uczenia': self.wspolczynnik_uczenia,
+                'wspolczynnik_dyskontujacy': self.wspolczynnik_dyskontujacy,
+                'liczba_parametrow': len(self.tabela_q)}
+
+    def zaladuj_tabele_q(self, nazwa_pliku: str):
+        try:
+            with open(nazwa_pliku, 'rb') as f:
+                dane = pickle.load(f)
+            if 'approximator' not in dane:
+                print(f"❌ {nazwa_pliku} nie zawiera modelu aproksymacyjnego")
+                return
+            konfiguracja = dane['konfiguracja_agenta']
+            self.rozmiar_planszy = konfiguracja['rozmiar_planszy']
+            self.warunek_wygranej = konfiguracja['warunek_wygranej']
+            self.ukryte, self.ziarno = konfiguracja['ukryte'], konfiguracja['ziarno']
+            self.tabela_q = AproksymatorQ(self.warunek_wygranej, self.ukryte, self.ziarno)
+            self.tabela_q.ustaw_parametry(dane['approximator'])
+            print(f"✅ Załadowano aproksymator Q z {len(self.tabela_q)} parametrami "
+                  f"(plansza {self.rozmiar_planszy}x{self.rozmiar_planszy})")
+            if 'version' in dane:
+                print(f"📦 Wersja modelu: {dane['version']}")
+        except FileNotFoundError:
+            print(f"❌ Nie znaleziono pliku: {nazwa_pliku}")
+        except Exception as e:
+            print(f"❌ Błąd ładowania modelu: {e}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Trenowanie agenta Q z aproksymacją funkcji na cechach linii")
+    parser.add_argument('--rozmiar', type=int, default=3, help="rozmiar planszy")
+    parser.add_argument('--warunek', type=int, default=3, help="liczba pól w linii potrzebna do wygranej")
+    parser.add_argument('--ukryte', type=int, default=0, help="neurony warstwy ukrytej (0 = model liniowy)")
+    parser.add_argument('--wspolczynnik-uczenia', type=float, default=0.05)
+    parser.add_argument('--kroki', type=int, default=1,
+                        help="zwroty n-krokowe po własnych decyzjach gracza (1 = zwykły Q-learning)")
+    parser.add_argument('--lambda', dest='lambda_sladu', type=float, default=None,
+                        help="zwroty lambda (Q(lambda) Penga) zamiast n-krokowych")
+    parser.add_argument('--aktor-uczacy', action='store_true', help="trenuj w trybie aktor-uczący")
+    parser.add_argument('--resume', nargs='?', const='', default=None, metavar='FOLDER',
+                        help="wznów trening z punktu kontrolnego (domyślnie z najnowszego folderu dla tej planszy)")
+    argumenty = parser.parse_args()
+
+    czas_startu = time.time()
+    folder_bazowy = os.path.join(current_dir, 'q_tables',
+                                 f'aproksymacja_{argumenty.rozmiar}x{argumenty.rozmiar}_k{argumenty.warunek}')
+    punkt_startowy = None
+    if argumenty.resume is not None:
+        nazwa_folderu = argumenty.resume or znajdz_ostatni_punkt_kontrolny(folder_bazowy)
+        if not nazwa_folderu or not os.path.exists(os.path.join(nazwa_folderu, PLIK_PUNKTU_KONTROLNEGO)):
+            print("❌ Nie znaleziono punktu kontrolnego do wznowienia")
+            sys.exit(1)
+        agent, punkt_startowy = wczytaj_punkt_kontrolny(nazwa_folderu)
+        logger = konfiguruj_logowanie(nazwa_folderu, dopisz=True)
+        loguj_i_drukuj(logger, f"Wznowiono z punktu kontrolnego (faza {punkt_startowy['faza']}, "
+                               f"iteracja {punkt_startowy['iteracja']})")
+    else:
+        nazwa_folderu, licznik = folder_bazowy, 1
+        while os.path.exists(nazwa_folderu):
+            nazwa_folderu = f"{folder_bazowy}_{licznik}"
+            licznik += 1
+        os.makedirs(nazwa_folderu, exist_ok=True)
+        logger = konfiguruj_logowanie(nazwa_folderu)
+        agent = AgentAproksymacyjny(wspolczynnik_uczenia=argumenty.wspolczynnik_uczenia,
+                                    rozmiar_planszy=argumenty.rozmiar, warunek_wygranej=argumenty.warunek,
+                                    ukryte=argumenty.ukryte, kroki_zwrotu=argumenty.kroki,
+                                    lambda_sladu=argumenty.lambda_sladu)
+    loguj_i_drukuj(logger, f"Trenowanie aproksymacji Q na planszy {agent.rozmiar_planszy}x{agent.rozmiar_planszy} "
+                           f"(warunek {agent.warunek_wygranej}, {len(agent.tabela_q)} parametrów)")
+    loguj_i_drukuj(logger, f"Folder trenowania: {nazwa_folderu}")
+
+    plik_modelu = os.path.join(nazwa_folderu, 'model.pkl')
+    pozycja = (punkt_startowy['faza'], punkt_startowy['iteracja']) if punkt_startowy else (1, 0)
+    punkt_kontrolny = lambda faza, iteracja: zapisz_punkt_kontrolny(nazwa_folderu, agent, faza, iteracja,
+                                                                    numer_zadania=pula.numer_zadania)
+
+    with PulaTreningowa(telemetria=Telemetria(nazwa_folderu, dopisz=punkt_startowy is not None),
+                        rozmiar_planszy=agent.rozmiar_planszy, warunek_wygranej=agent.warunek_wygranej) as pula:
+        if punkt_startowy:
+            pula.numer_zadania = punkt_startowy.get('numer_zadania', 0)
+        agent = trenuj_doskonaly_agent(logger, agent, pula=pula, tryb_aktor_uczacy=argumenty.aktor_uczacy,
+                                       pozycja=pozycja, punkt_kontrolny=punkt_kontrolny)
+        wyniki_weryfikacji = weryfikacja_miedzyetapowa(logger, agent, 500, pula=pula)
+
+    czy_doskonaly = wyniki_weryfikacji['perfect_vs_easy'] and wyniki_weryfikacji['perfect_vs_minimax']
+    zapisz_atomowo(plik_modelu, dict(agent.dane_modelu(), version='14.0-function-approximation',
+                                     training_method='3-phase-q-learning-curriculum-approximation',
+                                     is_perfect=czy_doskonaly, timestamp=datetime.now().isoformat()))
+    loguj_i_drukuj(logger, f"\nModel zapisany do {plik_modelu} ({os.path.getsize(plik_modelu) / 1024:.1f} KB)")
+    loguj_i_drukuj(logger, f"Łączny czas: {(time.time() - czas_startu) / 60:.1f} minut.")
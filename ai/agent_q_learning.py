@@ -5,9 +5,10 @@ import pickle
 import random
 import numpy as np
 import logging
-from typing import Tuple, Optional, Dict, List
+import argparse
+from typing import Tuple, Optional, Dict, List, Callable, NamedTuple
 from collections import defaultdict
-from multiprocessing import Pool, cpu_count
+from multiprocessing import Pool, Manager, cpu_count
 from datetime import datetime
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -15,26 +16,36 @@ project_root = os.path.abspath(os.path.join(current_dir, '..', '..'))
 sys.path.insert(0, project_root)
 
 from gra.logika import StanGry
+from gra.linie import pole_wygranej_lub_bloku
 from ai.minimax import znajdz_najlepszy_ruch
 from ai.reguly import znajdz_najlepszy_ruch as reguly_najlepszy_ruch
 from ai.mcts import znajdz_najlepszy_ruch as mcts_najlepszy_ruch
+from ai.tabela_q import GestaTabelaQ, WspoldzielonaTabelaQ, OpisPamieciQ, wylicz_klucze_osiagalne
+from ai.model_binarny import (TabelaQMapowana, czy_model_binarny, zapisz_model_binarny,
+                              ROZSZERZENIE as ROZSZERZENIE_MODELU)
+from ai.replay import BuforPowtorek
+from ai.tabele_przeciwnikow import tabela_przeciwnika, RODZAJE_PRZECIWNIKOW
+from ai.symetrie import kanonizuj, ruch_do_kanonicznego, ruch_z_kanonicznego
+from ai.telemetria import Telemetria, rozmiar_serializacji, pamiec_tabeli, pomiary_workerow
+from ai.zbieznosc import MigawkaPolityki, KryteriumZbieznosci, migawka_z_tabeli, sygnaly_zbieznosci
 
 
-def konfiguruj_logowanie(folder_logow: str):
+def konfiguruj_logowanie(folder_logow: str, dopisz: bool = False, konsola: bool = True):
     plik_logow = os.path.join(folder_logow, 'training.log')
     logger = logging.getLogger('training')
     logger.setLevel(logging.INFO)
     logger.handlers.clear()
     formatowanie_pliku = logging.Formatter('%(asctime)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
     formatowanie_konsoli = logging.Formatter('%(message)s')
-    obsluga_pliku = logging.FileHandler(plik_logow, encoding='utf-8', mode='w')
+    obsluga_pliku = logging.FileHandler(plik_logow, encoding='utf-8', mode='a' if dopisz else 'w')
     obsluga_pliku.setLevel(logging.INFO)
     obsluga_pliku.setFormatter(formatowanie_pliku)
     obsluga_konsoli = logging.StreamHandler(sys.stdout)
     obsluga_konsoli.setLevel(logging.INFO)
     obsluga_konsoli.setFormatter(formatowanie_konsoli)
     logger.addHandler(obsluga_pliku)
-    logger.addHandler(obsluga_konsoli)
+    if konsola:
+        logger.addHandler(obsluga_konsoli)
     return logger
 
 
@@ -42,66 +53,135 @@ def loguj_i_drukuj(logger, wiadomosc):
     logger.info(wiadomosc)
 
 
-def smart_random_ruch(stan_gry: StanGry) -> Optional[Tuple[int, int]]:
+def smart_random_ruch(stan_gry: StanGry, generator: random.Random = random) -> Optional[Tuple[int, int]]:
     mozliwe_ruchy = stan_gry.otrzymaj_mozliwe_ruchy()
     if not mozliwe_ruchy:
         return None
-    srodek = (1, 1)
-    rogi = [(0, 0), (0, 2), (2, 0), (2, 2)]
+    rozmiar_planszy = stan_gry.rozmiar_planszy
+    srodek = (rozmiar_planszy // 2, rozmiar_planszy // 2)
+    ostatni = rozmiar_planszy - 1
+    rogi = [(0, 0), (0, ostatni), (ostatni, 0), (ostatni, ostatni)]
     if srodek in mozliwe_ruchy:
         return srodek
     dostepne_rogi = [r for r in rogi if r in mozliwe_ruchy]
     if dostepne_rogi:
-        return random.choice(dostepne_rogi)
-    return random.choice(mozliwe_ruchy)
+        return generator.choice(dostepne_rogi)
+    return generator.choice(mozliwe_ruchy)
+
+
+# Ruchy o wartości Q w tej odległości od najlepszej są traktowane jako remis
+TOLERANCJA_REMISU = 0.0001
+
+
+class Harmonogram(NamedTuple):
+    # Parametry programu nauczania; domyślne wartości to harmonogram, z którym trenowane są gotowe modele
+    gier_na_iteracje: int = 5_000
+    iteracje_fazy1: int = 20
+    epsilon_fazy1: float = 0.9
+    iteracje_fazy2: int = 40
+    # Faza 2: do granic[0] smart_random, do granic[1] self-play, dalej na przemian reguły, minimax, self-play
+    granice_fazy2: Tuple[int, int] = (10, 25)
+    # Epsilony: smart_random, wczesny self-play, reguły, minimax, późny self-play
+    epsilony_fazy2: Tuple[float, float, float, float, float] = (0.3, 0.25, 0.15, 0.1, 0.2)
+    iteracje_fazy3: int = 10
+    epsilon_fazy3: float = 0.05
+    wspolczynnik_uczenia_fazy3: float = 0.1
+    gier_weryfikacji: int = 500
 
 
 class AgentQLearning:
     def __init__(self, wspolczynnik_uczenia: float = 0.3, wspolczynnik_dyskontujacy: float = 0.95,
-                 wspolczynnik_eksploracji: float = 0.1):
+                 wspolczynnik_eksploracji: float = 0.1, gesta_tabela: bool = False,
+                 rownowaznosc_symetrii: bool = False, normalizacja_koloru: bool = False, kroki_zwrotu: int = 1,
+                 lambda_sladu: Optional[float] = None, rozmiar_planszy: int = 3, warunek_wygranej: int = 3):
         self.wspolczynnik_uczenia = wspolczynnik_uczenia
         self.wspolczynnik_dyskontujacy = wspolczynnik_dyskontujacy
         self.epsilon = wspolczynnik_eksploracji
-        self.tabela_q = defaultdict(float)
-
-    def pobierz_klucz_stanu(self, plansza: np.ndarray) -> tuple:
-        symetrie = []
-        tymczasowa = plansza
-        for _ in range(4):
-            symetrie.append(tuple(tymczasowa.flatten()))
-            tymczasowa = np.rot90(tymczasowa)
-        tymczasowa = np.fliplr(plansza)
-        for _ in range(4):
-            symetrie.append(tuple(tymczasowa.flatten()))
-            tymczasowa = np.rot90(tymczasowa)
-        return min(symetrie)
+        self.gesta_tabela = gesta_tabela
+        # Z równoważnością symetrii akcje w tabeli Q są zapisane w układzie planszy kanonicznej,
+        # bez niej (stare modele) - w układzie oryginalnej planszy
+        self.rownowaznosc_symetrii = rownowaznosc_symetrii
+        self.normalizacja_koloru = normalizacja_koloru
+        # Zwroty n-krokowe albo lambda po własnych decyzjach gracza; kroki_zwrotu=1 bez lambdy to zwykły Q-learning
+        self.kroki_zwrotu = kroki_zwrotu
+        self.lambda_sladu = lambda_sladu
+        self.rozmiar_planszy = rozmiar_planszy
+        self.warunek_wygranej = warunek_wygranej
+        self._liczba_stanow_osiagalnych = None
+        if gesta_tabela:
+            self.tabela_q = GestaTabelaQ.dla_stanow_osiagalnych(self.pobierz_klucz_stanu, rozmiar_planszy,
+                                                                warunek_wygranej)
+        else:
+            self.tabela_q = defaultdict(float)
+
+    def konfiguracja(self) -> Dict:
+        return {'rownowaznosc_symetrii': self.rownowaznosc_symetrii, 'normalizacja_koloru': self.normalizacja_koloru,
+                'kroki_zwrotu': self.kroki_zwrotu, 'lambda_sladu': self.lambda_sladu,
+                'rozmiar_planszy': self.rozmiar_planszy, 'warunek_wygranej': self.warunek_wygranej}
+
+    @property
+    def zwroty_wielokrokowe(self) -> bool:
+        return self.kroki_zwrotu > 1 or self.lambda_sladu is not None
+
+    @property
+    def dyskonto_przejsc(self) -> float:
+        # Przejście n-krokowe kończy się n decyzji dalej, więc wartość następnego stanu dyskontowana jest gamma^n
+        return self.wspolczynnik_dyskontujacy ** self.kroki_zwrotu if self.zwroty_wielokrokowe \
+            else self.wspolczynnik_dyskontujacy
+
+    def ladunek_dla_workerow(self, wspoldzielona: WspoldzielonaTabelaQ):
+        # Gęsta tabela trafia do workerów przez pamięć współdzieloną (sam opis), słownik nadal jest kopiowany
+        if isinstance(self.tabela_q, GestaTabelaQ):
+            return wspoldzielona.opublikuj(self.tabela_q)
+        return dict(self.tabela_q)
+
+    def stan_tabeli(self):
+        # Zawartość funkcji Q zapisywana w punkcie kontrolnym
+        return dict(self.tabela_q)
+
+    def wczytaj_stan_tabeli(self, stan) -> None:
+        for klucz_i_ruch, wartosc in stan.items():
+            self.tabela_q[klucz_i_ruch] = wartosc
+
+    def sprawdz_bufor(self, bufor: Optional[BuforPowtorek]) -> None:
+        # Bufor trzyma numery wierszy gęstej tabeli Q, a cele przejść muszą dać się policzyć ponownie
+        if bufor is None:
+            return
+        if not isinstance(self.tabela_q, GestaTabelaQ):
+            raise ValueError("Bufor powtórek wymaga gęstej tabeli Q (gesta_tabela=True)")
+        if self.zwroty_wielokrokowe:
+            # Cele n-krokowe i lambda liczone są w workerze z ówczesnej tabeli - powtórzone byłyby nieaktualne
+            raise ValueError("Bufor powtórek wymaga jednokrokowego Q-learningu (kroki_zwrotu=1, bez lambda_sladu)")
+
+    @classmethod
+    def z_ladunku(cls, konfiguracja: Dict, ladunek) -> 'AgentQLearning':
+        agent = cls(**konfiguracja)
+        agent.tabela_q = _tabela_workera(ladunek)
+        return agent
+
+    # Gracz na ruchu jest wymagany: z normalizacją koloru klucz to plansza z jego perspektywy
+    def kanonizuj_stan(self, plansza: np.ndarray, gracz: int) -> Tuple[tuple, int]:
+        return kanonizuj(plansza, gracz if self.normalizacja_koloru else None)
+
+    def pobierz_klucz_stanu(self, plansza: np.ndarray, gracz: int) -> tuple:
+        return self.kanonizuj_stan(plansza, gracz)[0]
+
+    def akcja_do_klucza(self, ruch: Tuple[int, int], transformacja: int) -> Tuple[int, int]:
+        if not self.rownowaznosc_symetrii:
+            return ruch
+        return ruch_do_kanonicznego(ruch, transformacja, self.rozmiar_planszy)
+
+    def akcja_z_klucza(self, ruch: Tuple[int, int], transformacja: int) -> Tuple[int, int]:
+        if not self.rownowaznosc_symetrii:
+            return ruch
+        return ruch_z_kanonicznego(ruch, transformacja, self.rozmiar_planszy)
 
     def wygrana_lub_blok(self, stan_gry: StanGry) -> Optional[Tuple[int, int]]:
-        prawidlowe_ruchy = stan_gry.otrzymaj_mozliwe_ruchy()
-        obecny_gracz = stan_gry.obecny_gracz
-        for ruch in prawidlowe_ruchy:
-            testowa_plansza = stan_gry.plansza.copy()
-            testowa_plansza[ruch[0], ruch[1]] = obecny_gracz
-            rzad, kolumna = ruch
-            if (np.all(testowa_plansza[rzad, :] == obecny_gracz) or
-                    np.all(testowa_plansza[:, kolumna] == obecny_gracz) or
-                    (rzad == kolumna and np.all(np.diag(testowa_plansza) == obecny_gracz)) or
-                    (rzad + kolumna == 2 and np.all(np.diag(np.fliplr(testowa_plansza)) == obecny_gracz))):
-                return ruch
-        przeciwnik = -obecny_gracz
-        for ruch in prawidlowe_ruchy:
-            testowa_plansza = stan_gry.plansza.copy()
-            testowa_plansza[ruch[0], ruch[1]] = przeciwnik
-            rzad, kolumna = ruch
-            if (np.all(testowa_plansza[rzad, :] == przeciwnik) or
-                    np.all(testowa_plansza[:, kolumna] == przeciwnik) or
-                    (rzad == kolumna and np.all(np.diag(testowa_plansza) == przeciwnik)) or
-                    (rzad + kolumna == 2 and np.all(np.diag(np.fliplr(testowa_plansza)) == przeciwnik))):
-                return ruch
-        return None
+        pole = pole_wygranej_lub_bloku(stan_gry.plansza, stan_gry.obecny_gracz, self.warunek_wygranej)
+        return None if pole is None else divmod(pole, self.rozmiar_planszy)
 
     def wybierz_akcje(self, stan_gry: StanGry, epsilon: float = 0.0, uzyj_heurystyk: bool = True,
-                      uzyj_reguly: bool = False) -> Optional[
+                      uzyj_reguly: bool = False, generator: random.Random = random) -> Optional[
         Tuple[int, int]]:
         if uzyj_reguly:
             ruch_z_regul = reguly_najlepszy_ruch(stan_gry)
@@ -114,35 +194,118 @@ class AgentQLearning:
         mozliwe_ruchy = stan_gry.otrzymaj_mozliwe_ruchy()
         if not mozliwe_ruchy:
             return None
-        if random.random() < epsilon:
-            return random.choice(mozliwe_ruchy)
-        klucz_stanu = self.pobierz_klucz_stanu(stan_gry.plansza)
-        wartosci_q = [(ruch, self.tabela_q.get((klucz_stanu, ruch), 0.0)) for ruch in mozliwe_ruchy]
+        if generator.random() < epsilon:
+            return generator.choice(mozliwe_ruchy)
+        return generator.choice(self.najlepsze_ruchy(stan_gry, mozliwe_ruchy))
+
+    def najlepsze_ruchy(self, stan_gry: StanGry,
+                        mozliwe_ruchy: Optional[List[Tuple[int, int]]] = None) -> List[Tuple[int, int]]:
+        # Ruchy zachłanne według tabeli Q; remisy w granicy TOLERANCJA_REMISU rozstrzyga losowanie
+        mozliwe_ruchy = mozliwe_ruchy or stan_gry.otrzymaj_mozliwe_ruchy()
+        klucz_stanu, transformacja = self.kanonizuj_stan(stan_gry.plansza, stan_gry.obecny_gracz)
+        akcje_klucza = [self.akcja_do_klucza(ruch, transformacja) for ruch in mozliwe_ruchy]
+        wartosci_q = list(zip(mozliwe_ruchy, self.wartosci_q(klucz_stanu, akcje_klucza)))
         najlepsza_wartosc = max(wartosci_q, key=lambda x: x[1])[1]
-        najlepsze_ruchy = [ruch for ruch, q in wartosci_q if q >= najlepsza_wartosc - 0.0001]
-        return random.choice(najlepsze_ruchy)
+        return [ruch for ruch, q in wartosci_q if q >= najlepsza_wartosc - TOLERANCJA_REMISU]
+
+    def wartosci_q(self, klucz_stanu: tuple, ruchy: List[Tuple[int, int]]) -> List[float]:
+        if isinstance(self.tabela_q, (GestaTabelaQ, TabelaQMapowana)):
+            wiersz = self.tabela_q.wiersz(klucz_stanu)
+            if wiersz is None:
+                return [0.0] * len(ruchy)
+            return wiersz[[self.tabela_q.indeks_akcji(ruch) for ruch in ruchy]].tolist()
+        return [self.tabela_q.get((klucz_stanu, ruch), 0.0) for ruch in ruchy]
+
+    def maks_q(self, klucz_stanu: tuple) -> float:
+        ruchy = [divmod(pole, self.rozmiar_planszy) for pole, wartosc in enumerate(klucz_stanu) if wartosc == 0]
+        return max(self.wartosci_q(klucz_stanu, ruchy)) if ruchy else 0.0
 
     def aktualizuj(self, klucz_stanu: tuple, akcja: Tuple[int, int],
-                   nagroda: float, nastepny_klucz_stanu: tuple, zakonczone: bool):
+                   nagroda: float, nastepny_klucz_stanu: tuple, zakonczone: bool) -> float:
         obecne_q = self.tabela_q.get((klucz_stanu, akcja), 0.0)
         if zakonczone:
             cel = nagroda
+        elif isinstance(self.tabela_q, GestaTabelaQ):
+            wiersz = self.tabela_q.wiersz(nastepny_klucz_stanu)
+            legalne = np.array(nastepny_klucz_stanu) == 0
+            nastepne_max = float(wiersz[legalne].max()) if wiersz is not None and legalne.any() else 0.0
+            cel = nagroda + self.dyskonto_przejsc * nastepne_max
         else:
-            tymczasowa_plansza = np.array(nastepny_klucz_stanu).reshape(3, 3)
+            tymczasowa_plansza = np.array(nastepny_klucz_stanu).reshape(self.rozmiar_planszy, self.rozmiar_planszy)
             mozliwe_nastepne_akcje = [
-                (r, k) for r in range(3) for k in range(3) if tymczasowa_plansza[r, k] == 0
+                (r, k) for r in range(self.rozmiar_planszy) for k in range(self.rozmiar_planszy)
+                if tymczasowa_plansza[r, k] == 0
             ]
             nastepne_max = max([self.tabela_q.get((nastepny_klucz_stanu, a), 0.0) for a in
                                 mozliwe_nastepne_akcje]) if mozliwe_nastepne_akcje else 0.0
-            cel = nagroda + self.wspolczynnik_dyskontujacy * nastepne_max
+            cel = nagroda + self.dyskonto_przejsc * nastepne_max
         self.tabela_q[(klucz_stanu, akcja)] = obecne_q + self.wspolczynnik_uczenia * (cel - obecne_q)
+        return cel - obecne_q
+
+    def aktualizuj_paczki(self, paczki: List, bufor: Optional[BuforPowtorek] = None) -> np.ndarray:
+        # Paczki z workerów: zakodowane tablice (gęsta tabela) albo listy krotek dla aktualizuj; zwraca błędy TD.
+        # Z buforem przejścia trafiają do niego z priorytetem równym świeżemu błędowi TD.
+        self.sprawdz_bufor(bufor)
+        if not isinstance(self.tabela_q, GestaTabelaQ):
+            return np.array([self.aktualizuj(*przejscie) for paczka in paczki for przejscie in paczka],
+                            dtype=np.float32)
+        przejscia = self.tabela_q.scal_paczki(
+            [paczka if isinstance(paczka, dict) else self.tabela_q.koduj_przejscia(paczka) for paczka in paczki])
+        bledy_td = self.tabela_q.aktualizuj_wsadowo(**przejscia, wspolczynnik_uczenia=self.wspolczynnik_uczenia,
+                                                    wspolczynnik_dyskontujacy=self.dyskonto_przejsc)
+        if bufor is not None:
+            bufor.dodaj(przejscia, bledy_td)
+        return bledy_td
+
+    def powtorz_z_bufora(self, bufor: BuforPowtorek, przebiegi: int, rozmiar_probki: int = 4096,
+                         beta: float = 0.4) -> np.ndarray:
+        self.sprawdz_bufor(bufor)
+        bledy_td = []
+        for _ in range(przebiegi if len(bufor) else 0):
+            indeksy, probka = bufor.probkuj(rozmiar_probki, beta)
+            bledy = self.tabela_q.aktualizuj_wsadowo(**probka, wspolczynnik_uczenia=self.wspolczynnik_uczenia,
+                                                     wspolczynnik_dyskontujacy=self.dyskonto_przejsc)
+            bufor.aktualizuj_priorytety(indeksy, bledy)
+            bledy_td.append(bledy)
+        return np.concatenate(bledy_td) if bledy_td else np.zeros(0, dtype=np.float32)
+
+    def migawka_polityki(self) -> MigawkaPolityki:
+        tabela = self.tabela_q
+        if not isinstance(tabela, GestaTabelaQ):
+            tabela = GestaTabelaQ.z_dict(tabela, self.rozmiar_planszy)
+        liczba_stanow = tabela.liczba_stanow
+        return migawka_z_tabeli(tabela.klucze, tabela.wartosci[:liczba_stanow], tabela.zapisane[:liczba_stanow],
+                                tabela.legalne[:liczba_stanow])
+
+    def liczba_stanow_osiagalnych(self) -> Optional[int]:
+        # Mianownik pokrycia: wszystkie klucze, które agent może zobaczyć (liczone raz)
+        if self._liczba_stanow_osiagalnych is None:
+            self._liczba_stanow_osiagalnych = len(wylicz_klucze_osiagalne(
+                self.pobierz_klucz_stanu, self.rozmiar_planszy, self.warunek_wygranej))
+        return self._liczba_stanow_osiagalnych
 
     def zaladuj_tabele_q(self, nazwa_pliku: str):
         try:
-            with open(nazwa_pliku, 'rb') as f:
-                dane = pickle.load(f)
+            if czy_model_binarny(nazwa_pliku):
+                # Format binarny: do trenowania kopiowany do gęstej tabeli, do gry czytany leniwie z dysku
+                tabela_mapowana = TabelaQMapowana(nazwa_pliku)
+                dane = dict(tabela_mapowana.metadane, q_table=tabela_mapowana)
+            else:
+                with open(nazwa_pliku, 'rb') as f:
+                    dane = pickle.load(f)
             if 'q_table' in dane:
-                self.tabela_q = defaultdict(float, dane['q_table'])
+                self.rownowaznosc_symetrii = dane.get('symmetry_equivariant', False)
+                self.normalizacja_koloru = dane.get('colour_normalized', False)
+                # Modele bez metadanych rozmiaru pochodzą z czasów, gdy tabela Q obsługiwała tylko 3x3
+                self.rozmiar_planszy = dane.get('rozmiar_planszy', 3)
+                self.warunek_wygranej = dane.get('warunek_wygranej', 3)
+                self._liczba_stanow_osiagalnych = None
+                if self.gesta_tabela:
+                    self.tabela_q = GestaTabelaQ.z_dict(dane['q_table'], self.rozmiar_planszy)
+                elif isinstance(dane['q_table'], TabelaQMapowana):
+                    self.tabela_q = dane['q_table']
+                else:
+                    self.tabela_q = defaultdict(float, dane['q_table'])
                 print(f"✅ Załadowano Q-table z {len(self.tabela_q)} wpisami")
             if 'version' in dane:
                 print(f"📦 Wersja modelu: {dane['version']}")
@@ -181,46 +344,127 @@ class AgentQLearning:
         self.wspolczynnik_dyskontujacy = value
 
 
+# Widoki dołączonych bloków pamięci współdzielonej w workerze: nazwa bloku -> (opis, widok)
+_STAN_WORKERA: Dict[str, Tuple[OpisPamieciQ, GestaTabelaQ]] = {}
+
+
+def generator_zadania(ziarno: Optional[Tuple[int, ...]], id_workera: int) -> random.Random:
+    # Procesy z fork dziedziczą stan globalnego generatora rodzica, więc każde zadanie dostaje własny.
+    # Z ziarnem przebiegu strumień zależy tylko od (ziarno, numer zadania, id workera), bez niego od entropii systemu.
+    sekwencja = np.random.SeedSequence(None if ziarno is None else [*ziarno, id_workera])
+    return random.Random(int.from_bytes(sekwencja.generate_state(4).tobytes(), 'little'))
+
+
+def _tabela_workera(tabela_q_agenta):
+    if isinstance(tabela_q_agenta, GestaTabelaQ):
+        return tabela_q_agenta
+    if not isinstance(tabela_q_agenta, OpisPamieciQ):
+        return defaultdict(float, tabela_q_agenta)
+    # Uczący nadpisuje wartości w tym samym bloku, więc widok wystarczy odświeżyć tylko po zmianie bloku lub stanów.
+    # Pamiętane są dwa bloki - tyle, ile naprzemiennie publikuje tryb aktor-uczący.
+    opis, tabela = _STAN_WORKERA.pop(tabela_q_agenta.nazwa, (None, None))
+    if opis != tabela_q_agenta:
+        tabela = GestaTabelaQ.z_pamieci_wspoldzielonej(tabela_q_agenta)
+    if len(_STAN_WORKERA) >= 2:
+        del _STAN_WORKERA[next(iter(_STAN_WORKERA))]
+    _STAN_WORKERA[tabela_q_agenta.nazwa] = (tabela_q_agenta, tabela)
+    return tabela
+
+
+def agent_z_ladunku(konfiguracja_agenta: Dict, ladunek) -> AgentQLearning:
+    konfiguracja_agenta = dict(konfiguracja_agenta)
+    if konfiguracja_agenta.pop('aproksymacja', False):
+        # Import w funkcji: moduł aproksymacji sam importuje ten moduł
+        from ai.agent_aproksymacyjny import AgentAproksymacyjny
+        return AgentAproksymacyjny.z_ladunku(konfiguracja_agenta, ladunek)
+    return AgentQLearning.z_ladunku(konfiguracja_agenta, ladunek)
+
+
+def przejscia_wielokrokowe(agent: AgentQLearning, historia: List[Dict], zwyciezca: int,
+                           gracze: Tuple[int, ...]) -> List[tuple]:
+    # Każdy gracz uczy się na własnej sekwencji decyzji: następny stan to jego kolejna decyzja, a ostatnia
+    # decyzja dostaje nagrodę końcową także wtedy, gdy partię zakończył ruch przeciwnika.
+    # n kroków: (s_t, a_t, 0, s_t+n, False) bootstrapowane gamma^n przez uczącego, albo zdyskontowana nagroda
+    # końcowa, gdy sekwencja kończy się wcześniej - nagroda dociera do otwarcia w jednym przebiegu.
+    # Lambda (Peng): zwrot G_t = gamma * ((1 - lambda) * max Q(s_t+1) + lambda * G_t+1) liczony tabelą workera
+    # i przesyłany jako gotowy cel (przejście końcowe).
+    przejscia = []
+    gamma = agent.wspolczynnik_dyskontujacy
+    for gracz in gracze:
+        decyzje = [dane_ruchu for dane_ruchu in historia if dane_ruchu['player'] == gracz]
+        if not decyzje:
+            continue
+        nagroda = 0.0 if zwyciezca == 0 else 1.0 if zwyciezca == gracz else -1.0
+        ostatnia = len(decyzje) - 1
+        if agent.lambda_sladu is not None:
+            zwrot = nagroda
+            for t in range(ostatnia, -1, -1):
+                if t < ostatnia:
+                    zwrot = gamma * ((1.0 - agent.lambda_sladu) * agent.maks_q(decyzje[t + 1]['state'])
+                                     + agent.lambda_sladu * zwrot)
+                przejscia.append((decyzje[t]['state'], decyzje[t]['action'], zwrot, decyzje[t]['state'], True))
+            continue
+        for t, dane_ruchu in enumerate(decyzje):
+            if t + agent.kroki_zwrotu > ostatnia:
+                przejscia.append((dane_ruchu['state'], dane_ruchu['action'], gamma ** (ostatnia - t) * nagroda,
+                                  dane_ruchu['state'], True))
+            else:
+                przejscia.append((dane_ruchu['state'], dane_ruchu['action'], 0.0,
+                                  decyzje[t + agent.kroki_zwrotu]['state'], False))
+    return przejscia
+
+
+# Argumenty: (ladunek_agenta, typ_przeciwnika, epsilon, liczba_gier, id_workera, uzyj_heurystyk, uzyj_reguly,
+# konfiguracja_agenta, ziarno) - ładunek z ladunek_dla_workerow i konfiguracja z konfiguracja() odtwarzają agenta
 def graj_partie_batch(argumenty):
-    tabela_q_agenta, typ_przeciwnika, epsilon, liczba_gier, id_workera, uzyj_heurystyk, uzyj_reguly = argumenty
-    agent1 = AgentQLearning()
-    agent1.tabela_q = defaultdict(float, tabela_q_agenta)
-    agent2 = None
-    if typ_przeciwnika == "self":
-        agent2 = AgentQLearning()
-        agent2.tabela_q = defaultdict(float, tabela_q_agenta)
-    elif typ_przeciwnika == "smart_random":
-        agent2 = None
+    (ladunek_agenta, typ_przeciwnika, epsilon, liczba_gier, id_workera, uzyj_heurystyk, uzyj_reguly,
+     konfiguracja_agenta, ziarno) = argumenty
+    czas_startu = time.perf_counter()
+    pomiary = {'id_workera': id_workera, 'czas_agenta': 0.0, 'ruchy_agenta': 0,
+               'czas_przeciwnika': 0.0, 'ruchy_przeciwnika': 0}
+    generator = generator_zadania(ziarno, id_workera)
+    agent1 = agent_z_ladunku(konfiguracja_agenta, ladunek_agenta)
+    rozmiar_planszy, warunek_wygranej = agent1.rozmiar_planszy, agent1.warunek_wygranej
+    # W grze z samym sobą obie strony grają tą samą funkcją Q
+    agent2 = agent1 if typ_przeciwnika == "self" else None
     statystyki = {'wins': 0, 'losses': 0, 'draws': 0}
     aktualizacje_q = []
     for indeks_gry in range(liczba_gier):
-        stan_gry = StanGry()
+        stan_gry = StanGry(rozmiar_planszy, warunek_wygranej)
         id_gracza_agent1 = 1 if (typ_przeciwnika != "self" or indeks_gry % 2 == 0) else -1
         agenci = {1: agent1, -1: agent2}
         if typ_przeciwnika == "self" and id_gracza_agent1 == -1: agenci = {1: agent2, -1: agent1}
         historia = []
         while not stan_gry.czy_koniec_gry():
-            klucz_stanu = agent1.pobierz_klucz_stanu(stan_gry.plansza)
+            klucz_stanu, transformacja = agent1.kanonizuj_stan(stan_gry.plansza, stan_gry.obecny_gracz)
             id_obecnego_gracza = stan_gry.obecny_gracz
             akcja = None
+            czas_ruchu = time.perf_counter()
             if id_obecnego_gracza == id_gracza_agent1 or typ_przeciwnika == "self":
                 obecny_agent = agenci[id_obecnego_gracza]
                 akcja = obecny_agent.wybierz_akcje(stan_gry, epsilon, uzyj_heurystyk=uzyj_heurystyk,
-                                                   uzyj_reguly=uzyj_reguly)
+                                                   uzyj_reguly=uzyj_reguly, generator=generator)
+                pomiary['czas_agenta'] += time.perf_counter() - czas_ruchu
+                pomiary['ruchy_agenta'] += 1
             else:
                 if typ_przeciwnika == "minimax":
-                    akcja = znajdz_najlepszy_ruch(stan_gry)
+                    akcja = tabela_przeciwnika("minimax", rozmiar_planszy, warunek_wygranej).wybierz_ruch(
+                        stan_gry, generator)
                 elif typ_przeciwnika == "reguly" or typ_przeciwnika == "rules":
-                    akcja = reguly_najlepszy_ruch(stan_gry)
+                    akcja = tabela_przeciwnika("reguly", rozmiar_planszy, warunek_wygranej).wybierz_ruch(
+                        stan_gry, generator)
                 elif typ_przeciwnika == "mcts":
-                    akcja = mcts_najlepszy_ruch(stan_gry, 2000)
+                    akcja = mcts_najlepszy_ruch(stan_gry, 2000, generator=generator)
                 elif typ_przeciwnika == "smart_random":
-                    akcja = smart_random_ruch(stan_gry)
+                    akcja = smart_random_ruch(stan_gry, generator)
                 elif typ_przeciwnika == "random":
                     prawidlowe_ruchy = stan_gry.otrzymaj_mozliwe_ruchy()
-                    akcja = random.choice(prawidlowe_ruchy) if prawidlowe_ruchy else None
+                    akcja = generator.choice(prawidlowe_ruchy) if prawidlowe_ruchy else None
+                pomiary['czas_przeciwnika'] += time.perf_counter() - czas_ruchu
+                pomiary['ruchy_przeciwnika'] += 1
             if akcja:
-                historia.append({'state': klucz_stanu, 'action': akcja, 'player': id_obecnego_gracza})
+                historia.append({'state': klucz_stanu, 'action': agent1.akcja_do_klucza(akcja, transformacja),
+                                 'player': id_obecnego_gracza})
                 stan_gry.wykonaj_ruch(akcja[0], akcja[1])
             else:
                 break
@@ -231,6 +475,10 @@ def graj_partie_batch(argumenty):
             statystyki['draws'] += 1
         else:
             statystyki['losses'] += 1
+        if agent1.zwroty_wielokrokowe:
+            gracze = (1, -1) if typ_przeciwnika == "self" else (id_gracza_agent1,)
+            aktualizacje_q.extend(przejscia_wielokrokowe(agent1, historia, zwyciezca, gracze))
+            continue
         for i, dane_ruchu in enumerate(historia):
             gracz, czy_koniec = dane_ruchu['player'], (i == len(historia) - 1)
             nagroda = 0.0 if zwyciezca == 0 else 1.0 if zwyciezca == gracz else -1.0
@@ -239,7 +487,10 @@ def graj_partie_batch(argumenty):
                 aktualizacje_q.append(
                     (dane_ruchu['state'], dane_ruchu['action'], nagroda if czy_koniec else 0, nastepny_klucz_stanu,
                      czy_koniec))
-    return statystyki, aktualizacje_q, id_workera
+    if isinstance(agent1.tabela_q, GestaTabelaQ):
+        aktualizacje_q = agent1.tabela_q.koduj_przejscia(aktualizacje_q)
+    pomiary['czas'] = time.perf_counter() - czas_startu
+    return statystyki, aktualizacje_q, pomiary
 
 
 def ucz_sie_od_minimax(logger, agent: AgentQLearning, liczba_gier: int = 500, uzyj_reguly: bool = False):
@@ -256,7 +507,8 @@ def ucz_sie_od_minimax(logger, agent: AgentQLearning, liczba_gier: int = 500, uz
             if stan_gry.obecny_gracz == gracz_agenta:
                 akcja = agent.wybierz_akcje(stan_gry, epsilon=0.8, uzyj_heurystyk=True, uzyj_reguly=uzyj_reguly)
                 if akcja:
-                    ruchy_agenta.append((agent.pobierz_klucz_stanu(stan_gry.plansza), akcja))
+                    klucz_stanu, transformacja = agent.kanonizuj_stan(stan_gry.plansza, stan_gry.obecny_gracz)
+                    ruchy_agenta.append((klucz_stanu, agent.akcja_do_klucza(akcja, transformacja)))
                     stan_gry.wykonaj_ruch(akcja[0], akcja[1])
             else:
                 akcja = znajdz_najlepszy_ruch(stan_gry)
@@ -278,46 +530,264 @@ def ucz_sie_od_minimax(logger, agent: AgentQLearning, liczba_gier: int = 500, uz
     loguj_i_drukuj(logger, f"  Uczenie nadzorowane zakończone. Rozmiar Q-table: {len(agent.tabela_q)} wpisów")
 
 
+class PulaTreningowa:
+    # Jedna pula procesów na cały trening; co iterację do workerów trafia tylko opis opublikowanej tabeli
+    def __init__(self, liczba_workerow: Optional[int] = None, ziarno: Optional[int] = None,
+                 telemetria: Optional[Telemetria] = None, rozmiar_planszy: int = 3, warunek_wygranej: int = 3,
+                 przeciwnicy: Tuple[str, ...] = RODZAJE_PRZECIWNIKOW):
+        czas_startu = time.perf_counter()
+        self.liczba_workerow = liczba_workerow or cpu_count()
+        self.telemetria = telemetria
+        self.ziarno = ziarno
+        self.numer_zadania = 0
+        # Tabele wskazanych przeciwników dla planszy treningu liczone (lub wczytane z dysku) przed startem
+        # workerów: przy fork dzielą strony pamięci rodzica, przy spawn wczytują gotowy plik. Na planszach
+        # większych niż 3x3 tabela wypełnia się leniwie w workerach, więc start nic nie kosztuje.
+        for rodzaj in przeciwnicy:
+            tabela_przeciwnika(rodzaj, rozmiar_planszy, warunek_wygranej)
+        self.pula = Pool(processes=self.liczba_workerow)
+        # Blok 0 dla iteracji krokowych; tryb aktor-uczący publikuje na zmianę do obu
+        self.wspoldzielone = (WspoldzielonaTabelaQ(), WspoldzielonaTabelaQ())
+        self._menedzer = None
+        if telemetria is not None:
+            telemetria.zapisz('pool_start', workers=self.liczba_workerow, startup_s=time.perf_counter() - czas_startu)
+
+    @property
+    def menedzer(self):
+        # Kolejka i stan polityki dla trybu aktor-uczący; tworzone dopiero przy pierwszym użyciu
+        if self._menedzer is None:
+            self._menedzer = Manager()
+        return self._menedzer
+
+    def opublikuj(self, agent: AgentQLearning, blok: int = 0):
+        return agent.ladunek_dla_workerow(self.wspoldzielone[blok])
+
+    def ziarno_zadania(self) -> Optional[Tuple[int, int]]:
+        # Każde rozesłanie zadań dostaje nowy numer, więc iteracje nie powtarzają tych samych partii
+        self.numer_zadania += 1
+        return None if self.ziarno is None else (self.ziarno, self.numer_zadania)
+
+    def graj(self, argumenty_workerow: List[tuple]) -> List[tuple]:
+        return self.pula.map(graj_partie_batch, argumenty_workerow)
+
+    def zamknij(self) -> None:
+        self.pula.close()
+        self.pula.join()
+        for wspoldzielona in self.wspoldzielone:
+            wspoldzielona.zamknij()
+        if self._menedzer is not None:
+            self._menedzer.shutdown()
+            self._menedzer = None
+
+    def __enter__(self) -> 'PulaTreningowa':
+        return self
+
+    def __exit__(self, *args) -> None:
+        if args[0] is not None:
+            self.pula.terminate()
+        self.zamknij()
+
+
+def _czytaj_polityke(polityka) -> Tuple[int, object]:
+    # Wersja v jest w bloku v % 2, który uczący nadpisuje dopiero przy publikacji v + 2, a ta zaczyna się
+    # po ogłoszeniu v + 1. Kopia zrobiona, gdy nadal ogłoszona jest v, jest więc spójną tabelą wersji v.
+    while True:
+        wersja, ladunek = polityka['aktualna']
+        if not isinstance(ladunek, OpisPamieciQ):
+            return wersja, ladunek
+        try:
+            tabela = _tabela_workera(ladunek).kopia_wartosci()
+        except FileNotFoundError:
+            # Blok zwolniony przy powiększeniu tabeli - ogłoszona jest już nowsza wersja
+            continue
+        if polityka['aktualna'][0] == wersja:
+            return wersja, tabela
+
+
+def _petla_aktora(argumenty):
+    (polityka, kolejka, zatrzymaj, typ_przeciwnika, epsilon, gier_na_paczke, id_workera, uzyj_reguly,
+     konfiguracja_agenta, ziarno) = argumenty
+    numer_paczki = 0
+    try:
+        while not zatrzymaj.is_set():
+            # Paczka gra prywatną kopią polityki i jest oznaczona wersją, z której kopię zrobiono
+            wersja, tabela_q_agenta = _czytaj_polityke(polityka)
+            numer_paczki += 1
+            statystyki, aktualizacje_q, pomiary = graj_partie_batch(
+                (tabela_q_agenta, typ_przeciwnika, epsilon, gier_na_paczke, id_workera, True, uzyj_reguly,
+                 konfiguracja_agenta, None if ziarno is None else (*ziarno, numer_paczki)))
+            kolejka.put((wersja, statystyki, aktualizacje_q, pomiary))
+    finally:
+        kolejka.put(None)
+
+
+def trenuj_aktor_uczacy(logger, agent: AgentQLearning, liczba_gier: int, przeciwnik: str, epsilon: float,
+                        pula: PulaTreningowa, uzyj_reguly: bool = False, gier_na_paczke: int = 50,
+                        rozmiar_kolejki: Optional[int] = None, limit_nieaktualnosci: int = 2,
+                        co_ile_publikowac: int = 4, bufor: Optional[BuforPowtorek] = None,
+                        przebiegi_powtorek: int = 1, pomiary_iteracji: Optional[Dict] = None) -> Dict:
+    # Aktorzy grają bez przerwy, uczący stosuje paczki na bieżąco i co kilka paczek publikuje nową politykę.
+    # Paczki rozegrane polityką starszą o więcej niż limit_nieaktualnosci wersji są odrzucane.
+    if isinstance(agent.tabela_q, (dict, TabelaQMapowana)):
+        # Słownik trafiałby do aktorów przez menedżera w całości przy każdej publikacji
+        raise ValueError("Tryb aktor-uczący wymaga gęstej tabeli Q (gesta_tabela=True)")
+    liczba_aktorow = pula.liczba_workerow
+    kolejka = pula.menedzer.Queue(maxsize=rozmiar_kolejki or 2 * liczba_aktorow)
+    zatrzymaj = pula.menedzer.Event()
+    wersja = 0
+    polityka = pula.menedzer.dict(aktualna=(wersja, pula.opublikuj(agent, wersja % 2)))
+    ziarno = pula.ziarno_zadania()
+    zadania = [pula.pula.apply_async(_petla_aktora, ((polityka, kolejka, zatrzymaj, przeciwnik, epsilon,
+                                                      gier_na_paczke, i, uzyj_reguly, agent.konfiguracja(),
+                                                      ziarno),))
+               for i in range(liczba_aktorow)]
+
+    calkowite_statystyki = {'wins': 0, 'losses': 0, 'draws': 0}
+    rozegrane = zastosowane = odrzucone = liczba_aktualizacji = liczba_przejsc = 0
+    czasy = {'queue_wait_s': 0.0, 'update_s': 0.0, 'replay_s': 0.0, 'publish_s': 0.0}
+    wszystkie_pomiary, bajty_wynikow, czas_serializacji = [], 0, 0.0
+    mierz_serializacje = pomiary_iteracji is not None and pula.telemetria.mierz_serializacje
+    aktywni = liczba_aktorow
+    while aktywni:
+        czas_startu = time.perf_counter()
+        paczka = kolejka.get()
+        czasy['queue_wait_s'] += time.perf_counter() - czas_startu
+        if paczka is None:
+            aktywni -= 1
+            continue
+        if rozegrane >= liczba_gier:
+            continue
+        wersja_paczki, statystyki, aktualizacje_q, pomiary = paczka
+        wszystkie_pomiary.append(pomiary)
+        if mierz_serializacje:
+            bajty, czas = rozmiar_serializacji(paczka)
+            bajty_wynikow, czas_serializacji = bajty_wynikow + bajty, czas_serializacji + czas
+        for klucz in calkowite_statystyki: calkowite_statystyki[klucz] += statystyki[klucz]
+        rozegrane += sum(statystyki.values())
+        if rozegrane >= liczba_gier:
+            zatrzymaj.set()
+        if wersja - wersja_paczki > limit_nieaktualnosci:
+            odrzucone += 1
+            continue
+        czas_startu = time.perf_counter()
+        przejscia = len(agent.aktualizuj_paczki([aktualizacje_q], bufor))
+        czasy['update_s'] += time.perf_counter() - czas_startu
+        liczba_aktualizacji += przejscia
+        liczba_przejsc += przejscia
+        zastosowane += 1
+        if zastosowane % co_ile_publikowac == 0:
+            if bufor is not None:
+                czas_startu = time.perf_counter()
+                liczba_aktualizacji += len(agent.powtorz_z_bufora(bufor, przebiegi_powtorek))
+                czasy['replay_s'] += time.perf_counter() - czas_startu
+            wersja += 1
+            czas_startu = time.perf_counter()
+            polityka['aktualna'] = (wersja, pula.opublikuj(agent, wersja % 2))
+            czasy['publish_s'] += time.perf_counter() - czas_startu
+    for zadanie in zadania:
+        zadanie.get()
+
+    if pomiary_iteracji is not None:
+        # Uczący czeka na kolejkę, gdy aktorzy nie nadążają; czas gry aktorów nakłada się na aktualizacje
+        if mierz_serializacje:
+            pomiary_iteracji.update(results_bytes=bajty_wynikow, results_pickle_s=czas_serializacji)
+        pomiary_iteracji.update(czasy, play_s=czasy['queue_wait_s'], ipc_s=0.0, transitions=liczba_przejsc,
+                                applied_batches=zastosowane, dropped_batches=odrzucone, policy_versions=wersja,
+                                **pomiary_workerow(wszystkie_pomiary))
+
+    loguj_i_drukuj(logger, f"  Aktor-uczący: {zastosowane} paczek ({liczba_aktualizacji} aktualizacji Q), "
+                           f"odrzucone nieaktualne: {odrzucone}, wersji polityki: {wersja}")
+    return calkowite_statystyki
+
+
 def trenuj_iteracje_rownolegle(logger, agent: AgentQLearning, iteracja: int, gier_na_iteracje: int,
                                uzyj_reguly: bool = False, przeciwnik_override: str = None,
-                               epsilon_override: float = None) -> Dict:
+                               epsilon_override: float = None, pula: Optional[PulaTreningowa] = None,
+                               tryb_aktor_uczacy: bool = False, bufor: Optional[BuforPowtorek] = None,
+                               przebiegi_powtorek: int = 2, harmonogram: Harmonogram = Harmonogram()) -> Dict:
+    if pula is None:
+        with PulaTreningowa(rozmiar_planszy=agent.rozmiar_planszy, warunek_wygranej=agent.warunek_wygranej) as pula:
+            return trenuj_iteracje_rownolegle(logger, agent, iteracja, gier_na_iteracje, uzyj_reguly,
+                                              przeciwnik_override, epsilon_override, pula, tryb_aktor_uczacy,
+                                              bufor, przebiegi_powtorek, harmonogram)
     if przeciwnik_override:
         przeciwnik = przeciwnik_override
         epsilon = epsilon_override
     else:
-        if iteracja <= 10:
-            epsilon, przeciwnik = 0.3, "smart_random"
-        elif iteracja <= 25:
-            epsilon, przeciwnik = 0.25, "self"
+        epsilon_smart, epsilon_self, epsilon_reguly, epsilon_minimax, epsilon_self_pozny = harmonogram.epsilony_fazy2
+        if iteracja <= harmonogram.granice_fazy2[0]:
+            epsilon, przeciwnik = epsilon_smart, "smart_random"
+        elif iteracja <= harmonogram.granice_fazy2[1]:
+            epsilon, przeciwnik = epsilon_self, "self"
         else:
             if iteracja % 3 == 0:
-                epsilon, przeciwnik = 0.15, "reguly"
+                epsilon, przeciwnik = epsilon_reguly, "reguly"
             elif iteracja % 3 == 1:
-                epsilon, przeciwnik = 0.1, "minimax"
+                epsilon, przeciwnik = epsilon_minimax, "minimax"
             else:
-                epsilon, przeciwnik = 0.2, "self"
-
-    liczba_workerow = cpu_count()
-    gier_na_workera = gier_na_iteracje // liczba_workerow
-    argumenty_workerow = []
-    for i in range(liczba_workerow):
-        dodatkowe_gry = 1 if i < gier_na_iteracje % liczba_workerow else 0
-        argumenty_workerow.append((dict(agent.tabela_q), przeciwnik, epsilon,
-                                   gier_na_workera + dodatkowe_gry, i, True, uzyj_reguly))
+                epsilon, przeciwnik = epsilon_self_pozny, "self"
+
+    if przeciwnik == "minimax" and agent.rozmiar_planszy != 3:
+        # Dokładny minimax jest wykonalny tylko na 3x3; na większych planszach najsilniejszy jest MCTS
+        przeciwnik = "mcts"
+
     loguj_i_drukuj(logger,
                    f"\nIteracja {iteracja}: Trenowanie vs {przeciwnik} (epsilon={epsilon:.3f}, Gry={gier_na_iteracje})")
     czas_startu = time.time()
-    with Pool(processes=liczba_workerow) as pool:
-        wyniki = pool.map(graj_partie_batch, argumenty_workerow)
-    loguj_i_drukuj(logger, f"  Trenowanie zakończone w {time.time() - czas_startu:.1f}s")
+    # Pomiary do telemetrii zbierane tylko, gdy pula ma gdzie je zapisać
+    pomiary = {} if pula.telemetria is not None else None
+    if tryb_aktor_uczacy:
+        calkowite_statystyki = trenuj_aktor_uczacy(logger, agent, gier_na_iteracje, przeciwnik, epsilon, pula,
+                                                   uzyj_reguly, bufor=bufor, przebiegi_powtorek=przebiegi_powtorek,
+                                                   pomiary_iteracji=pomiary)
+        loguj_i_drukuj(logger, f"  Trenowanie zakończone w {time.time() - czas_startu:.1f}s")
+    else:
+        liczba_workerow = pula.liczba_workerow
+        gier_na_workera = gier_na_iteracje // liczba_workerow
+        czas_pomiaru = time.perf_counter()
+        tabela_q_workerow = pula.opublikuj(agent)
+        czas_publikacji = time.perf_counter() - czas_pomiaru
+        ziarno = pula.ziarno_zadania()
+        argumenty_workerow = []
+        for i in range(liczba_workerow):
+            dodatkowe_gry = 1 if i < gier_na_iteracje % liczba_workerow else 0
+            argumenty_workerow.append((tabela_q_workerow, przeciwnik, epsilon, gier_na_workera + dodatkowe_gry, i,
+                                       True, uzyj_reguly, agent.konfiguracja(), ziarno))
+        czas_pomiaru = time.perf_counter()
+        wyniki = pula.graj(argumenty_workerow)
+        czas_gry = time.perf_counter() - czas_pomiaru
+        loguj_i_drukuj(logger, f"  Trenowanie zakończone w {time.time() - czas_startu:.1f}s")
 
-    wszystkie_aktualizacje, calkowite_statystyki = [], {'wins': 0, 'losses': 0, 'draws': 0}
-    for statystyki, aktualizacje_q, _ in wyniki:
-        for klucz in calkowite_statystyki: calkowite_statystyki[klucz] += statystyki[klucz]
-        wszystkie_aktualizacje.extend(aktualizacje_q)
+        paczki, calkowite_statystyki = [], {'wins': 0, 'losses': 0, 'draws': 0}
+        for statystyki, aktualizacje_q, _ in wyniki:
+            for klucz in calkowite_statystyki: calkowite_statystyki[klucz] += statystyki[klucz]
+            paczki.append(aktualizacje_q)
+
+        czas_pomiaru = time.perf_counter()
+        bledy_td = agent.aktualizuj_paczki(paczki, bufor)
+        czas_aktualizacji = time.perf_counter() - czas_pomiaru
+        loguj_i_drukuj(logger, f"  Zastosowano {len(bledy_td)} aktualizacji Q "
+                               f"(średni |błąd TD|: {np.abs(bledy_td).mean() if len(bledy_td) else 0.0:.4f})")
+        czas_pomiaru = time.perf_counter()
+        if bufor is not None:
+            bledy_powtorek = agent.powtorz_z_bufora(bufor, przebiegi_powtorek)
+            loguj_i_drukuj(logger, f"  Powtórki: {len(bledy_powtorek)} aktualizacji z bufora ({len(bufor)} przejść), "
+                                   f"średni |błąd TD|: "
+                                   f"{np.abs(bledy_powtorek).mean() if len(bledy_powtorek) else 0.0:.4f}")
+        czas_powtorek = time.perf_counter() - czas_pomiaru
 
-    loguj_i_drukuj(logger, f"  Stosowanie {len(wszystkie_aktualizacje)} aktualizacji Q...")
-    for argumenty_aktualizacji in wszystkie_aktualizacje: agent.aktualizuj(*argumenty_aktualizacji)
+        if pomiary is not None:
+            # Narzut IPC: czas map ponad najwolniejszego workera (wysłanie zadań, pickle wyników, kolejki puli)
+            pomiary_gier = pomiary_workerow([pomiar for _, _, pomiar in wyniki])
+            narzut_ipc = max(0.0, czas_gry - max(pomiary_gier['worker_times_s']))
+            pomiary.update(pomiary_gier, play_s=czas_gry, ipc_s=narzut_ipc,
+                           update_s=czas_aktualizacji, replay_s=czas_powtorek, publish_s=czas_publikacji,
+                           transitions=len(bledy_td))
+            if pula.telemetria.mierz_serializacje:
+                bajty_argumentow, czas_argumentow = rozmiar_serializacji(argumenty_workerow)
+                bajty_wynikow, czas_wynikow = rozmiar_serializacji(wyniki)
+                pomiary.update(args_bytes=bajty_argumentow, args_pickle_s=czas_argumentow,
+                               results_bytes=bajty_wynikow, results_pickle_s=czas_wynikow)
 
     calkowita_liczba_gier = sum(calkowite_statystyki.values())
     wspolczynnik_wygranych = calkowite_statystyki['wins'] / calkowita_liczba_gier * 100
@@ -331,11 +801,25 @@ def trenuj_iteracje_rownolegle(logger, agent: AgentQLearning, iteracja: int, gie
     loguj_i_drukuj(logger,
                    f"  Rozmiar Q-table: {len(agent.tabela_q)} | Współczynnik uczenia: {agent.wspolczynnik_uczenia:.3f}")
 
+    if pomiary is not None:
+        czas_calkowity = time.time() - czas_startu
+        pula.telemetria.zapisz('iteration', iteration=iteracja, opponent=przeciwnik, epsilon=epsilon,
+                               mode='actor-learner' if tryb_aktor_uczacy else 'lockstep', workers=pula.liczba_workerow,
+                               games=calkowita_liczba_gier, total_s=czas_calkowity,
+                               games_per_s=calkowita_liczba_gier / czas_calkowity,
+                               transitions_per_s=pomiary['transitions'] / czas_calkowity,
+                               q_table_size=len(agent.tabela_q),
+                               q_table_bytes=pamiec_tabeli(agent.tabela_q, pula.telemetria.mierz_serializacje),
+                               **pomiary)
+
     return calkowite_statystyki
 
 
 def weryfikacja_miedzyetapowa(logger, agent: AgentQLearning, liczba_gier_na_poziom: int,
-                              uzyj_reguly: bool = False) -> Dict:
+                              uzyj_reguly: bool = False, pula: Optional[PulaTreningowa] = None) -> Dict:
+    if pula is None:
+        with PulaTreningowa(rozmiar_planszy=agent.rozmiar_planszy, warunek_wygranej=agent.warunek_wygranej) as pula:
+            return weryfikacja_miedzyetapowa(logger, agent, liczba_gier_na_poziom, uzyj_reguly, pula)
     loguj_i_drukuj(logger, "\nWeryfikacja miedzyetapowa...")
     poziomy = {
         "random": "Losowy",
@@ -344,19 +828,23 @@ def weryfikacja_miedzyetapowa(logger, agent: AgentQLearning, liczba_gier_na_pozi
         "mcts": "MCTS (2000 iter)",
         "minimax": "Perfekcyjny Minimax"
     }
+    if agent.rozmiar_planszy != 3:
+        # Minimax wykonalny tylko na 3x3; na większych planszach najsilniejszym sprawdzianem jest MCTS
+        del poziomy["minimax"]
     wszystkie_wyniki = {}
+    tabela_q_workerow = pula.opublikuj(agent)
     for poziom, opis in poziomy.items():
         loguj_i_drukuj(logger, f"  Testowanie vs {opis} ({liczba_gier_na_poziom} gier)...")
         czas_startu_testu = time.time()
-        liczba_workerow = min(4, cpu_count()) if poziom not in ["mcts", "minimax"] else 1
+        liczba_workerow = min(4, pula.liczba_workerow) if poziom not in ["mcts", "minimax"] else 1
         gier_na_workera = liczba_gier_na_poziom // liczba_workerow
+        ziarno = pula.ziarno_zadania()
         argumenty_workerow = []
         for i in range(liczba_workerow):
             dodatkowe_gry = 1 if i < liczba_gier_na_poziom % liczba_workerow else 0
-            argumenty_workerow.append((dict(agent.tabela_q), poziom, 0.0,
-                                       gier_na_workera + dodatkowe_gry, i, True, uzyj_reguly))
-        with Pool(processes=liczba_workerow) as pool:
-            wyniki = pool.map(graj_partie_batch, argumenty_workerow)
+            argumenty_workerow.append((tabela_q_workerow, poziom, 0.0, gier_na_workera + dodatkowe_gry, i,
+                                       True, uzyj_reguly, agent.konfiguracja(), ziarno))
+        wyniki = pula.graj(argumenty_workerow)
         calkowite_statystyki = {'wins': 0, 'losses': 0, 'draws': 0}
         for statystyki, _, _ in wyniki:
             for klucz in calkowite_statystyki: calkowite_statystyki[klucz] += statystyki[klucz]
@@ -366,72 +854,271 @@ def weryfikacja_miedzyetapowa(logger, agent: AgentQLearning, liczba_gier_na_pozi
         loguj_i_drukuj(logger,
                        f"  {status} vs {opis}: W:{calkowite_statystyki['wins']} L:{calkowite_statystyki['losses']} D:{calkowite_statystyki['draws']} (Przegrane: {wspolczynnik_przegranych:.1f}%)")
         wszystkie_wyniki[poziom] = calkowite_statystyki
+        if pula.telemetria is not None:
+            czas_testu = time.time() - czas_startu_testu
+            pula.telemetria.zapisz('verification', opponent=poziom, workers=liczba_workerow,
+                                   games=liczba_gier_na_poziom, total_s=czas_testu,
+                                   games_per_s=liczba_gier_na_poziom / czas_testu, **calkowite_statystyki,
+                                   **pomiary_workerow([pomiar for _, _, pomiar in wyniki]))
     perfekcyjne_vs_latwe = (
                 wszystkie_wyniki['random']['losses'] == 0 and wszystkie_wyniki['smart_random']['losses'] == 0)
-    perfekcyjne_vs_minimax = wszystkie_wyniki['minimax']['losses'] == 0
+    perfekcyjne_vs_minimax = wszystkie_wyniki.get('minimax', wszystkie_wyniki['mcts'])['losses'] == 0
     return {'perfect_vs_easy': perfekcyjne_vs_latwe, 'perfect_vs_minimax': perfekcyjne_vs_minimax}
 
 
-def trenuj_doskonaly_agent(logger, agent: AgentQLearning, uzyj_reguly: bool = False):
-    loguj_i_drukuj(logger, "\n--- FAZA 1: SZEROKA EKSPLORACJA (vs Random) ---")
-    liczba_iteracji_fazy1 = 20
-    for i in range(1, liczba_iteracji_fazy1 + 1):
-        trenuj_iteracje_rownolegle(logger, agent, i, 5_000, uzyj_reguly, "random", 0.9)
-        loguj_i_drukuj(logger, "─" * 70)
-
-    loguj_i_drukuj(logger, "\n--- FAZA 2: UCZENIE STRATEGII (vs Smart Random, Reguły, Self-Play) ---")
-    agent_osiagnal_doskonalosc = False
-    liczba_iteracji_fazy2 = 40
-    for i in range(1, liczba_iteracji_fazy2 + 1):
-        trenuj_iteracje_rownolegle(logger, agent, i, 5_000, uzyj_reguly)
-        if i % 10 == 0:
-            wyniki_weryfikacji = weryfikacja_miedzyetapowa(logger, agent, 500, uzyj_reguly)
-            if wyniki_weryfikacji['perfect_vs_easy'] and wyniki_weryfikacji['perfect_vs_minimax']:
-                loguj_i_drukuj(logger, "\n✅ Agent osiągnął doskonałość w trakcie Fazy 2. Przerywanie treningu...")
-                agent_osiagnal_doskonalosc = True
+# Pozycja w programie nauczania: (faza, ostatnia ukończona iteracja fazy); faza 0 to nauka od minimax
+FAZA_KONIEC = 4
+PLIK_PUNKTU_KONTROLNEGO = 'checkpoint.pkl'
+
+
+def zapisz_atomowo(sciezka: str, dane) -> None:
+    # Zapis do pliku tymczasowego i os.replace - przerwanie nigdy nie zostawia uciętego pliku
+    sciezka_tymczasowa = sciezka + '.tmp'
+    with open(sciezka_tymczasowa, 'wb') as f:
+        pickle.dump(dane, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(sciezka_tymczasowa, sciezka)
+
+
+def zapisz_punkt_kontrolny(folder: str, agent: AgentQLearning, faza: int, iteracja: int,
+                           uzyj_reguly: bool = False, ziarno: Optional[int] = None, numer_zadania: int = 0) -> None:
+    zapisz_atomowo(os.path.join(folder, PLIK_PUNKTU_KONTROLNEGO), {
+        'q_table': agent.stan_tabeli(),
+        'konfiguracja_agenta': agent.konfiguracja(),
+        'gesta_tabela': isinstance(agent.tabela_q, GestaTabelaQ),
+        'wspolczynnik_uczenia': agent.wspolczynnik_uczenia,
+        'wspolczynnik_dyskontujacy': agent.wspolczynnik_dyskontujacy,
+        'epsilon': agent.epsilon,
+        'faza': faza, 'iteracja': iteracja,
+        'uzyj_reguly': uzyj_reguly,
+        'stan_random': random.getstate(), 'stan_numpy': np.random.get_state(),
+        'ziarno': ziarno, 'numer_zadania': numer_zadania,
+        'timestamp': datetime.now().isoformat(),
+    })
+
+
+def wczytaj_punkt_kontrolny(folder: str) -> Tuple[AgentQLearning, Dict]:
+    with open(os.path.join(folder, PLIK_PUNKTU_KONTROLNEGO), 'rb') as f:
+        dane = pickle.load(f)
+    konfiguracja = dict(dane['konfiguracja_agenta'])
+    if konfiguracja.pop('aproksymacja', False):
+        # Import w funkcji: moduł aproksymacji sam importuje ten moduł
+        from ai.agent_aproksymacyjny import AgentAproksymacyjny as klasa_agenta
+    else:
+        klasa_agenta, konfiguracja['gesta_tabela'] = AgentQLearning, dane['gesta_tabela']
+    agent = klasa_agenta(wspolczynnik_uczenia=dane['wspolczynnik_uczenia'],
+                         wspolczynnik_dyskontujacy=dane['wspolczynnik_dyskontujacy'],
+                         wspolczynnik_eksploracji=dane['epsilon'], **konfiguracja)
+    agent.wczytaj_stan_tabeli(dane['q_table'])
+    random.setstate(dane['stan_random'])
+    np.random.set_state(dane['stan_numpy'])
+    return agent, dane
+
+
+def znajdz_ostatni_punkt_kontrolny(folder_bazowy: str) -> Optional[str]:
+    folder_nadrzedny = os.path.dirname(folder_bazowy)
+    if not os.path.isdir(folder_nadrzedny):
+        return None
+    kandydaci = [os.path.join(folder_nadrzedny, nazwa) for nazwa in os.listdir(folder_nadrzedny)
+                 if os.path.join(folder_nadrzedny, nazwa).startswith(folder_bazowy)
+                 and os.path.exists(os.path.join(folder_nadrzedny, nazwa, PLIK_PUNKTU_KONTROLNEGO))]
+    if not kandydaci:
+        return None
+    return max(kandydaci, key=lambda folder: os.path.getmtime(os.path.join(folder, PLIK_PUNKTU_KONTROLNEGO)))
+
+
+def trenuj_doskonaly_agent(logger, agent: AgentQLearning, uzyj_reguly: bool = False,
+                           pula: Optional[PulaTreningowa] = None, tryb_aktor_uczacy: bool = False,
+                           pozycja: Tuple[int, int] = (1, 0),
+                           punkt_kontrolny: Optional[Callable[[int, int], None]] = None,
+                           bufor: Optional[BuforPowtorek] = None, przebiegi_powtorek: int = 2,
+                           kryterium: Optional[KryteriumZbieznosci] = None, wczesne_zatrzymanie: bool = True,
+                           harmonogram: Harmonogram = Harmonogram()):
+    if pula is None:
+        with PulaTreningowa(rozmiar_planszy=agent.rozmiar_planszy, warunek_wygranej=agent.warunek_wygranej) as pula:
+            return trenuj_doskonaly_agent(logger, agent, uzyj_reguly, pula, tryb_aktor_uczacy, pozycja,
+                                          punkt_kontrolny, bufor, przebiegi_powtorek, kryterium, wczesne_zatrzymanie,
+                                          harmonogram)
+    faza_startowa, iteracja_startowa = pozycja
+    # Liczby iteracji faz są górnymi limitami; sygnały zbieżności liczone zawsze, kończą fazę tylko z wczesne_zatrzymanie
+    kryterium = kryterium or KryteriumZbieznosci()
+    migawka = None
+
+    def pierwsza_iteracja(faza: int) -> int:
+        return iteracja_startowa + 1 if faza == faza_startowa else 1
+
+    def zapisz(faza: int, iteracja: int) -> None:
+        if punkt_kontrolny:
+            punkt_kontrolny(faza, iteracja)
+
+    def nowa_faza() -> None:
+        nonlocal migawka
+        kryterium.resetuj()
+        migawka = agent.migawka_polityki()
+
+    def zbiezna(faza: int, iteracja: int) -> bool:
+        nonlocal migawka
+        nowa_migawka = agent.migawka_polityki()
+        sygnaly = sygnaly_zbieznosci(migawka, nowa_migawka, agent.liczba_stanow_osiagalnych())
+        migawka = nowa_migawka
+        czy_zbiezna = kryterium.aktualizuj(sygnaly)
+        pokrycie = f" | pokrycie {100 * sygnaly['pokrycie']:.1f}%" if sygnaly['pokrycie'] is not None else ""
+        loguj_i_drukuj(logger, f"  Zbieżność: maks ΔQ {sygnaly['maks_delta_q']:.4f} | średnia ΔQ "
+                               f"{sygnaly['srednia_delta_q']:.5f} | zmiana polityki "
+                               f"{100 * sygnaly['zmiana_polityki']:.2f}%{pokrycie} | stabilne iteracje "
+                               f"{kryterium.stabilne}/{kryterium.cierpliwosc}")
+        if pula.telemetria is not None:
+            pula.telemetria.zapisz('convergence', phase=faza, iteration=iteracja, stable=kryterium.stabilne,
+                                   converged=czy_zbiezna, **sygnaly)
+        return czy_zbiezna and wczesne_zatrzymanie
+
+    def doskonaly() -> bool:
+        wyniki_weryfikacji = weryfikacja_miedzyetapowa(logger, agent, harmonogram.gier_weryfikacji, uzyj_reguly, pula)
+        return wyniki_weryfikacji['perfect_vs_easy'] and wyniki_weryfikacji['perfect_vs_minimax']
+
+    if faza_startowa <= 1:
+        loguj_i_drukuj(logger, "\n--- FAZA 1: SZEROKA EKSPLORACJA (vs Random) ---")
+        liczba_iteracji_fazy1 = harmonogram.iteracje_fazy1
+        nowa_faza()
+        for i in range(pierwsza_iteracja(1), liczba_iteracji_fazy1 + 1):
+            trenuj_iteracje_rownolegle(logger, agent, i, harmonogram.gier_na_iteracje, uzyj_reguly, "random",
+                                       harmonogram.epsilon_fazy1, pula=pula,
+                                       tryb_aktor_uczacy=tryb_aktor_uczacy, bufor=bufor,
+                                       przebiegi_powtorek=przebiegi_powtorek)
+            if zbiezna(1, i):
+                # Eksploracja nic już nie dodaje - weryfikacja po fazie 1 nie ma sensu, od razu strategia
+                loguj_i_drukuj(logger, f"\n⏹ Faza 1 zbieżna po {i} z {liczba_iteracji_fazy1} iteracji")
+                zapisz(1, liczba_iteracji_fazy1)
                 break
-        loguj_i_drukuj(logger, "─" * 70)
+            zapisz(1, i)
+            loguj_i_drukuj(logger, "─" * 70)
 
-    if agent_osiagnal_doskonalosc:
-        return agent
+    if faza_startowa <= 2:
+        loguj_i_drukuj(logger, "\n--- FAZA 2: UCZENIE STRATEGII (vs Smart Random, Reguły, Self-Play) ---")
+        liczba_iteracji_fazy2 = harmonogram.iteracje_fazy2
+        nowa_faza()
+        for i in range(pierwsza_iteracja(2), liczba_iteracji_fazy2 + 1):
+            trenuj_iteracje_rownolegle(logger, agent, i, harmonogram.gier_na_iteracje, uzyj_reguly, pula=pula,
+                                       tryb_aktor_uczacy=tryb_aktor_uczacy, bufor=bufor,
+                                       przebiegi_powtorek=przebiegi_powtorek, harmonogram=harmonogram)
+            czy_zbiezna = zbiezna(2, i)
+            # Weryfikacja co 10 iteracji jak dawniej; zbieżność tylko dokłada wcześniejsze sprawdzenie
+            if czy_zbiezna or i % 10 == 0:
+                if doskonaly():
+                    loguj_i_drukuj(logger, "\n✅ Agent osiągnął doskonałość w trakcie Fazy 2. Przerywanie treningu...")
+                    zapisz(FAZA_KONIEC, 0)
+                    return agent
+            if czy_zbiezna:
+                loguj_i_drukuj(logger, f"\n⏹ Faza 2 zbieżna po {i} z {liczba_iteracji_fazy2} iteracji, "
+                                       f"ale bez doskonałości - korekta z ekspertem")
+                zapisz(2, liczba_iteracji_fazy2)
+                break
+            zapisz(2, i)
+            loguj_i_drukuj(logger, "─" * 70)
 
-    loguj_i_drukuj(logger, "\n--- FAZA 3: KOREKTA Z EKSPERTEM (vs Minimax) ---")
-    agent.wspolczynnik_uczenia = 0.1
-    liczba_iteracji_fazy3 = 10
-    for i in range(1, liczba_iteracji_fazy3 + 1):
-        trenuj_iteracje_rownolegle(logger, agent, i, 5_000, uzyj_reguly, "minimax", 0.05)
-        loguj_i_drukuj(logger, "─" * 70)
+    if faza_startowa <= 3:
+        loguj_i_drukuj(logger, "\n--- FAZA 3: KOREKTA Z EKSPERTEM (vs Minimax) ---")
+        agent.wspolczynnik_uczenia = harmonogram.wspolczynnik_uczenia_fazy3
+        liczba_iteracji_fazy3 = harmonogram.iteracje_fazy3
+        nowa_faza()
+        for i in range(pierwsza_iteracja(3), liczba_iteracji_fazy3 + 1):
+            trenuj_iteracje_rownolegle(logger, agent, i, harmonogram.gier_na_iteracje, uzyj_reguly, "minimax",
+                                       harmonogram.epsilon_fazy3, pula=pula,
+                                       tryb_aktor_uczacy=tryb_aktor_uczacy, bufor=bufor,
+                                       przebiegi_powtorek=przebiegi_powtorek)
+            if zbiezna(3, i):
+                # Końcowa weryfikacja i tak następuje po treningu
+                loguj_i_drukuj(logger, f"\n⏹ Faza 3 zbieżna po {i} z {liczba_iteracji_fazy3} iteracji")
+                break
+            zapisz(3, i)
+            loguj_i_drukuj(logger, "─" * 70)
+        zapisz(FAZA_KONIEC, 0)
 
     return agent
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Trenowanie agenta Q-learning")
+    parser.add_argument('--resume', nargs='?', const='', default=None, metavar='FOLDER',
+                        help="wznów trening z punktu kontrolnego (domyślnie z najnowszego folderu treningowego)")
+    parser.add_argument('--ziarno', type=int, default=None,
+                        help="ziarno przebiegu: trening z tym samym ziarnem jest w pełni powtarzalny")
+    parser.add_argument('--kroki', type=int, default=1,
+                        help="zwroty n-krokowe po własnych decyzjach gracza (1 = zwykły Q-learning)")
+    parser.add_argument('--lambda', dest='lambda_sladu', type=float, default=None,
+                        help="zwroty lambda (Q(lambda) Penga) zamiast n-krokowych")
+    parser.add_argument('--powtorki', action='store_true',
+                        help="bufor powtórek z priorytetami (tylko z jednokrokowym Q-learningiem)")
+    parser.add_argument('--mierz-serializacje', action='store_true',
+                        help="telemetria: bajty i czas pickle danych IPC (dodatkowa serializacja w uczącym)")
+    parser.add_argument('--bez-wczesnego-zatrzymania', action='store_true',
+                        help="zawsze pełne liczby iteracji faz, nawet gdy polityka przestała się zmieniać")
+    argumenty = parser.parse_args()
+    if argumenty.powtorki and (argumenty.kroki > 1 or argumenty.lambda_sladu is not None):
+        parser.error("--powtorki nie łączy się z --kroki / --lambda")
+
     czas_startu = time.time()
 
     folder_bazowy = os.path.join(current_dir, 'q_tables', 'q_learning_table')
-    nazwa_folderu, licznik = folder_bazowy, 1
-    while os.path.exists(nazwa_folderu):
-        nazwa_folderu = f"{folder_bazowy}_{licznik}"
-        licznik += 1
-    os.makedirs(nazwa_folderu, exist_ok=True)
+    punkt_startowy = None
+    if argumenty.resume is not None:
+        nazwa_folderu = argumenty.resume or znajdz_ostatni_punkt_kontrolny(folder_bazowy)
+        if not nazwa_folderu or not os.path.exists(os.path.join(nazwa_folderu, PLIK_PUNKTU_KONTROLNEGO)):
+            print("❌ Nie znaleziono punktu kontrolnego do wznowienia")
+            sys.exit(1)
+        agent, punkt_startowy = wczytaj_punkt_kontrolny(nazwa_folderu)
+        logger = konfiguruj_logowanie(nazwa_folderu, dopisz=True)
+        loguj_i_drukuj(logger, "\n" + "=" * 70)
+        loguj_i_drukuj(logger, f"Wznowiono: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} z punktu kontrolnego "
+                               f"(faza {punkt_startowy['faza']}, iteracja {punkt_startowy['iteracja']})")
+        uzyj_reguly = punkt_startowy['uzyj_reguly']
+        ziarno = punkt_startowy.get('ziarno')
+    else:
+        nazwa_folderu, licznik = folder_bazowy, 1
+        while os.path.exists(nazwa_folderu):
+            nazwa_folderu = f"{folder_bazowy}_{licznik}"
+            licznik += 1
+        os.makedirs(nazwa_folderu, exist_ok=True)
+
+        logger = konfiguruj_logowanie(nazwa_folderu)
+        loguj_i_drukuj(logger, "Szybkie Wielordzeniowe Trenowanie Q-Learning dla Doskonałego Kółko i Krzyżyk")
+        loguj_i_drukuj(logger, "=" * 70)
+        loguj_i_drukuj(logger, f"Folder trenowania: {nazwa_folderu}")
+        loguj_i_drukuj(logger, f"Rozpoczęto: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
 
-    logger = konfiguruj_logowanie(nazwa_folderu)
-    loguj_i_drukuj(logger, "Szybkie Wielordzeniowe Trenowanie Q-Learning dla Doskonałego Kółko i Krzyżyk")
-    loguj_i_drukuj(logger, "=" * 70)
-    loguj_i_drukuj(logger, f"Folder trenowania: {nazwa_folderu}")
-    loguj_i_drukuj(logger, f"Rozpoczęto: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        ziarno = argumenty.ziarno
+        if ziarno is not None:
+            loguj_i_drukuj(logger, f"Ziarno przebiegu: {ziarno}")
+            random.seed(ziarno)
+            np.random.seed(ziarno)
+        uzyj_reguly = False
+        agent = AgentQLearning(wspolczynnik_uczenia=0.3, wspolczynnik_dyskontujacy=0.95, gesta_tabela=True,
+                               rownowaznosc_symetrii=True, kroki_zwrotu=argumenty.kroki,
+                               lambda_sladu=argumenty.lambda_sladu)
 
-    uzyj_reguly = False
-    agent = AgentQLearning(wspolczynnik_uczenia=0.3, wspolczynnik_dyskontujacy=0.95)
+        ucz_sie_od_minimax(logger, agent, liczba_gier=500, uzyj_reguly=uzyj_reguly)
+        zapisz_punkt_kontrolny(nazwa_folderu, agent, 1, 0, uzyj_reguly, ziarno)
 
-    ucz_sie_od_minimax(logger, agent, liczba_gier=500, uzyj_reguly=uzyj_reguly)
+    pozycja = (punkt_startowy['faza'], punkt_startowy['iteracja']) if punkt_startowy else (1, 0)
+    punkt_kontrolny = lambda faza, iteracja: zapisz_punkt_kontrolny(nazwa_folderu, agent, faza, iteracja, uzyj_reguly,
+                                                                    ziarno, pula.numer_zadania)
 
-    agent = trenuj_doskonaly_agent(logger, agent, uzyj_reguly=uzyj_reguly)
+    telemetria = Telemetria(nazwa_folderu, dopisz=punkt_startowy is not None,
+                            mierz_serializacje=argumenty.mierz_serializacje)
+    with PulaTreningowa(ziarno=ziarno, telemetria=telemetria) as pula:
+        if punkt_startowy:
+            pula.numer_zadania = punkt_startowy.get('numer_zadania', 0)
+        agent = trenuj_doskonaly_agent(logger, agent, uzyj_reguly=uzyj_reguly, pula=pula, pozycja=pozycja,
+                                       punkt_kontrolny=punkt_kontrolny,
+                                       bufor=BuforPowtorek(ziarno=ziarno) if argumenty.powtorki else None,
+                                       wczesne_zatrzymanie=not argumenty.bez_wczesnego_zatrzymania)
 
-    loguj_i_drukuj(logger, "\nKońcowa faza weryfikacji (rozszerzona)...")
-    loguj_i_drukuj(logger, "🎯 Testowanie przeciwko WSZYSTKIM dostępnym AI z większą liczbą gier")
+        loguj_i_drukuj(logger, "\nKońcowa faza weryfikacji (rozszerzona)...")
+        loguj_i_drukuj(logger, "🎯 Testowanie przeciwko WSZYSTKIM dostępnym AI z większą liczbą gier")
 
-    wyniki_weryfikacji = weryfikacja_miedzyetapowa(logger, agent, liczba_gier_na_poziom=2000, uzyj_reguly=uzyj_reguly)
+        wyniki_weryfikacji = weryfikacja_miedzyetapowa(logger, agent, liczba_gier_na_poziom=2000,
+                                                       uzyj_reguly=uzyj_reguly, pula=pula)
 
     czy_doskonaly = wyniki_weryfikacji['perfect_vs_easy'] and wyniki_weryfikacji['perfect_vs_minimax']
 
@@ -441,12 +1128,14 @@ if __name__ == "__main__":
         'training_method': '3-phase-q-learning-curriculum', 'is_perfect': czy_doskonaly,
         'q_table_size': len(agent.tabela_q), 'timestamp': datetime.now().isoformat(),
         'rules_available': True,
+        'symmetry_equivariant': agent.rownowaznosc_symetrii,
+        'colour_normalized': agent.normalizacja_koloru,
         'trained_with_rules': uzyj_reguly,
         'trained_against': ['random', 'self', 'reguly', 'minimax', 'smart_random'],
         'final_tests_vs_all_ai': True
     }
-    with open(plik_modelu, 'wb') as f:
-        pickle.dump(dane, f)
+    zapisz_atomowo(plik_modelu, dane)
+    zapisz_model_binarny(os.path.join(nazwa_folderu, 'model' + ROZSZERZENIE_MODELU), agent.tabela_q, dane)
     rozmiar_pliku = os.path.getsize(plik_modelu) / 1024
     loguj_i_drukuj(logger, f"\nModel zapisany do {plik_modelu} ({rozmiar_pliku:.1f} KB)")
     loguj_i_drukuj(logger, "\n" + "=" * 70)
@@ -459,4 +1148,5 @@ if __name__ == "__main__":
                        "SILNY AGENT WYTRENOWANY, ALE NIE W PEŁNI DOSKONAŁY. Rozważ więcej trenowania lub modyfikację harmonogramu.")
 
     loguj_i_drukuj(logger, f"\nŁączny czas: {(time.time() - czas_startu) / 60:.1f} minut.")
+    loguj_i_drukuj(logger, f"Podsumowanie telemetrii: python -m ai.telemetria {nazwa_folderu}")
     loguj_i_drukuj(logger, f"Zakończono: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
\ No newline at end of file
@@ -0,0 +1,188 @@
+import os
+import sys
+import time
+import random
+import argparse
+from collections import Counter, defaultdict
+from datetime import datetime
+from multiprocessing import Pool, cpu_count
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(current_dir, '..')))
+
+from gra.logika import StanGry
+from ai.minimax import znajdz_najlepszy_ruch as minimax_najlepszy_ruch
+from ai.reguly import znajdz_najlepszy_ruch as reguly_najlepszy_ruch
+from ai.mcts import znajdz_najlepszy_ruch as mcts_najlepszy_ruch
+from ai.hybrydowy import znajdz_najlepszy_ruch as hybrydowy_najlepszy_ruch
+from ai.losowy_gracz import znajdz_najlepszy_ruch as losowy_najlepszy_ruch
+from ai.agent_q_learning import AgentQLearning, konfiguruj_logowanie, loguj_i_drukuj, weryfikacja_miedzyetapowa
+from ai.tabela_q import pozycje_osiagalne
+from ai.model_binarny import zapisz_model_binarny, KWANTYZACJE, ROZSZERZENIE, MAKS_POL
+
+AGENCI = ('minimax', 'reguly', 'mcts', 'hybrydowy', 'losowy')
+
+
+def ruch_agenta(nazwa: str, stan_gry: StanGry, iteracje: int, generator: random.Random) -> Optional[Tuple[int, int]]:
+    if nazwa == 'minimax':
+        return minimax_najlepszy_ruch(stan_gry)
+    if nazwa == 'reguly':
+        return reguly_najlepszy_ruch(stan_gry)
+    if nazwa == 'mcts':
+        return mcts_najlepszy_ruch(stan_gry, iteracje, generator=generator)
+    if nazwa == 'hybrydowy':
+        return hybrydowy_najlepszy_ruch(stan_gry, iteracje, generator=generator)
+    if nazwa == 'losowy':
+        return losowy_najlepszy_ruch(stan_gry)
+    raise ValueError(f"Nieznany agent: {nazwa}")
+
+
+def pozycje_losowe(rozmiar_planszy: int, warunek_wygranej: int, liczba: int, ziarno: int = 0) -> List[StanGry]:
+    # Dla dużych plansz: pozycje niekońcowe z losowych partii, bez powtórzeń planszy
+    generator = random.Random(ziarno)
+    pozycje, widziane = [], set()
+    while len(pozycje) < liczba:
+        stan_gry = StanGry(rozmiar_planszy, warunek_wygranej)
+        while not stan_gry.czy_koniec_gry() and len(pozycje) < liczba:
+            klucz = stan_gry.plansza.tobytes()
+            if klucz not in widziane:
+                widziane.add(klucz)
+                pozycje.append(stan_gry.sklonuj())
+            stan_gry.wykonaj_ruch(*generator.choice(stan_gry.otrzymaj_mozliwe_ruchy()))
+    return pozycje
+
+
+def _rozklady_paczki(argumenty) -> List[Counter]:
+    # Worker: każda pozycja odpytywana `proby` razy - liczności ruchów to rozkład agenta
+    nazwa, iteracje, proby, plansze, rozmiar_planszy, warunek_wygranej, ziarno = argumenty
+    generator = random.Random(ziarno)
+    random.seed(ziarno)
+    np.random.seed(ziarno % 2 ** 32)
+    rozklady = []
+    for plansza, gracz in plansze:
+        stan_gry = StanGry(rozmiar_planszy, warunek_wygranej)
+        stan_gry.plansza = plansza.copy()
+        stan_gry.obecny_gracz = gracz
+        rozklady.append(Counter(ruch_agenta(nazwa, stan_gry, iteracje, generator) for _ in range(proby)))
+    return rozklady
+
+
+def destyluj(nazwa: str, rozmiar_planszy: int = 3, warunek_wygranej: int = 3, iteracje: int = 2000, proby: int = 8,
+             probki: Optional[int] = None, liczba_workerow: Optional[int] = None,
+             ziarno: int = 0) -> Tuple[AgentQLearning, Dict]:
+    # Tabela Q z częstościami ruchów agenta po kluczach kanonicznych; zachłanny wybór z tabeli to ruch
+    # najczęstszy, a ruchy równie częste są remisem losowanym
+    agent = AgentQLearning(rownowaznosc_symetrii=True, rozmiar_planszy=rozmiar_planszy,
+                           warunek_wygranej=warunek_wygranej)
+    if probki is None:
+        pozycje = pozycje_osiagalne(rozmiar_planszy, warunek_wygranej)
+    else:
+        pozycje = pozycje_losowe(rozmiar_planszy, warunek_wygranej, probki, ziarno)
+    # Agent nie musi być symetryczny (reguły wybierają pierwszy wolny róg), więc odpytywana jest każda
+    # plansza klucza, a rozkład klucza to średnia po planszach w układzie planszy kanonicznej
+    plansze, klucze_plansz = [], []
+    for stan_gry in pozycje:
+        klucz, transformacja = agent.kanonizuj_stan(stan_gry.plansza, stan_gry.obecny_gracz)
+        plansze.append((stan_gry.plansza.copy(), stan_gry.obecny_gracz))
+        klucze_plansz.append((klucz, transformacja))
+
+    liczba_workerow = liczba_workerow or cpu_count()
+    # Kilka paczek na workera wyrównuje czas, gdy koszt ruchu zależy od liczby pustych pól
+    rozmiar_paczki = max(1, len(plansze) // (4 * liczba_workerow))
+    zadania = [(nazwa, iteracje, proby, plansze[i:i + rozmiar_paczki], rozmiar_planszy, warunek_wygranej, ziarno + i)
+               for i in range(0, len(plansze), rozmiar_paczki)]
+
+    czas_startu = time.perf_counter()
+    with Pool(liczba_workerow) as pula:
+        rozklady = [rozklad for wynik in pula.map(_rozklady_paczki, zadania) for rozklad in wynik]
+    czas_destylacji = time.perf_counter() - czas_startu
+
+    liczniki, odpytania = defaultdict(int), Counter()
+    for (klucz, transformacja), rozklad in zip(klucze_plansz, rozklady):
+        odpytania[klucz] += proby
+        for ruch, liczba in rozklad.items():
+            if ruch is not None:
+                liczniki[(klucz, agent.akcja_do_klucza(ruch, transformacja))] += liczba
+    tabela = {(klucz, ruch): liczba / odpytania[klucz] for (klucz, ruch), liczba in liczniki.items()}
+    agent.tabela_q = defaultdict(float, tabela)
+
+    czas_startu = time.perf_counter()
+    for plansza, gracz in plansze:
+        stan_gry = StanGry(rozmiar_planszy, warunek_wygranej)
+        stan_gry.plansza, stan_gry.obecny_gracz = plansza, gracz
+        agent.wybierz_akcje(stan_gry, uzyj_heurystyk=False)
+    czas_odczytu = time.perf_counter() - czas_startu
+    return agent, {'stany': len(odpytania), 'plansze': len(plansze), 'wpisy': len(tabela), 'czas_s': czas_destylacji,
+                   'ruch_agenta_ms': 1000 * czas_destylacji * liczba_workerow / max(1, len(plansze) * proby),
+                   'ruch_tabeli_us': 1e6 * czas_odczytu / max(1, len(plansze))}
+
+
+def ruch_z_rozkladu(agent: AgentQLearning, stan_gry: StanGry,
+                    generator: random.Random = random) -> Optional[Tuple[int, int]]:
+    # Losowanie ruchu z zapisanego rozkładu zamiast najczęstszego ruchu; stan spoza tabeli - ruch losowy
+    mozliwe_ruchy = stan_gry.otrzymaj_mozliwe_ruchy()
+    if not mozliwe_ruchy:
+        return None
+    klucz_stanu, transformacja = agent.kanonizuj_stan(stan_gry.plansza, stan_gry.obecny_gracz)
+    wagi = agent.wartosci_q(klucz_stanu, [agent.akcja_do_klucza(ruch, transformacja) for ruch in mozliwe_ruchy])
+    if sum(wagi) <= 0:
+        return generator.choice(mozliwe_ruchy)
+    return generator.choices(mozliwe_ruchy, weights=wagi)[0]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Destylacja polityki agenta przeszukującego do tabeli Q")
+    parser.add_argument('agent', choices=AGENCI)
+    parser.add_argument('--iteracje', type=int, default=2000, help="iteracje MCTS / agenta hybrydowego")
+    parser.add_argument('--proby', type=int, default=8, help="odpytań agenta na pozycję (rozkład ruchów)")
+    parser.add_argument('--rozmiar', type=int, default=3)
+    parser.add_argument('--warunek', type=int, default=3)
+    parser.add_argument('--probki', type=int, default=None,
+                        help="liczba losowych pozycji zamiast wszystkich osiągalnych (domyślnie dla plansz > 3x3)")
+    parser.add_argument('--workery', type=int, default=None)
+    parser.add_argument('--ziarno', type=int, default=0)
+    parser.add_argument('--kwantyzacja', choices=KWANTYZACJE, default='float16')
+    parser.add_argument('--weryfikacja', type=int, default=0, metavar='GIER',
+                        help="po destylacji rozegraj tyle gier weryfikacyjnych na poziom (plansza 3x3)")
+    argumenty = parser.parse_args()
+    # Sprawdzenie przed destylacją - zapis modelu na końcu i tak by się nie udał
+    if argumenty.rozmiar ** 2 > MAKS_POL:
+        parser.error(f"format {ROZSZERZENIE} koduje plansze do {MAKS_POL} pól (najwyżej 6x6)")
+    if argumenty.probki is None and argumenty.rozmiar > 3:
+        argumenty.probki = 20_000
+
+    folder_bazowy = os.path.join(current_dir, 'q_tables', f'destylacja_{argumenty.agent}')
+    nazwa_folderu, licznik = folder_bazowy, 1
+    while os.path.exists(nazwa_folderu):
+        nazwa_folderu = f"{folder_bazowy}_{licznik}"
+        licznik += 1
+    os.makedirs(nazwa_folderu, exist_ok=True)
+    logger = konfiguruj_logowanie(nazwa_folderu)
+    loguj_i_drukuj(logger, f"Destylacja {argumenty.agent} ({argumenty.proby} odpytań na pozycję, "
+                           f"{argumenty.rozmiar}x{argumenty.rozmiar}, "
+                           f"{'wszystkie pozycje' if argumenty.probki is None else f'{argumenty.probki} pozycji'})")
+
+    agent, raport = destyluj(argumenty.agent, argumenty.rozmiar, argumenty.warunek, argumenty.iteracje,
+                             argumenty.proby, argumenty.probki, argumenty.workery, argumenty.ziarno)
+    loguj_i_drukuj(logger, f"  {raport['plansze']} plansz, {raport['stany']} stanów, {raport['wpisy']} wpisów, {raport['czas_s']:.1f}s | "
+                           f"ruch agenta {raport['ruch_agenta_ms']:.2f} ms -> "
+                           f"odczyt tabeli {raport['ruch_tabeli_us']:.1f} µs")
+
+    if argumenty.weryfikacja and argumenty.rozmiar == 3:
+        weryfikacja_miedzyetapowa(logger, agent, argumenty.weryfikacja)
+
+    dane = {
+        'version': '14.0-distilled', 'training_method': f'distillation-{argumenty.agent}',
+        'distilled_from': argumenty.agent, 'samples_per_state': argumenty.proby,
+        'mcts_iterations': argumenty.iteracje if argumenty.agent in ('mcts', 'hybrydowy') else None,
+        'sampled_positions': argumenty.probki, 'q_table_size': len(agent.tabela_q),
+        'timestamp': datetime.now().isoformat(), 'rules_available': True,
+        'symmetry_equivariant': agent.rownowaznosc_symetrii, 'colour_normalized': agent.normalizacja_koloru,
+        'rozmiar_planszy': agent.rozmiar_planszy, 'warunek_wygranej': agent.warunek_wygranej,
+    }
+    plik_modelu = os.path.join(nazwa_folderu, 'model' + ROZSZERZENIE)
+    zapisz_model_binarny(plik_modelu, agent.tabela_q, dane, kwantyzacja=argumenty.kwantyzacja)
+    loguj_i_drukuj(logger, f"Model zapisany do {plik_modelu} ({os.path.getsize(plik_modelu) / 1024:.1f} KB)")
@@ -0,0 +1,178 @@
+import os
+import sys
+import pickle
+import argparse
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(current_dir, '..')))
+
+from gra.logika import StanGry
+from ai.agent_q_learning import AgentQLearning, TOLERANCJA_REMISU
+from ai.reguly import znajdz_najlepszy_ruch as reguly_najlepszy_ruch
+from ai.model_binarny import (TabelaQMapowana, czy_model_binarny, zapisz_model_binarny, kwantyzuj, odkwantyzuj,
+                              KWANTYZACJE, BRAK_INT8, ROZSZERZENIE)
+
+
+def pozycje_odpytywane(agent: AgentQLearning) -> List[StanGry]:
+    # Pozycje, w których agent grający zachłannie sięga do tabeli Q, po obu stronach i przeciwko każdemu
+    # ruchowi przeciwnika. Ruchy z heurystyki wygrana/blok i z reguł nie czytają tabeli, ale prowadzą
+    # do dalszych pozycji - liczone są oba tryby gry (z regułami i bez).
+    pozycje = []
+    odwiedzone = set()
+    do_odwiedzenia = [(StanGry(agent.rozmiar_planszy, agent.warunek_wygranej), gracz) for gracz in (1, -1)]
+    while do_odwiedzenia:
+        stan_gry, gracz_agenta = do_odwiedzenia.pop()
+        if stan_gry.czy_koniec_gry():
+            continue
+        if stan_gry.obecny_gracz == gracz_agenta:
+            ruch_z_regul = reguly_najlepszy_ruch(stan_gry)
+            ruchy = {ruch_z_regul} if ruch_z_regul else set()
+            wymuszony_ruch = agent.wygrana_lub_blok(stan_gry)
+            if wymuszony_ruch:
+                ruchy.add(wymuszony_ruch)
+            else:
+                pozycje.append(stan_gry)
+                ruchy.update(agent.najlepsze_ruchy(stan_gry))
+        else:
+            ruchy = stan_gry.otrzymaj_mozliwe_ruchy()
+        for ruch in ruchy:
+            nastepny = stan_gry.sklonuj()
+            nastepny.wykonaj_ruch(*ruch)
+            klucz = (nastepny.plansza.tobytes(), gracz_agenta)
+            if klucz not in odwiedzone:
+                odwiedzone.add(klucz)
+                do_odwiedzenia.append((nastepny, gracz_agenta))
+    return pozycje
+
+
+def przytnij(agent: AgentQLearning, pozycje: List[StanGry]) -> Dict:
+    # Zostają wpisy stanów odpytywanych przez politykę; wpis 0.0 jest zbędny, bo brak wpisu czytany jest jako 0
+    klucze = {agent.pobierz_klucz_stanu(stan_gry.plansza, stan_gry.obecny_gracz) for stan_gry in pozycje}
+    return {(klucz, ruch): wartosc for (klucz, ruch), wartosc in agent.tabela_q.items()
+            if klucz in klucze and wartosc != 0.0}
+
+
+def _nizsza_wartosc(kod, granica: float, kwantyzacja: str, skala: float):
+    # Najbliższy kod poniżej kodu przekazanego, którego wartość jest mniejsza niż granica; None gdy brak zakresu
+    while odkwantyzuj(kod, kwantyzacja, skala) >= granica:
+        if kwantyzacja == 'int8':
+            if kod <= BRAK_INT8 + 1:
+                return None
+            kod = np.int8(kod - 1)
+        else:
+            kod = np.nextafter(kod, np.float16(-np.inf), dtype=np.float16)
+            if not np.isfinite(kod):
+                return None
+    return kod
+
+
+def akcje_odpytywane(agent: AgentQLearning, pozycje: List[StanGry]) -> Dict[tuple, List[int]]:
+    # Pola wiersza czytane przy wyborze ruchu; bez równoważności symetrii akcje są w układzie surowej planszy,
+    # więc różne plansze o tym samym kluczu czytają różne pola
+    akcje = defaultdict(set)
+    for stan_gry in pozycje:
+        klucz, transformacja = agent.kanonizuj_stan(stan_gry.plansza, stan_gry.obecny_gracz)
+        for ruch in stan_gry.otrzymaj_mozliwe_ruchy():
+            rzad, kolumna = agent.akcja_do_klucza(ruch, transformacja)
+            akcje[klucz].add(rzad * agent.rozmiar_planszy + kolumna)
+    return {klucz: sorted(pola) for klucz, pola in akcje.items()}
+
+
+def kwantyzuj_polityke(agent: AgentQLearning, akcje_kluczy: Dict[tuple, List[int]],
+                       kwantyzacja: str) -> Optional[Tuple[Dict, float]]:
+    # Kwantyzacja zachowująca relację remisu między czytanymi polami wiersza: idąc od największej wartości,
+    # pole w granicy remisu poprzedniego dostaje jego kod, a pole poza nią schodzi na kod leżący poza granicą.
+    # Brakujący wpis czytany jest jako 0, więc też bierze udział (i zostaje zapisany, jeśli zmieni wartość).
+    klucze = sorted(akcje_kluczy)
+    rozmiar_planszy = agent.rozmiar_planszy
+    wartosci = np.full((len(klucze), rozmiar_planszy * rozmiar_planszy), np.nan)
+    for i, klucz in enumerate(klucze):
+        ruchy = [divmod(pole, rozmiar_planszy) for pole in akcje_kluczy[klucz]]
+        wartosci[i, akcje_kluczy[klucz]] = agent.wartosci_q(klucz, ruchy)
+    kody, skala = kwantyzuj(wartosci, kwantyzacja)
+    for wiersz, kody_wiersza, klucz in zip(wartosci, kody, klucze):
+        pola = np.array(akcje_kluczy[klucz])
+        kolejnosc = pola[np.argsort(-wiersz[pola], kind='stable')]
+        for poprzednie, pole in zip(kolejnosc, kolejnosc[1:]):
+            if wiersz[poprzednie] - wiersz[pole] <= TOLERANCJA_REMISU:
+                kody_wiersza[pole] = kody_wiersza[poprzednie]
+                continue
+            granica = odkwantyzuj(kody_wiersza[poprzednie], kwantyzacja, skala) - TOLERANCJA_REMISU
+            kod = _nizsza_wartosc(min(kody_wiersza[pole], kody_wiersza[poprzednie]), granica, kwantyzacja, skala)
+            if kod is None:
+                return None
+            kody_wiersza[pole] = kod
+    wynik = odkwantyzuj(kody, kwantyzacja, skala)
+    return {(klucz, divmod(int(pole), rozmiar_planszy)): float(wynik[i, pole])
+            for i, klucz in enumerate(klucze) for pole in akcje_kluczy[klucz] if wynik[i, pole] != 0.0}, skala
+
+
+def niezgodne_pozycje(agent: AgentQLearning, agent_eksportu: AgentQLearning, pozycje: List[StanGry]) -> int:
+    # Porównywany jest cały zbiór ruchów zachłannych (z remisami), więc rozkład gry zostaje identyczny
+    return sum(set(agent.najlepsze_ruchy(stan_gry)) != set(agent_eksportu.najlepsze_ruchy(stan_gry))
+               for stan_gry in pozycje)
+
+
+def wczytaj_metadane(sciezka: str) -> Dict:
+    if czy_model_binarny(sciezka):
+        return dict(TabelaQMapowana(sciezka).metadane)
+    with open(sciezka, 'rb') as f:
+        dane = pickle.load(f)
+    return {klucz: wartosc for klucz, wartosc in dane.items() if klucz != 'q_table'}
+
+
+def eksportuj(sciezka_zrodla: str, sciezka_docelowa: str, kwantyzacja: str = 'int8') -> Dict:
+    # Kwantyzacja zmieniająca choć jeden ruch zachłanny jest odrzucana na rzecz dokładniejszej (int8 -> float16 -> float32)
+    agent = AgentQLearning()
+    agent.zaladuj_tabele_q(sciezka_zrodla)
+    pozycje = pozycje_odpytywane(agent)
+    tabela = przytnij(agent, pozycje)
+    akcje_kluczy = akcje_odpytywane(agent, pozycje)
+    metadane = dict(wczytaj_metadane(sciezka_zrodla), pruned=True,
+                    exported_from=os.path.basename(sciezka_zrodla))
+    metadane.pop('kwantyzacja', None)
+    metadane.pop('skala', None)
+
+    raport = {'wpisy_zrodla': len(agent.tabela_q), 'wpisy_eksportu': len(tabela), 'pozycje': len(pozycje),
+              'rozmiar_zrodla': os.path.getsize(sciezka_zrodla), 'odrzucone': {}}
+    kolejne = KWANTYZACJE[:KWANTYZACJE.index(kwantyzacja) + 1][::-1]
+    for typ in kolejne:
+        if typ == 'float32':
+            wynik, skala = tabela, None
+        else:
+            kwantyzowana = kwantyzuj_polityke(agent, akcje_kluczy, typ)
+            if kwantyzowana is None:
+                # Zakres typu nie mieści wartości rozsuniętych o granicę remisu
+                raport['odrzucone'][typ] = len(pozycje)
+                continue
+            wynik, skala = kwantyzowana
+        zapisz_model_binarny(sciezka_docelowa, wynik, metadane, kwantyzacja=typ, skala=skala)
+        agent_eksportu = AgentQLearning()
+        agent_eksportu.zaladuj_tabele_q(sciezka_docelowa)
+        niezgodne = niezgodne_pozycje(agent, agent_eksportu, pozycje)
+        if niezgodne == 0:
+            raport.update(kwantyzacja=typ, wpisy_eksportu=len(wynik), rozmiar_eksportu=os.path.getsize(sciezka_docelowa))
+            return raport
+        raport['odrzucone'][typ] = niezgodne
+    raise ValueError(f"Eksport zmienia politykę w {raport['odrzucone']['float32']} pozycjach")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Eksport przyciętego i skwantyzowanego modelu Q dla klientów")
+    parser.add_argument('zrodlo', help="model .pkl albo .qtab")
+    parser.add_argument('cel', nargs='?', default=None, help="plik wynikowy (domyślnie <zrodlo>_eksport.qtab)")
+    parser.add_argument('--kwantyzacja', choices=KWANTYZACJE, default='int8')
+    argumenty = parser.parse_args()
+
+    cel = argumenty.cel or os.path.splitext(argumenty.zrodlo)[0] + '_eksport' + ROZSZERZENIE
+    raport = eksportuj(argumenty.zrodlo, cel, argumenty.kwantyzacja)
+    for typ, niezgodne in raport['odrzucone'].items():
+        print(f"⚠️  {typ}: zmienia ruch zachłanny w {niezgodne} pozycjach - odrzucono")
+    print(f"Pozycje odpytywane przez politykę: {raport['pozycje']}")
+    print(f"Wpisy Q: {raport['wpisy_zrodla']} -> {raport['wpisy_eksportu']} ({raport['kwantyzacja']})")
+    print(f"Zapisano {cel}: {raport['rozmiar_zrodla'] / 1024:.1f} KB -> {raport['rozmiar_eksportu'] / 1024:.1f} KB, "
+          f"polityka identyczna we wszystkich pozycjach")
@@ -0,0 +1,43 @@
+import math
+import random
+from typing import Tuple, Optional, Dict
+from gra.logika import StanGry
+from ai.mcts import AgentMCTS, HarmonogramRAVE, przytnij_tablice
+from ai.minimax import rozwiaz_dokladnie
+
+
+class AgentHybrydowy:
+    def __init__(self, prog_pustych_pol: int = 10, iteracje: int = 1000, stala_eksploracji: float = math.sqrt(2),
+                 harmonogram_rave: Optional[HarmonogramRAVE] = None, limit_tablicy: int = 1_000_000,
+                 generator: random.Random = random):
+        self.prog_pustych_pol = prog_pustych_pol
+        self.generator = generator
+        self.limit_tablicy = limit_tablicy
+        # Tablica rozwiązań jest wspólna dla wyszukiwania dokładnego i liści MCTS, więc działa jak baza końcówek
+        self.tablica_rozwiazan: Dict[Tuple[Tuple[int, ...], int], Tuple[int, int]] = {}
+        self.mcts = AgentMCTS(iteracje=iteracje, stala_eksploracji=stala_eksploracji, uzyj_solvera=True,
+                              uzyj_transpozycji=True, harmonogram_rave=harmonogram_rave,
+                              prog_rozwiazania=prog_pustych_pol, generator=generator, limit_tablicy=limit_tablicy)
+        self.mcts.tablica_rozwiazan = self.tablica_rozwiazan
+
+    def znajdz_ruch(self, stan_gry: StanGry) -> Optional[Tuple[int, int]]:
+        if stan_gry.czy_koniec_gry():
+            return None
+
+        mozliwe_ruchy = stan_gry.otrzymaj_mozliwe_ruchy()
+        if not mozliwe_ruchy:
+            return None
+
+        przytnij_tablice(self.tablica_rozwiazan, self.limit_tablicy)
+
+        if len(mozliwe_ruchy) <= self.prog_pustych_pol:
+            _, najlepsze_ruchy = rozwiaz_dokladnie(stan_gry, self.tablica_rozwiazan)
+            return self.generator.choice(najlepsze_ruchy)
+
+        return self.mcts.znajdz_ruch(stan_gry)
+
+
+def znajdz_najlepszy_ruch(stan_gry: StanGry, iteracje: int = 1000, prog_pustych_pol: int = 10,
+                          generator: random.Random = random) -> Optional[Tuple[int, int]]:
+    agent = AgentHybrydowy(prog_pustych_pol=prog_pustych_pol, iteracje=iteracje, generator=generator)
+    return agent.znajdz_ruch(stan_gry)
@@ -0,0 +1,177 @@
+import os
+import sys
+import time
+import argparse
+from collections import defaultdict
+from datetime import datetime
+from typing import Tuple, Dict, List
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(current_dir, '..')))
+
+from gra.logika import StanGry
+from ai.agent_q_learning import (AgentQLearning, zapisz_atomowo, konfiguruj_logowanie, loguj_i_drukuj,
+                                 weryfikacja_miedzyetapowa)
+from ai.tabela_q import GestaTabelaQ, pozycje_osiagalne
+from ai.tabele_przeciwnikow import tabela_przeciwnika
+from ai.symetrie import ruch_do_kanonicznego
+from ai.model_binarny import zapisz_model_binarny, ROZSZERZENIE
+
+PRZECIWNICY = ('minimax', 'reguly', 'random')
+
+
+def rozklad_przeciwnika(przeciwnik: str, stan_gry: StanGry) -> List[Tuple[Tuple[int, int], float]]:
+    if przeciwnik == 'random':
+        ruchy = stan_gry.otrzymaj_mozliwe_ruchy()
+    elif przeciwnik in ('minimax', 'reguly'):
+        ruchy = tabela_przeciwnika(przeciwnik, stan_gry.rozmiar_planszy, stan_gry.warunek_wygranej).ruchy(stan_gry)
+    else:
+        raise ValueError(f"Nieznany przeciwnik: {przeciwnik}")
+    return [(ruch, 1.0 / len(ruchy)) for ruch in ruchy]
+
+
+def _nagroda_koncowa(stan_gry: StanGry, gracz_agenta: int) -> float:
+    zwyciezca = stan_gry.sprawdz_zwyciezce()
+    return 0.0 if zwyciezca == 0 else 1.0 if zwyciezca == gracz_agenta else -1.0
+
+
+def zbuduj_przejscia(agent: AgentQLearning, przeciwnik: str, rozmiar_planszy: int = 3, warunek_wygranej: int = 3,
+                     gracze_agenta: Tuple[int, ...] = (1, -1)) -> Tuple[GestaTabelaQ, Dict[str, np.ndarray]]:
+    # Stany decyzji agenta (jego ruch, pozycja niekońcowa) po kanonizacji kluczem agenta. Przejście (stan, akcja)
+    # rozpisane na odpowiedzi przeciwnika: nagroda końcowa albo następny stan decyzji agenta.
+    # Surowe plansze o tym samym kluczu mają równe wagi - dla przeciwnika niesymetrycznego (reguły)
+    # wartość klucza jest średnią po tych planszach.
+    reprezentanci = defaultdict(list)
+    for stan_gry in pozycje_osiagalne(rozmiar_planszy, warunek_wygranej):
+        if stan_gry.obecny_gracz in gracze_agenta:
+            klucz, transformacja = agent.kanonizuj_stan(stan_gry.plansza, stan_gry.obecny_gracz)
+            reprezentanci[klucz].append((stan_gry, transformacja))
+
+    tabela = GestaTabelaQ(rozmiar_planszy, pojemnosc=max(1, len(reprezentanci)))
+    for klucz in sorted(reprezentanci):
+        tabela.indeks_stanu(klucz, dodaj=True)
+
+    wejscia, prawdopodobienstwa, nagrody, nastepne = [], [], [], []
+    for klucz, stany in reprezentanci.items():
+        wiersz = tabela.indeks_stanu(klucz)
+        waga = 1.0 / len(stany)
+        for stan_gry, transformacja in stany:
+            gracz = stan_gry.obecny_gracz
+            for ruch in stan_gry.otrzymaj_mozliwe_ruchy():
+                wejscie = wiersz * tabela.liczba_akcji + tabela.indeks_akcji(
+                    ruch_do_kanonicznego(ruch, transformacja, rozmiar_planszy))
+                po_ruchu = stan_gry.sklonuj()
+                po_ruchu.wykonaj_ruch(*ruch)
+                if po_ruchu.czy_koniec_gry():
+                    wejscia.append(wejscie)
+                    prawdopodobienstwa.append(waga)
+                    nagrody.append(_nagroda_koncowa(po_ruchu, gracz))
+                    nastepne.append(-1)
+                    continue
+                for ruch_przeciwnika, prawdopodobienstwo in rozklad_przeciwnika(przeciwnik, po_ruchu):
+                    po_odpowiedzi = po_ruchu.sklonuj()
+                    po_odpowiedzi.wykonaj_ruch(*ruch_przeciwnika)
+                    wejscia.append(wejscie)
+                    prawdopodobienstwa.append(waga * prawdopodobienstwo)
+                    if po_odpowiedzi.czy_koniec_gry():
+                        nagrody.append(_nagroda_koncowa(po_odpowiedzi, gracz))
+                        nastepne.append(-1)
+                    else:
+                        nagrody.append(0.0)
+                        nastepne.append(tabela.indeks_stanu(
+                            agent.pobierz_klucz_stanu(po_odpowiedzi.plansza, po_odpowiedzi.obecny_gracz)))
+    return tabela, {'wejscia': np.array(wejscia, dtype=np.int64),
+                    'prawdopodobienstwa': np.array(prawdopodobienstwa, dtype=np.float64),
+                    'nagrody': np.array(nagrody, dtype=np.float64),
+                    'nastepne': np.array(nastepne, dtype=np.int64)}
+
+
+def iteruj_q(tabela: GestaTabelaQ, przejscia: Dict[str, np.ndarray], wspolczynnik_dyskontujacy: float = 0.95,
+             tolerancja: float = 1e-9, maks_iteracji: int = 1000) -> Tuple[np.ndarray, List[float]]:
+    # Q(s, a) = suma po odpowiedziach p * (r + gamma * max_a' Q(s', a')); gra jest skończona,
+    # więc iteracja zbiega dokładnie po liczbie kroków równej najdłuższej partii agenta
+    liczba_stanow, liczba_akcji = tabela.liczba_stanow, tabela.liczba_akcji
+    legalne = tabela.legalne[:liczba_stanow]
+    koncowe = przejscia['nastepne'] < 0
+    nastepne = np.where(koncowe, 0, przejscia['nastepne'])
+    q = np.zeros(liczba_stanow * liczba_akcji)
+    zmiany = []
+    for _ in range(maks_iteracji):
+        v = np.where(legalne, q.reshape(liczba_stanow, liczba_akcji), -np.inf).max(axis=1)
+        wartosc_nastepnych = np.where(koncowe, 0.0, wspolczynnik_dyskontujacy * v[nastepne])
+        nowe_q = np.bincount(przejscia['wejscia'],
+                             weights=przejscia['prawdopodobienstwa'] * (przejscia['nagrody'] + wartosc_nastepnych),
+                             minlength=liczba_stanow * liczba_akcji)
+        zmiany.append(float(np.abs(nowe_q - q).max()))
+        q = nowe_q
+        if zmiany[-1] < tolerancja:
+            break
+    return q.reshape(liczba_stanow, liczba_akcji), zmiany
+
+
+def wytrenuj_iteracja_wartosci(przeciwnik: str = 'minimax', wspolczynnik_dyskontujacy: float = 0.95,
+                               normalizacja_koloru: bool = False, rozmiar_planszy: int = 3,
+                               warunek_wygranej: int = 3) -> Tuple[AgentQLearning, List[float]]:
+    agent = AgentQLearning(wspolczynnik_dyskontujacy=wspolczynnik_dyskontujacy, rownowaznosc_symetrii=True,
+                           normalizacja_koloru=normalizacja_koloru, rozmiar_planszy=rozmiar_planszy,
+                           warunek_wygranej=warunek_wygranej)
+    tabela, przejscia = zbuduj_przejscia(agent, przeciwnik, rozmiar_planszy, warunek_wygranej)
+    q, zmiany = iteruj_q(tabela, przejscia, wspolczynnik_dyskontujacy)
+    liczba_stanow = tabela.liczba_stanow
+    tabela.wartosci[:liczba_stanow] = q
+    tabela.zapisane[:liczba_stanow] = tabela.legalne[:liczba_stanow]
+    agent.tabela_q = tabela
+    return agent, zmiany
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dokładna iteracja wartości Q zamiast próbkowanego Q-learningu")
+    parser.add_argument('--przeciwnik', choices=PRZECIWNICY, default='minimax')
+    parser.add_argument('--dyskonto', type=float, default=0.95)
+    parser.add_argument('--normalizacja-koloru', action='store_true')
+    parser.add_argument('--rozmiar', type=int, default=3, help="rozmiar planszy")
+    parser.add_argument('--warunek', type=int, default=3, help="liczba pól w linii potrzebna do wygranej")
+    parser.add_argument('--weryfikacja', type=int, default=0, metavar='GIER',
+                        help="po treningu rozegraj tyle gier weryfikacyjnych na poziom")
+    argumenty = parser.parse_args()
+
+    folder_bazowy = os.path.join(current_dir, 'q_tables', f'iteracja_wartosci_{argumenty.przeciwnik}_'
+                                                          f'{argumenty.rozmiar}x{argumenty.rozmiar}_k{argumenty.warunek}')
+    nazwa_folderu, licznik = folder_bazowy, 1
+    while os.path.exists(nazwa_folderu):
+        nazwa_folderu = f"{folder_bazowy}_{licznik}"
+        licznik += 1
+    os.makedirs(nazwa_folderu, exist_ok=True)
+    logger = konfiguruj_logowanie(nazwa_folderu)
+    loguj_i_drukuj(logger, f"Iteracja wartości Q vs {argumenty.przeciwnik} na planszy {argumenty.rozmiar}x"
+                           f"{argumenty.rozmiar} (k={argumenty.warunek}, dyskonto {argumenty.dyskonto})")
+
+    czas_startu = time.time()
+    agent, zmiany = wytrenuj_iteracja_wartosci(argumenty.przeciwnik, argumenty.dyskonto,
+                                               argumenty.normalizacja_koloru, argumenty.rozmiar, argumenty.warunek)
+    loguj_i_drukuj(logger, f"  Zbieżność po {len(zmiany)} iteracjach (ostatnia zmiana {zmiany[-1]:.2e}), "
+                           f"{agent.tabela_q.liczba_stanow} stanów, {len(agent.tabela_q)} wpisów Q, "
+                           f"{time.time() - czas_startu:.1f}s")
+
+    czy_doskonaly = False
+    if argumenty.weryfikacja:
+        wyniki_weryfikacji = weryfikacja_miedzyetapowa(logger, agent, argumenty.weryfikacja)
+        czy_doskonaly = wyniki_weryfikacji['perfect_vs_easy'] and wyniki_weryfikacji['perfect_vs_minimax']
+
+    dane = {
+        'q_table': dict(agent.tabela_q), 'version': '13.0-value-iteration',
+        'training_method': f'value-iteration-vs-{argumenty.przeciwnik}', 'is_perfect': czy_doskonaly,
+        'q_table_size': len(agent.tabela_q), 'timestamp': datetime.now().isoformat(),
+        'rules_available': True,
+        'symmetry_equivariant': agent.rownowaznosc_symetrii,
+        'colour_normalized': agent.normalizacja_koloru,
+        'rozmiar_planszy': agent.rozmiar_planszy, 'warunek_wygranej': agent.warunek_wygranej,
+        'trained_with_rules': False,
+        'trained_against': [argumenty.przeciwnik],
+    }
+    plik_modelu = os.path.join(nazwa_folderu, 'model.pkl')
+    zapisz_atomowo(plik_modelu, dane)
+    zapisz_model_binarny(os.path.join(nazwa_folderu, 'model' + ROZSZERZENIE), agent.tabela_q, dane)
+    loguj_i_drukuj(logger, f"Model zapisany do {plik_modelu}")
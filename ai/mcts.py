@@ -1,8 +1,15 @@
 import math
 import random
-from typing import Tuple, Optional, List
+import itertools
+from typing import Tuple, Optional, List, Dict
 import numpy as np
 from gra.logika import StanGry
+from gra.linie import LicznikiLinii
+from ai.minimax import ocen_dokladnie
+
+
+# Wiersze tablicy statystyk dzieci przechowywanej w węźle rodzica
+ODWIEDZINY, PUNKTY, RAVE_ODWIEDZINY, RAVE_PUNKTY, WYNIKI_UDOWODNIONE = range(5)
 
 
 class wezelMCTS:
@@ -12,46 +19,179 @@ class wezelMCTS:
         self.rodzic = rodzic
         self.ruch_do_wezla = ruch_do_wezla
         self.dzieci: List['wezelMCTS'] = []
+        self.rodzice: List[Tuple['wezelMCTS', int]] = []
+        self.ruchy_dzieci: List[Tuple[int, int]] = []
+        self.indeksy_dzieci: Dict[Tuple[int, int], int] = {}
         self.odwiedziny = 0
         self.punkty = 0.0
+        self.log_odwiedzin = 0.0
         self.dostepne_ruchy = stan_gry.otrzymaj_mozliwe_ruchy().copy()
+        self.liczba_pustych = len(self.dostepne_ruchy)
         if rodzic is None:
             self.gracz = None
         else:
             self.gracz = rodzic.stan_gry.obecny_gracz
-        
+        self.zwyciezca = stan_gry.sprawdz_zwyciezce()
+        # Wynik z perspektywy gracza, który wykonał ruch prowadzący do węzła: 1.0, 0.5, 0.0 lub None
+        self.wynik_udowodniony: Optional[float] = None
+        # Statystyki krawędzi do dzieci w ciągłej pamięci, żeby wybór UCB był jednym argmax
+        self.statystyki_dzieci = np.zeros((5, len(self.dostepne_ruchy)))
+        self.statystyki_dzieci[WYNIKI_UDOWODNIONE] = np.nan
+
     def czy_rozwiniety(self) -> bool:
         return len(self.dostepne_ruchy) == 0
     
     def czy_koncowy(self) -> bool:
-        return self.stan_gry.czy_koniec_gry()
+        return self.zwyciezca is not None
     
     def dodaj_dziecko(self, ruch: Tuple[int, int], stan_gry: StanGry) -> 'wezelMCTS':
         dziecko = wezelMCTS(stan_gry, rodzic=self, ruch_do_wezla=ruch)
+        self._zapisz_krawedz(ruch, dziecko)
+        return dziecko
+
+    def dolacz_dziecko(self, ruch: Tuple[int, int], dziecko: 'wezelMCTS') -> None:
+        self._zapisz_krawedz(ruch, dziecko)
+        if dziecko.wynik_udowodniony is not None and self.sprobuj_udowodnic():
+            self.propaguj_dowod()
+
+    def _zapisz_krawedz(self, ruch: Tuple[int, int], dziecko: 'wezelMCTS') -> None:
+        indeks = len(self.dzieci)
+        self.indeksy_dzieci[ruch] = indeks
         self.dzieci.append(dziecko)
+        self.ruchy_dzieci.append(ruch)
         self.dostepne_ruchy.remove(ruch)
-        return dziecko
+        dziecko.rodzice.append((self, indeks))
+        if dziecko.wynik_udowodniony is not None:
+            self.statystyki_dzieci[WYNIKI_UDOWODNIONE, indeks] = dziecko.wynik_udowodniony
+
+    def udowodnij_koncowy(self) -> None:
+        gracz_ruchu = -self.stan_gry.obecny_gracz
+        if self.zwyciezca == 0:
+            self.wynik_udowodniony = 0.5
+        else:
+            self.wynik_udowodniony = 1.0 if self.zwyciezca == gracz_ruchu else 0.0
+
+    def sprobuj_udowodnic(self) -> bool:
+        if self.wynik_udowodniony is not None or not self.dzieci:
+            return False
+        wyniki_dzieci = self.statystyki_dzieci[WYNIKI_UDOWODNIONE, :len(self.dzieci)]
+        if (wyniki_dzieci == 1.0).any():
+            self.wynik_udowodniony = 0.0
+        elif self.czy_rozwiniety() and not np.isnan(wyniki_dzieci).any():
+            self.wynik_udowodniony = 1.0 - float(wyniki_dzieci.max())
+        return self.wynik_udowodniony is not None
+
+    def propaguj_dowod(self) -> None:
+        # W grafie transpozycji dowód musi dotrzeć do wszystkich rodziców, nie tylko tych z bieżącej ścieżki
+        do_ogloszenia = [self]
+        while do_ogloszenia:
+            wezel = do_ogloszenia.pop()
+            for rodzic, indeks in wezel.rodzice:
+                rodzic.statystyki_dzieci[WYNIKI_UDOWODNIONE, indeks] = wezel.wynik_udowodniony
+                if rodzic.sprobuj_udowodnic():
+                    do_ogloszenia.append(rodzic)
     
-    def wartosc_ucb(self, stala_eksploracji: float = math.sqrt(2)) -> float:
-        if self.odwiedziny == 0:
+    def wartosc_ucb(self, stala_eksploracji: float = math.sqrt(2),
+                    harmonogram_rave: Optional['HarmonogramRAVE'] = None) -> float:
+        # Wartość jednej krawędzi ze statystyk w rodzicu (ta sama formuła co wartosci_ucb); wybór dziecka
+        # liczy wszystkie krawędzie naraz przez wartosci_ucb
+        if self.rodzic is None:
             return float('inf')
-        
-        exploitation = self.punkty / self.odwiedziny
-        exploration = stala_eksploracji * math.sqrt(math.log(self.rodzic.odwiedziny) / self.odwiedziny)
-        return exploitation + exploration
-    
-    def wybierz_najlepsze_dziecko(self, stala_eksploracji: float = math.sqrt(2)) -> 'wezelMCTS':
-        return max(self.dzieci, key=lambda c: c.wartosc_ucb(stala_eksploracji))
-    
+        rodzic = self.rodzic
+        statystyki = rodzic.statystyki_dzieci[:, rodzic.indeksy_dzieci[self.ruch_do_wezla]]
+        odwiedziny = statystyki[ODWIEDZINY]
+        if odwiedziny == 0:
+            return float('inf')
+        exploitation = statystyki[PUNKTY] / odwiedziny
+        rave_odwiedziny = statystyki[RAVE_ODWIEDZINY]
+        if harmonogram_rave is not None and rave_odwiedziny > 0:
+            beta = harmonogram_rave.beta(odwiedziny, rave_odwiedziny)
+            exploitation = (1.0 - beta) * exploitation + beta * statystyki[RAVE_PUNKTY] / rave_odwiedziny
+        return float(exploitation + stala_eksploracji * math.sqrt(rodzic.log_odwiedzin / odwiedziny))
+
+    def wartosci_ucb(self, stala_eksploracji: float = math.sqrt(2),
+                     harmonogram_rave: Optional['HarmonogramRAVE'] = None) -> np.ndarray:
+        statystyki = self.statystyki_dzieci[:, :len(self.dzieci)]
+        odwiedziny = statystyki[ODWIEDZINY]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            exploitation = statystyki[PUNKTY] / odwiedziny
+            if harmonogram_rave is not None:
+                rave_odwiedziny = statystyki[RAVE_ODWIEDZINY]
+                beta = harmonogram_rave.beta(odwiedziny, rave_odwiedziny)
+                exploitation = np.where(rave_odwiedziny > 0,
+                                        (1.0 - beta) * exploitation + beta * statystyki[RAVE_PUNKTY] / rave_odwiedziny,
+                                        exploitation)
+            wartosci = exploitation + stala_eksploracji * np.sqrt(self.log_odwiedzin / odwiedziny)
+        wartosci[odwiedziny == 0] = np.inf
+        return wartosci
+
+    def indeks_najlepszego_dziecka(self, stala_eksploracji: float = math.sqrt(2), pomin_udowodnione: bool = False,
+                                   harmonogram_rave: Optional['HarmonogramRAVE'] = None) -> int:
+        wartosci = self.wartosci_ucb(stala_eksploracji, harmonogram_rave)
+        if pomin_udowodnione:
+            udowodnione = ~np.isnan(self.statystyki_dzieci[WYNIKI_UDOWODNIONE, :len(self.dzieci)])
+            if not udowodnione.all():
+                wartosci[udowodnione] = -np.inf
+        return int(np.argmax(wartosci))
+
+    def wybierz_najlepsze_dziecko(self, stala_eksploracji: float = math.sqrt(2),
+                                  pomin_udowodnione: bool = False) -> 'wezelMCTS':
+        return self.dzieci[self.indeks_najlepszego_dziecka(stala_eksploracji, pomin_udowodnione)]
+
     def aktualizuj(self, wynik: float) -> None:
         self.odwiedziny += 1
         self.punkty += wynik
+        self.log_odwiedzin = math.log(self.odwiedziny)
+
+    def aktualizuj_krawedz(self, indeks: int, wynik: float) -> None:
+        self.statystyki_dzieci[ODWIEDZINY, indeks] += 1
+        self.statystyki_dzieci[PUNKTY, indeks] += wynik
+
+    def aktualizuj_rave_krawedzi(self, indeks: int, wynik: float) -> None:
+        self.statystyki_dzieci[RAVE_ODWIEDZINY, indeks] += 1
+        self.statystyki_dzieci[RAVE_PUNKTY, indeks] += wynik
+
+
+def przytnij_tablice(tablica: Dict, limit: int) -> None:
+    # Słownik pamięta kolejność wstawiania, więc na początku leżą wpisy najstarszych wyszukiwań. Wołane przed
+    # wyszukiwaniem: po przekroczeniu limitu zostaje najnowsza połowa, dowody bieżącego wyszukiwania nie giną.
+    if len(tablica) > limit:
+        for klucz in list(itertools.islice(tablica, len(tablica) - limit // 2)):
+            del tablica[klucz]
+
+
+class HarmonogramRAVE:
+    def __init__(self, rodzaj: str = "sqrt", k: float = 300.0, b: float = 0.1):
+        if rodzaj not in ("sqrt", "mse"):
+            raise ValueError(f"Nieznany harmonogram RAVE: {rodzaj}")
+        self.rodzaj = rodzaj
+        self.k = k
+        self.b = b
+
+    def beta(self, odwiedziny: int, rave_odwiedziny: int) -> float:
+        if self.rodzaj == "sqrt":
+            # Gelly i Silver: beta spada do 1/2 po k odwiedzinach
+            return np.sqrt(self.k / (3 * odwiedziny + self.k))
+        # Harmonogram minimalizujący błąd średniokwadratowy, b - szacowane obciążenie AMAF
+        return rave_odwiedziny / (odwiedziny + rave_odwiedziny
+                                  + 4 * self.b ** 2 * odwiedziny * rave_odwiedziny)
 
 
 class AgentMCTS:
-    def __init__(self, iteracje: int = 1000, stala_eksploracji: float = math.sqrt(2)):
+    def __init__(self, iteracje: int = 1000, stala_eksploracji: float = math.sqrt(2),
+                 uzyj_solvera: bool = False, uzyj_transpozycji: bool = False,
+                 harmonogram_rave: Optional[HarmonogramRAVE] = None, prog_rozwiazania: int = 0,
+                 generator: random.Random = random, limit_tablicy: int = 1_000_000):
         self.iteracje = iteracje
+        self.generator = generator
         self.stala_eksploracji = stala_eksploracji
+        self.uzyj_solvera = uzyj_solvera
+        self.uzyj_transpozycji = uzyj_transpozycji
+        self.harmonogram_rave = harmonogram_rave
+        self.prog_rozwiazania = prog_rozwiazania
+        self.limit_tablicy = limit_tablicy
+        self.tabela_transpozycji: Dict[Tuple[bytes, int], wezelMCTS] = {}
+        self.tablica_rozwiazan: Dict[Tuple[Tuple[int, ...], int], Tuple[int, int]] = {}
 
     def znajdz_ruch(self, stan_gry: StanGry) -> Optional[Tuple[int, int]]:
         if stan_gry.czy_koniec_gry():
@@ -64,44 +204,123 @@ class AgentMCTS:
         if len(mozliwe_ruchy) == 1:
             return mozliwe_ruchy[0]
 
+        # Tablica rozwiązań żyje między wyszukiwaniami (i bywa dzielona z agentem hybrydowym), więc przycinana
+        # jest w miejscu
+        przytnij_tablice(self.tablica_rozwiazan, self.limit_tablicy)
+
         korzen = wezelMCTS(stan_gry)
         gracz_poczatkowy = stan_gry.obecny_gracz
+        self.tabela_transpozycji = {}
+        if self.uzyj_transpozycji:
+            self.tabela_transpozycji[self._klucz_transpozycji(stan_gry)] = korzen
 
         for _ in range(self.iteracje):
-            wezel = self._wybierz_i_rozwijaj(korzen)
-            wynik = self._symuluj(wezel.stan_gry, gracz_poczatkowy)
-            self._proguj_wstecz(wezel, wynik, gracz_poczatkowy)
+            if korzen.wynik_udowodniony is not None:
+                break
+            sciezka, ruchy_sciezki = self._wybierz_i_rozwijaj(korzen)
+            wezel = sciezka[-1]
+            if (wezel.wynik_udowodniony is None and not wezel.czy_koncowy()
+                    and wezel.liczba_pustych <= self.prog_rozwiazania):
+                self._rozwiaz_lisc(wezel)
+            ruchy_symulacji = []
+            if wezel.wynik_udowodniony is not None:
+                wynik = self._wynik_udowodniony_dla(wezel, gracz_poczatkowy)
+            else:
+                wynik = self._symuluj(wezel.stan_gry, gracz_poczatkowy, ruchy_symulacji)
+            self._proguj_wstecz(sciezka, ruchy_sciezki, wynik, gracz_poczatkowy)
+            if self.harmonogram_rave is not None:
+                self._proguj_wstecz_rave(sciezka, ruchy_sciezki, ruchy_symulacji, wynik, gracz_poczatkowy)
 
+        self.tabela_transpozycji = {}
         if not korzen.dzieci:
-            return random.choice(mozliwe_ruchy)
+            return self.generator.choice(mozliwe_ruchy)
+
+        if self.uzyj_solvera:
+            return self._wybierz_ruch_solvera(korzen)
 
         najlepsze_dziecko = max(korzen.dzieci, key=lambda c: c.odwiedziny)
         return najlepsze_dziecko.ruch_do_wezla
 
-    def _wybierz_i_rozwijaj(self, korzen: wezelMCTS) -> wezelMCTS:
+    def _wybierz_i_rozwijaj(self, korzen: wezelMCTS) -> Tuple[List[wezelMCTS], List[Tuple[int, int]]]:
         wezel = korzen
-        while not wezel.czy_koncowy() and wezel.czy_rozwiniety():
-            wezel = wezel.wybierz_najlepsze_dziecko(self.stala_eksploracji)
+        sciezka = [korzen]
+        ruchy_sciezki = []
+        while not wezel.czy_koncowy() and wezel.czy_rozwiniety() and wezel.wynik_udowodniony is None:
+            indeks = wezel.indeks_najlepszego_dziecka(self.stala_eksploracji, self.uzyj_solvera,
+                                                      self.harmonogram_rave)
+            ruchy_sciezki.append(wezel.ruchy_dzieci[indeks])
+            wezel = wezel.dzieci[indeks]
+            sciezka.append(wezel)
 
-        if not wezel.czy_koncowy() and not wezel.czy_rozwiniety():
-            ruch = random.choice(wezel.dostepne_ruchy)
+        if not wezel.czy_koncowy() and not wezel.czy_rozwiniety() and wezel.wynik_udowodniony is None:
+            ruch = self.generator.choice(wezel.dostepne_ruchy)
             nowy_stan = wezel.stan_gry.sklonuj()
             nowy_stan.wykonaj_ruch(ruch[0], ruch[1])
-            wezel = wezel.dodaj_dziecko(ruch, nowy_stan)
+            istniejacy = None
+            if self.uzyj_transpozycji:
+                klucz = self._klucz_transpozycji(nowy_stan)
+                istniejacy = self.tabela_transpozycji.get(klucz)
+            if istniejacy is not None:
+                wezel.dolacz_dziecko(ruch, istniejacy)
+                wezel = istniejacy
+            else:
+                wezel = wezel.dodaj_dziecko(ruch, nowy_stan)
+                if self.uzyj_transpozycji:
+                    self.tabela_transpozycji[klucz] = wezel
+                if self.uzyj_solvera and wezel.czy_koncowy():
+                    wezel.udowodnij_koncowy()
+                    wezel.propaguj_dowod()
+            sciezka.append(wezel)
+            ruchy_sciezki.append(ruch)
 
-        return wezel
+        return sciezka, ruchy_sciezki
 
-    def _symuluj(self, stan_gry: StanGry, oryginalny_gracz: int) -> float:
-        symulacja = stan_gry.sklonuj()
+    def _rozwiaz_lisc(self, wezel: wezelMCTS) -> None:
+        # Ocena jest z perspektywy gracza na ruchu w liściu, wynik węzła z perspektywy gracza, który do niego wszedł
+        ocena = ocen_dokladnie(wezel.stan_gry, self.tablica_rozwiazan)
+        wezel.wynik_udowodniony = 0.0 if ocena > 0 else 1.0 if ocena < 0 else 0.5
+        if self.uzyj_solvera:
+            wezel.propaguj_dowod()
 
-        while not symulacja.czy_koniec_gry():
-            ruchy = symulacja.otrzymaj_mozliwe_ruchy()
-            if not ruchy:
-                break
-            ruch = self._wybierz_ruch_symulacji(symulacja, ruchy)
-            symulacja.wykonaj_ruch(ruch[0], ruch[1])
+    @staticmethod
+    def _klucz_transpozycji(stan_gry: StanGry) -> Tuple[bytes, int]:
+        return stan_gry.plansza.tobytes(), stan_gry.obecny_gracz
 
-        zwyciezca = symulacja.sprawdz_zwyciezce()
+    @staticmethod
+    def _wynik_udowodniony_dla(wezel: wezelMCTS, oryginalny_gracz: int) -> float:
+        if -wezel.stan_gry.obecny_gracz == oryginalny_gracz:
+            return wezel.wynik_udowodniony
+        return 1.0 - wezel.wynik_udowodniony
+
+    @staticmethod
+    def _wybierz_ruch_solvera(korzen: wezelMCTS) -> Tuple[int, int]:
+        krawedzie = list(zip(korzen.ruchy_dzieci, korzen.dzieci))
+        # Wygrywające dziecko dowodzi korzenia, zanim rodzeństwo zostanie udowodnione - sprawdzane najpierw,
+        # a przy korzeniu udowodnionym porównywane są tylko dzieci z wynikiem
+        for ruch, dziecko in krawedzie:
+            if dziecko.wynik_udowodniony == 1.0:
+                return ruch
+        udowodnione = [k for k in krawedzie if k[1].wynik_udowodniony is not None]
+        if korzen.wynik_udowodniony is not None and udowodnione:
+            ruch, _ = max(udowodnione, key=lambda k: (k[1].wynik_udowodniony, k[1].odwiedziny))
+            return ruch
+        bezpieczne = [k for k in krawedzie if k[1].wynik_udowodniony != 0.0] or krawedzie
+        ruch, _ = max(bezpieczne, key=lambda k: k[1].odwiedziny)
+        return ruch
+
+    def _symuluj(self, stan_gry: StanGry, oryginalny_gracz: int,
+                 ruchy_symulacji: Optional[List[Tuple[int, Tuple[int, int]]]] = None) -> float:
+        liczniki = LicznikiLinii(stan_gry.plansza, stan_gry.warunek_wygranej)
+        gracz = stan_gry.obecny_gracz
+
+        while liczniki.zwyciezca is None and liczniki.puste:
+            pole = self._wybierz_pole_symulacji(liczniki, gracz)
+            if ruchy_symulacji is not None:
+                ruchy_symulacji.append((gracz, divmod(pole, stan_gry.rozmiar_planszy)))
+            liczniki.wykonaj_ruch(pole, gracz)
+            gracz = -gracz
+
+        zwyciezca = liczniki.zwyciezca
         if zwyciezca == oryginalny_gracz:
             return 1.0
         elif zwyciezca == -oryginalny_gracz:
@@ -109,44 +328,51 @@ class AgentMCTS:
         else:
             return 0.5
 
-    def _wybierz_ruch_symulacji(self, stan_gry: StanGry, mozliwe_ruchy: List[Tuple[int, int]]) -> Tuple[int, int]:
-        for ruch in mozliwe_ruchy:
-            test = StanGry(stan_gry.rozmiar_planszy, stan_gry.warunek_wygranej)
-            test.plansza = stan_gry.plansza.copy()
-            test.obecny_gracz = stan_gry.obecny_gracz
-            test.wykonaj_ruch(ruch[0], ruch[1])
-            if test.sprawdz_zwyciezce() == stan_gry.obecny_gracz:
-                return ruch
-        
-        przeciwnik = -stan_gry.obecny_gracz
-        for ruch in mozliwe_ruchy:
-            test = StanGry(stan_gry.rozmiar_planszy, stan_gry.warunek_wygranej)
-            test.plansza = stan_gry.plansza.copy()
-            test.obecny_gracz = przeciwnik
-            test.wykonaj_ruch(ruch[0], ruch[1])
-            if test.sprawdz_zwyciezce() == przeciwnik:
-                return ruch
-        
-        ruchy_wazone = []
-        for ruch in mozliwe_ruchy:
-            if ruch == (1, 1):
-                ruchy_wazone += [ruch] * 3
-            elif ruch in [(0, 0), (0, 2), (2, 0), (2, 2)]:
-                ruchy_wazone += [ruch] * 2
-            else:
-                ruchy_wazone.append(ruch)
-        return random.choice(ruchy_wazone)
+    def _wybierz_pole_symulacji(self, liczniki: LicznikiLinii, gracz: int) -> int:
+        pole = liczniki.ruch_wygrywajacy(gracz)
+        if pole is not None:
+            return pole
 
-    def _proguj_wstecz(self, wezel: wezelMCTS, wynik: float, oryginalny_gracz: int) -> None:
-        while wezel is not None:
-            if wezel.gracz == oryginalny_gracz:
-                wezel.aktualizuj(wynik)
-            else:
-                wezel.aktualizuj(1.0 - wynik)
-            wezel = wezel.rodzic
+        pole = liczniki.ruch_wygrywajacy(-gracz)
+        if pole is not None:
+            return pole
+
+        return liczniki.losowe_pole_wazone(self.generator)
+
+    def _proguj_wstecz(self, sciezka: List[wezelMCTS], ruchy_sciezki: List[Tuple[int, int]], wynik: float,
+                       oryginalny_gracz: int) -> None:
+        for i in range(len(sciezka) - 1, -1, -1):
+            wezel = sciezka[i]
+            wynik_wezla = wynik if wezel.gracz == oryginalny_gracz else 1.0 - wynik
+            wezel.aktualizuj(wynik_wezla)
+            if i > 0:
+                rodzic = sciezka[i - 1]
+                rodzic.aktualizuj_krawedz(rodzic.indeksy_dzieci[ruchy_sciezki[i - 1]], wynik_wezla)
+            if self.uzyj_solvera and wezel.sprobuj_udowodnic():
+                wezel.propaguj_dowod()
+
+    def _proguj_wstecz_rave(self, sciezka: List[wezelMCTS], ruchy_sciezki: List[Tuple[int, int]],
+                            ruchy_symulacji: List[Tuple[int, Tuple[int, int]]], wynik: float,
+                            oryginalny_gracz: int) -> None:
+        # AMAF: każdy ruch gracza wykonany później w tej iteracji liczy się tak, jakby był zagrany od razu
+        pozniejsze_ruchy = list(ruchy_symulacji)
+        for i in range(len(sciezka) - 2, -1, -1):
+            wezel = sciezka[i]
+            gracz = wezel.stan_gry.obecny_gracz
+            pozniejsze_ruchy.append((gracz, ruchy_sciezki[i]))
+            wynik_gracza = wynik if gracz == oryginalny_gracz else 1.0 - wynik
+            for gracz_ruchu, ruch in pozniejsze_ruchy:
+                if gracz_ruchu != gracz:
+                    continue
+                indeks = wezel.indeksy_dzieci.get(ruch)
+                if indeks is not None:
+                    wezel.aktualizuj_rave_krawedzi(indeks, wynik_gracza)
 
 
-def znajdz_najlepszy_ruch(stan_gry: StanGry, iteracje: int = 1000) -> Optional[Tuple[int, int]]:
+def znajdz_najlepszy_ruch(stan_gry: StanGry, iteracje: int = 1000, uzyj_solvera: bool = False,
+                          uzyj_transpozycji: bool = False,
+                          harmonogram_rave: Optional[HarmonogramRAVE] = None,
+                          generator: random.Random = random) -> Optional[Tuple[int, int]]:
     wolne_pola = len(stan_gry.otrzymaj_mozliwe_ruchy())
     
     if wolne_pola > 7:
@@ -156,7 +382,8 @@ def znajdz_najlepszy_ruch(stan_gry: StanGry, iteracje: int = 1000) -> Optional[T
     else:
         iteracje = min(iteracje, 1500)
     
-    agent = AgentMCTS(iteracje=iteracje)
+    agent = AgentMCTS(iteracje=iteracje, uzyj_solvera=uzyj_solvera, uzyj_transpozycji=uzyj_transpozycji,
+                      harmonogram_rave=harmonogram_rave, generator=generator)
     return agent.znajdz_ruch(stan_gry)
 
 
@@ -1,7 +1,8 @@
-from typing import Tuple, Optional, List
+from typing import Tuple, Optional, List, Dict
 import copy
 import random
 from gra.logika import StanGry
+from gra.linie import LicznikiLinii
 
 class Wezel:
     def __init__(self,
@@ -195,3 +196,89 @@ def znajdz_najlepszy_ruch_z_drzewem(stan_gry: StanGry,
 
     korzen.wynik = najlepsza_ocena
     return najlepszy_ruch, korzen
+
+
+DOKLADNA, DOLNA, GORNA = 0, 1, 2
+
+
+def _negamax_liniowy(liczniki: LicznikiLinii, gracz: int, alfa: float, beta: float,
+                     tablica: Dict[Tuple[Tuple[int, ...], int], Tuple[int, int]]) -> int:
+    # Ocena z perspektywy gracza na ruchu; szybsza wygrana (więcej pustych pól) ma większą wartość
+    if liczniki.zwyciezca is not None:
+        return -(len(liczniki.puste) + 1)
+    if not liczniki.puste:
+        return 0
+    if liczniki.ruch_wygrywajacy(gracz) is not None:
+        return len(liczniki.puste)
+
+    klucz = (tuple(liczniki.pola), gracz)
+    wpis = tablica.get(klucz)
+    if wpis is not None:
+        wartosc, flaga = wpis
+        if flaga == DOKLADNA:
+            return wartosc
+        if flaga == DOLNA:
+            alfa = max(alfa, wartosc)
+        else:
+            beta = min(beta, wartosc)
+        if alfa >= beta:
+            return wartosc
+
+    blok = liczniki.ruch_wygrywajacy(-gracz)
+    if blok is not None:
+        ruchy = [blok]
+    else:
+        ruchy = sorted(liczniki.puste, key=lambda pole: -liczniki.wagi[pole])
+
+    alfa_poczatkowa = alfa
+    najlepsza_ocena = float('-inf')
+    for pole in ruchy:
+        liczniki.wykonaj_ruch(pole, gracz)
+        ocena = -_negamax_liniowy(liczniki, -gracz, -beta, -alfa, tablica)
+        liczniki.cofnij_ruch(pole, gracz)
+        najlepsza_ocena = max(najlepsza_ocena, ocena)
+        alfa = max(alfa, ocena)
+        if alfa >= beta:
+            break
+
+    if najlepsza_ocena <= alfa_poczatkowa:
+        flaga = GORNA
+    elif najlepsza_ocena >= beta:
+        flaga = DOLNA
+    else:
+        flaga = DOKLADNA
+    tablica[klucz] = (najlepsza_ocena, flaga)
+    return najlepsza_ocena
+
+
+def ocen_dokladnie(stan_gry: StanGry,
+                   tablica: Optional[Dict[Tuple[Tuple[int, ...], int], Tuple[int, int]]] = None) -> int:
+    if tablica is None:
+        tablica = {}
+    liczniki = LicznikiLinii(stan_gry.plansza, stan_gry.warunek_wygranej)
+    return _negamax_liniowy(liczniki, stan_gry.obecny_gracz, float('-inf'), float('inf'), tablica)
+
+
+def rozwiaz_dokladnie(stan_gry: StanGry,
+                      tablica: Optional[Dict[Tuple[Tuple[int, ...], int], Tuple[int, int]]] = None
+                      ) -> Tuple[int, List[Tuple[int, int]]]:
+    if tablica is None:
+        tablica = {}
+    liczniki = LicznikiLinii(stan_gry.plansza, stan_gry.warunek_wygranej)
+    gracz = stan_gry.obecny_gracz
+    if liczniki.zwyciezca is not None or not liczniki.puste:
+        return ocen_dokladnie(stan_gry, tablica), []
+
+    najlepsza_ocena = float('-inf')
+    najlepsze_ruchy: List[Tuple[int, int]] = []
+    for pole in list(liczniki.puste):
+        liczniki.wykonaj_ruch(pole, gracz)
+        ocena = -_negamax_liniowy(liczniki, -gracz, float('-inf'), float('inf'), tablica)
+        liczniki.cofnij_ruch(pole, gracz)
+        ruch = divmod(pole, stan_gry.rozmiar_planszy)
+        if ocena > najlepsza_ocena:
+            najlepsza_ocena = ocena
+            najlepsze_ruchy = [ruch]
+        elif ocena == najlepsza_ocena:
+            najlepsze_ruchy.append(ruch)
+    return najlepsza_ocena, najlepsze_ruchy
@@ -0,0 +1,195 @@
+import os
+import sys
+import json
+import pickle
+import struct
+from functools import lru_cache
+from typing import Tuple, Optional, Dict, Iterator, Iterable
+import numpy as np
+
+# Układ pliku: MAGIA | wersja formatu (u32) | długość nagłówka (u32) | nagłówek JSON | wyrównanie do 64 B |
+# posortowane kody stanów int64 (S) | wartości (S x pola). Brak wpisu w tabeli zapisany jako NaN.
+# Wersja 2 dodaje kwantyzację wartości (nagłówek 'kwantyzacja' i 'skala'): float16 albo int8 razy skala
+# tabeli, gdzie brak wpisu to -128. Tabele float32 nadal zapisywane są jako wersja 1.
+MAGIA = b'KKQT'
+WERSJA_FORMATU = 2
+KWANTYZACJE = ('float32', 'float16', 'int8')
+BRAK_INT8 = -128
+_TYPY = {'float32': '<f4', 'float16': '<f2', 'int8': 'i1'}
+ROZSZERZENIE = '.qtab'
+_WYROWNANIE = 64
+_STRUKTURA_POCZATKU = struct.Struct('<4sII')
+# Najwięcej pól, dla których kod trójkowy stanu mieści się w int64 (3 ** 39 < 2 ** 63 < 3 ** 40)
+MAKS_POL = 39
+
+
+@lru_cache(maxsize=None)
+def _potegi_trojki(liczba_pol: int) -> np.ndarray:
+    return 3 ** np.arange(liczba_pol, dtype=np.int64)
+
+
+def koduj_stan(klucz: tuple) -> int:
+    # Pole -1/0/1 jako cyfra trójkowa 0/1/2; kod mieści się w int64 do MAKS_POL pól (plansza do 6x6)
+    return int(np.dot(np.asarray(klucz, dtype=np.int64) + 1, _potegi_trojki(len(klucz))))
+
+
+def dekoduj_stan(kod: int, liczba_pol: int) -> tuple:
+    return tuple(int(cyfra) - 1 for cyfra in (int(kod) // _potegi_trojki(liczba_pol)) % 3)
+
+
+def czy_model_binarny(sciezka: str) -> bool:
+    with open(sciezka, 'rb') as f:
+        return f.read(len(MAGIA)) == MAGIA
+
+
+def kwantyzuj(wartosci: np.ndarray, kwantyzacja: str, skala: Optional[float] = None) -> Tuple[np.ndarray, float]:
+    # Wartości z NaN dla braków -> (tablica w typie docelowym, skala); int8 ma jedną skalę na całą tabelę,
+    # domyślnie największa wartość bezwzględna / 127
+    if kwantyzacja not in KWANTYZACJE:
+        raise ValueError(f"Nieznana kwantyzacja: {kwantyzacja}")
+    if kwantyzacja != 'int8':
+        return wartosci.astype(_TYPY[kwantyzacja]), 1.0
+    brak = np.isnan(wartosci)
+    if skala is None:
+        maksimum = float(np.abs(wartosci[~brak]).max()) if (~brak).any() else 0.0
+        skala = maksimum / 127 if maksimum > 0 else 1.0
+    kody = np.clip(np.rint(np.nan_to_num(wartosci / skala)), -127, 127).astype(np.int8)
+    kody[brak] = BRAK_INT8
+    return kody, skala
+
+
+def odkwantyzuj(surowe: np.ndarray, kwantyzacja: str, skala: float) -> np.ndarray:
+    if kwantyzacja == 'int8':
+        return np.where(surowe == BRAK_INT8, np.nan, surowe * np.float32(skala)).astype(np.float32)
+    return np.asarray(surowe, dtype=np.float32)
+
+
+def zapisz_model_binarny(sciezka: str, tabela_q, metadane: Dict, kwantyzacja: str = 'float32',
+                         skala: Optional[float] = None) -> None:
+    wpisy = list(tabela_q.items())
+    rozmiar_planszy = metadane.get('rozmiar_planszy') or (int(round(len(wpisy[0][0][0]) ** 0.5)) if wpisy else 3)
+    liczba_pol = rozmiar_planszy * rozmiar_planszy
+    if liczba_pol > MAKS_POL:
+        raise ValueError(f"Format {ROZSZERZENIE} koduje plansze do {MAKS_POL} pól, "
+                         f"plansza {rozmiar_planszy}x{rozmiar_planszy} ma {liczba_pol}")
+
+    kody_wpisow = np.array([koduj_stan(klucz) for (klucz, _), _ in wpisy], dtype=np.int64)
+    kody, wiersze = np.unique(kody_wpisow, return_inverse=True)
+    wartosci = np.full((len(kody), liczba_pol), np.nan, dtype=np.float32)
+    if wpisy:
+        akcje = np.array([rzad * rozmiar_planszy + kolumna for (_, (rzad, kolumna)), _ in wpisy], dtype=np.int64)
+        wartosci[wiersze, akcje] = [wartosc for _, wartosc in wpisy]
+
+    dane_wartosci, skala = kwantyzuj(wartosci, kwantyzacja, skala)
+    naglowek = {klucz: wartosc for klucz, wartosc in metadane.items() if klucz != 'q_table'}
+    naglowek.update(rozmiar_planszy=rozmiar_planszy, liczba_stanow=len(kody), q_table_size=len(wpisy))
+    wersja = 1
+    if kwantyzacja != 'float32':
+        naglowek.update(kwantyzacja=kwantyzacja, skala=skala)
+        wersja = WERSJA_FORMATU
+    naglowek_bajty = json.dumps(naglowek, ensure_ascii=False, default=str).encode('utf-8')
+    poczatek = _STRUKTURA_POCZATKU.pack(MAGIA, wersja, len(naglowek_bajty)) + naglowek_bajty
+    sciezka_tymczasowa = sciezka + '.tmp'
+    with open(sciezka_tymczasowa, 'wb') as f:
+        f.write(poczatek)
+        f.write(b'\0' * (-len(poczatek) % _WYROWNANIE))
+        f.write(kody.astype('<i8').tobytes())
+        f.write(dane_wartosci.tobytes())
+    os.replace(sciezka_tymczasowa, sciezka)
+
+
+class TabelaQMapowana:
+    # Tabela Q tylko do odczytu nad np.memmap: otwarcie czyta sam nagłówek, strony danych
+    # są wczytywane dopiero przy zapytaniu o stan (wyszukiwanie binarne po kodach)
+    def __init__(self, sciezka: str):
+        with open(sciezka, 'rb') as f:
+            magia, wersja, dlugosc_naglowka = _STRUKTURA_POCZATKU.unpack(f.read(_STRUKTURA_POCZATKU.size))
+            if magia != MAGIA:
+                raise ValueError(f"{sciezka} nie jest binarnym modelem Q")
+            if wersja > WERSJA_FORMATU:
+                raise ValueError(f"Nieobsługiwana wersja formatu modelu: {wersja}")
+            self.metadane: Dict = json.loads(f.read(dlugosc_naglowka).decode('utf-8'))
+        self.rozmiar_planszy = self.metadane['rozmiar_planszy']
+        self.liczba_akcji = self.rozmiar_planszy * self.rozmiar_planszy
+        liczba_stanow = self.metadane['liczba_stanow']
+        self.kwantyzacja = self.metadane.get('kwantyzacja', 'float32')
+        self.skala = self.metadane.get('skala', 1.0)
+
+        przesuniecie = _STRUKTURA_POCZATKU.size + dlugosc_naglowka
+        przesuniecie += -przesuniecie % _WYROWNANIE
+        if liczba_stanow:
+            self.kody = np.memmap(sciezka, dtype='<i8', mode='r', offset=przesuniecie, shape=(liczba_stanow,))
+            self.wartosci = np.memmap(sciezka, dtype=_TYPY[self.kwantyzacja], mode='r',
+                                      offset=przesuniecie + 8 * liczba_stanow, shape=(liczba_stanow, self.liczba_akcji))
+        else:
+            self.kody = np.zeros(0, dtype=np.int64)
+            self.wartosci = np.zeros((0, self.liczba_akcji), dtype=_TYPY[self.kwantyzacja])
+
+    def _wartosci_wiersza(self, indeks: int) -> np.ndarray:
+        return odkwantyzuj(self.wartosci[indeks], self.kwantyzacja, self.skala)
+
+    def indeks_akcji(self, ruch: Tuple[int, int]) -> int:
+        return ruch[0] * self.rozmiar_planszy + ruch[1]
+
+    def indeks_stanu(self, klucz: tuple) -> Optional[int]:
+        kod = koduj_stan(klucz)
+        indeks = int(np.searchsorted(self.kody, kod))
+        if indeks < len(self.kody) and self.kody[indeks] == kod:
+            return indeks
+        return None
+
+    def wiersz(self, klucz: tuple) -> Optional[np.ndarray]:
+        indeks = self.indeks_stanu(klucz)
+        return None if indeks is None else np.nan_to_num(self._wartosci_wiersza(indeks), nan=0.0)
+
+    def get(self, klucz_i_ruch: Tuple[tuple, Tuple[int, int]], domyslna: float = 0.0) -> float:
+        klucz, ruch = klucz_i_ruch
+        indeks = self.indeks_stanu(klucz)
+        if indeks is None:
+            return domyslna
+        wartosc = self._wartosci_wiersza(indeks)[self.indeks_akcji(ruch)]
+        return domyslna if np.isnan(wartosc) else float(wartosc)
+
+    def __getitem__(self, klucz_i_ruch: Tuple[tuple, Tuple[int, int]]) -> float:
+        if klucz_i_ruch not in self:
+            raise KeyError(klucz_i_ruch)
+        return self.get(klucz_i_ruch)
+
+    def __contains__(self, klucz_i_ruch) -> bool:
+        klucz, ruch = klucz_i_ruch
+        indeks = self.indeks_stanu(klucz)
+        return indeks is not None and not np.isnan(self._wartosci_wiersza(indeks)[self.indeks_akcji(ruch)])
+
+    def __len__(self) -> int:
+        return int(self.metadane.get('q_table_size',
+                                     (~np.isnan(odkwantyzuj(self.wartosci, self.kwantyzacja, self.skala))).sum()))
+
+    def items(self) -> Iterable[Tuple[Tuple[tuple, Tuple[int, int]], float]]:
+        wartosci = odkwantyzuj(self.wartosci, self.kwantyzacja, self.skala)
+        for indeks, akcja in zip(*np.nonzero(~np.isnan(wartosci))):
+            klucz = dekoduj_stan(self.kody[indeks], self.liczba_akcji)
+            yield (klucz, divmod(int(akcja), self.rozmiar_planszy)), float(wartosci[indeks, akcja])
+
+    def keys(self) -> Iterator[Tuple[tuple, Tuple[int, int]]]:
+        for klucz_i_ruch, _ in self.items():
+            yield klucz_i_ruch
+
+    __iter__ = keys
+
+
+def konwertuj_z_pkl(sciezka_pkl: str, sciezka_docelowa: Optional[str] = None) -> str:
+    # Jednorazowa konwersja zaufanego pliku .pkl; dalej model czytany jest bez pickle
+    with open(sciezka_pkl, 'rb') as f:
+        dane = pickle.load(f)
+    if sciezka_docelowa is None:
+        sciezka_docelowa = os.path.splitext(sciezka_pkl)[0] + ROZSZERZENIE
+    zapisz_model_binarny(sciezka_docelowa, dane['q_table'], dane)
+    return sciezka_docelowa
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Użycie: python -m ai.model_binarny <model.pkl> [model.qtab]")
+        sys.exit(1)
+    wynik = konwertuj_z_pkl(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
+    print(f"Zapisano {wynik} ({os.path.getsize(wynik) / 1024:.1f} KB)")
@@ -0,0 +1,104 @@
+from typing import Dict, Tuple, Optional
+import numpy as np
+
+
+class DrzewoSum:
+    # Pełne drzewo binarne w tablicy: liście od indeksu pojemnosc_drzewa, węzeł i ma dzieci 2i i 2i+1
+    def __init__(self, pojemnosc: int):
+        self.pojemnosc_drzewa = 1 << max(0, (pojemnosc - 1).bit_length())
+        self.glebokosc = self.pojemnosc_drzewa.bit_length() - 1
+        self.drzewo = np.zeros(2 * self.pojemnosc_drzewa, dtype=np.float64)
+
+    @property
+    def suma(self) -> float:
+        return float(self.drzewo[1])
+
+    def liscie(self, indeksy: np.ndarray) -> np.ndarray:
+        return self.drzewo[indeksy + self.pojemnosc_drzewa]
+
+    def ustaw(self, indeksy: np.ndarray, priorytety: np.ndarray) -> None:
+        wezly = indeksy + self.pojemnosc_drzewa
+        self.drzewo[wezly] = priorytety
+        # Odbudowa tylko ścieżek nad zmienionymi liśćmi, poziom po poziomie
+        for _ in range(self.glebokosc):
+            wezly = np.unique(wezly >> 1)
+            self.drzewo[wezly] = self.drzewo[2 * wezly] + self.drzewo[2 * wezly + 1]
+
+    def znajdz(self, wartosci: np.ndarray) -> np.ndarray:
+        # Zejście od korzenia dla całej próbki naraz: lewe dziecko, jeśli wartość mieści się w jego sumie
+        wezly = np.ones(len(wartosci), dtype=np.int64)
+        wartosci = wartosci.copy()
+        for _ in range(self.glebokosc):
+            lewe = 2 * wezly
+            suma_lewych = self.drzewo[lewe]
+            w_prawo = wartosci >= suma_lewych
+            wartosci -= np.where(w_prawo, suma_lewych, 0.0)
+            wezly = lewe + w_prawo
+        return wezly - self.pojemnosc_drzewa
+
+
+class BuforPowtorek:
+    # Bufor cykliczny przejść zapisanych numerami wierszy gęstej tabeli Q (wiersze nigdy nie zmieniają numeru).
+    # Losowanie proporcjonalne do (|błąd TD| + epsilon)^alfa, wagi importance sampling z wykładnikiem beta.
+    def __init__(self, pojemnosc: int = 200_000, alfa: float = 0.6, epsilon_priorytetu: float = 0.01,
+                 ziarno: Optional[int] = None):
+        self.pojemnosc = pojemnosc
+        self.generator = np.random.default_rng(ziarno)
+        self.alfa = alfa
+        self.epsilon_priorytetu = epsilon_priorytetu
+        self.stany = np.zeros(pojemnosc, dtype=np.int64)
+        self.akcje = np.zeros(pojemnosc, dtype=np.int64)
+        self.nagrody = np.zeros(pojemnosc, dtype=np.float32)
+        self.nastepne = np.zeros(pojemnosc, dtype=np.int64)
+        self.zakonczone = np.zeros(pojemnosc, dtype=bool)
+        self.drzewo = DrzewoSum(pojemnosc)
+        self.pozycja = 0
+        self.rozmiar = 0
+        self.maks_priorytet = 1.0
+
+    def __len__(self) -> int:
+        return self.rozmiar
+
+    def _priorytety(self, bledy_td: np.ndarray) -> np.ndarray:
+        return (np.abs(bledy_td) + self.epsilon_priorytetu) ** self.alfa
+
+    def dodaj(self, przejscia: Dict[str, np.ndarray], bledy_td: Optional[np.ndarray] = None) -> None:
+        liczba = len(przejscia['stany'])
+        if liczba == 0:
+            return
+        # Przy paczce większej niż bufor zostaje tylko jej koniec
+        poczatek = max(0, liczba - self.pojemnosc)
+        indeksy = (self.pozycja + np.arange(liczba - poczatek)) % self.pojemnosc
+        for nazwa in ('stany', 'akcje', 'nagrody', 'nastepne', 'zakonczone'):
+            getattr(self, nazwa)[indeksy] = przejscia[nazwa][poczatek:]
+        if bledy_td is None:
+            priorytety = np.full(len(indeksy), self.maks_priorytet)
+        else:
+            priorytety = self._priorytety(bledy_td[poczatek:])
+            self.maks_priorytet = max(self.maks_priorytet, float(priorytety.max()))
+        self.drzewo.ustaw(indeksy, priorytety)
+        self.pozycja = int((indeksy[-1] + 1) % self.pojemnosc)
+        self.rozmiar = min(self.pojemnosc, self.rozmiar + len(indeksy))
+
+    def probkuj(self, rozmiar_probki: int, beta: float = 0.4,
+                generator: Optional[np.random.Generator] = None) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        generator = generator or self.generator
+        # Losowanie warstwowe: po jednej wartości z każdego z rozmiar_probki równych odcinków sumy priorytetów
+        odcinek = self.drzewo.suma / rozmiar_probki
+        wartosci = (np.arange(rozmiar_probki) + generator.random(rozmiar_probki)) * odcinek
+        indeksy = np.minimum(self.drzewo.znajdz(wartosci), self.rozmiar - 1)
+
+        prawdopodobienstwa = self.drzewo.liscie(indeksy) / self.drzewo.suma
+        wagi = (self.rozmiar * prawdopodobienstwa) ** -beta
+        wagi /= wagi.max()
+        probka = {nazwa: getattr(self, nazwa)[indeksy]
+                  for nazwa in ('stany', 'akcje', 'nagrody', 'nastepne', 'zakonczone')}
+        probka['wagi'] = wagi.astype(np.float32)
+        return indeksy, probka
+
+    def aktualizuj_priorytety(self, indeksy: np.ndarray, bledy_td: np.ndarray) -> None:
+        # Przy powtórzonych indeksach w próbce obowiązuje ostatni błąd
+        priorytety = self._priorytety(bledy_td)
+        self.maks_priorytet = max(self.maks_priorytet, float(priorytety.max()))
+        unikalne, pozycje = np.unique(indeksy[::-1], return_index=True)
+        self.drzewo.ustaw(unikalne, priorytety[::-1][pozycje])
@@ -0,0 +1,183 @@
+import os
+import sys
+import csv
+import json
+import time
+import random
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import cpu_count
+from typing import Dict, List, Optional
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(current_dir, '..')))
+
+from ai.agent_q_learning import (AgentQLearning, Harmonogram, PulaTreningowa, trenuj_doskonaly_agent,
+                                 weryfikacja_miedzyetapowa, ucz_sie_od_minimax, konfiguruj_logowanie)
+from ai.telemetria import Telemetria, wczytaj
+
+PARAMETRY_AGENTA = ('wspolczynnik_uczenia', 'wspolczynnik_dyskontujacy', 'kroki_zwrotu', 'lambda_sladu')
+PARAMETRY_ZADANIA = ('gier_eksperta', 'wczesne_zatrzymanie')
+PARAMETRY = PARAMETRY_AGENTA + PARAMETRY_ZADANIA + Harmonogram._fields
+POZIOMY = ('random', 'smart_random', 'reguly', 'mcts', 'minimax')
+
+
+def sprawdz_przestrzen(przestrzen: Dict) -> None:
+    nieznane = sorted(set(przestrzen) - set(PARAMETRY))
+    if nieznane:
+        raise ValueError(f"Nieznane parametry: {', '.join(nieznane)}. Dostępne: {', '.join(PARAMETRY)}")
+
+
+def konfiguracje_siatki(przestrzen: Dict[str, list]) -> List[Dict]:
+    nazwy = sorted(przestrzen)
+    return [dict(zip(nazwy, wartosci)) for wartosci in itertools.product(*(przestrzen[nazwa] for nazwa in nazwy))]
+
+
+def _losuj(zakres, generator: random.Random):
+    # Lista: wybór jednej wartości; słownik {min, max[, log]}: rozkład jednostajny (lub log-jednostajny),
+    # liczby całkowite, gdy oba końce są całkowite
+    if isinstance(zakres, list):
+        return generator.choice(zakres)
+    minimum, maksimum = zakres['min'], zakres['max']
+    if isinstance(minimum, int) and isinstance(maksimum, int):
+        return generator.randint(minimum, maksimum)
+    if zakres.get('log'):
+        return float(np.exp(generator.uniform(np.log(minimum), np.log(maksimum))))
+    return generator.uniform(minimum, maksimum)
+
+
+def konfiguracje_losowe(przestrzen: Dict, liczba: int, ziarno: Optional[int] = None) -> List[Dict]:
+    generator = random.Random(ziarno)
+    return [{nazwa: _losuj(przestrzen[nazwa], generator) for nazwa in sorted(przestrzen)} for _ in range(liczba)]
+
+
+def uruchom_zadanie(argumenty) -> Dict:
+    # Jedno pełne trenowanie w osobnym procesie z własną pulą workerów; wynik z telemetrii zadania
+    numer, konfiguracja, folder, liczba_workerow, ziarno, gier_weryfikacji = argumenty
+    os.makedirs(folder, exist_ok=True)
+    logger = konfiguruj_logowanie(folder, konsola=False)
+    random.seed(ziarno)
+    np.random.seed(ziarno)
+    # JSON nie ma krotek - pola harmonogramu z listami zamieniane są z powrotem
+    harmonogram = Harmonogram()._replace(**{nazwa: tuple(wartosc) if isinstance(wartosc, list) else wartosc
+                                            for nazwa, wartosc in konfiguracja.items()
+                                            if nazwa in Harmonogram._fields})
+    agent = AgentQLearning(gesta_tabela=True, rownowaznosc_symetrii=True,
+                           **{nazwa: konfiguracja[nazwa] for nazwa in PARAMETRY_AGENTA if nazwa in konfiguracja})
+
+    czas_startu = time.perf_counter()
+    gier_eksperta = konfiguracja.get('gier_eksperta', 500)
+    if gier_eksperta:
+        ucz_sie_od_minimax(logger, agent, liczba_gier=gier_eksperta)
+    with PulaTreningowa(liczba_workerow, ziarno=ziarno, telemetria=Telemetria(folder)) as pula:
+        trenuj_doskonaly_agent(logger, agent, pula=pula, harmonogram=harmonogram,
+                               wczesne_zatrzymanie=konfiguracja.get('wczesne_zatrzymanie', True))
+        czas_treningu = time.perf_counter() - czas_startu
+        rekordy_treningu = wczytaj(folder)
+        wyniki = weryfikacja_miedzyetapowa(logger, agent, gier_weryfikacji, pula=pula)
+    weryfikacja_koncowa = wczytaj(folder)[len(rekordy_treningu):]
+
+    iteracje = [rekord for rekord in rekordy_treningu if rekord['type'] == 'iteration']
+    wiersz = dict(konfiguracja, zadanie=numer,
+                  doskonaly=wyniki['perfect_vs_easy'] and wyniki['perfect_vs_minimax'],
+                  gry_treningowe=gier_eksperta + sum(rekord['games'] for rekord in iteracje),
+                  gry_weryfikacji=sum(rekord['games'] for rekord in rekordy_treningu
+                                      if rekord['type'] == 'verification'),
+                  iteracje=len(iteracje), czas_treningu_s=round(czas_treningu, 1), folder=folder)
+    for rekord in weryfikacja_koncowa:
+        if rekord['type'] == 'verification':
+            wiersz[f"przegrane_{rekord['opponent']}"] = rekord['losses']
+    return wiersz
+
+
+def koszt(wiersz: Dict) -> tuple:
+    # Najpierw doskonałe, wśród nich najmniej gier treningowych, potem najkrótszy czas
+    return not wiersz['doskonaly'], wiersz['gry_treningowe'], wiersz['czas_treningu_s']
+
+
+def zapisz_tabele(sciezka: str, wiersze: List[Dict]) -> None:
+    kolumny = list(dict.fromkeys(kolumna for wiersz in wiersze for kolumna in wiersz))
+    with open(sciezka, 'w', newline='', encoding='utf-8') as f:
+        pisarz = csv.DictWriter(f, fieldnames=kolumny)
+        pisarz.writeheader()
+        pisarz.writerows(sorted(wiersze, key=koszt))
+
+
+def drukuj_tabele(wiersze: List[Dict], parametry: List[str]) -> None:
+    kolumny = parametry + ['doskonaly', 'gry_treningowe', 'czas_treningu_s', 'iteracje'] + \
+        [f"przegrane_{poziom}" for poziom in POZIOMY if any(f"przegrane_{poziom}" in w for w in wiersze)]
+    szerokosci = [max(len(kolumna), *(len(str(w.get(kolumna, ''))) for w in wiersze)) for kolumna in kolumny]
+    print("  ".join(kolumna.ljust(szerokosc) for kolumna, szerokosc in zip(kolumny, szerokosci)))
+    for wiersz in sorted(wiersze, key=koszt):
+        print("  ".join(str(wiersz.get(kolumna, '')).ljust(szerokosc)
+                        for kolumna, szerokosc in zip(kolumny, szerokosci)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Równoległe strojenie hiperparametrów treningu Q-learning")
+    parser.add_argument('przestrzen', help="plik JSON albo napis JSON: {parametr: [wartości]} "
+                                           "lub {parametr: {min, max, log}} przy --losowe")
+    parser.add_argument('--losowe', type=int, default=0, metavar='N',
+                        help="N losowych konfiguracji zamiast pełnej siatki")
+    parser.add_argument('--zadania', type=int, default=None,
+                        help="liczba równoległych treningów (domyślnie rdzenie / 4); reszta rdzeni idzie na workery")
+    parser.add_argument('--ziarno', type=int, default=0)
+    parser.add_argument('--gier-weryfikacji', type=int, default=1000, help="gier na poziom w weryfikacji końcowej")
+    argumenty = parser.parse_args()
+
+    if os.path.exists(argumenty.przestrzen):
+        with open(argumenty.przestrzen, encoding='utf-8') as f:
+            przestrzen = json.load(f)
+    else:
+        przestrzen = json.loads(argumenty.przestrzen)
+    sprawdz_przestrzen(przestrzen)
+    if argumenty.losowe:
+        konfiguracje = konfiguracje_losowe(przestrzen, argumenty.losowe, argumenty.ziarno)
+    else:
+        konfiguracje = konfiguracje_siatki(przestrzen)
+
+    # Zadanie to uczący i jego pula; uczący czeka na workery, więc rdzenie dzielone są między pule
+    rdzenie = cpu_count()
+    liczba_zadan = min(len(konfiguracje), argumenty.zadania or max(1, rdzenie // 4))
+    workerow_na_zadanie = max(1, rdzenie // liczba_zadan)
+
+    folder_bazowy = os.path.join(current_dir, 'q_tables', 'strojenie')
+    folder, licznik = folder_bazowy, 1
+    while os.path.exists(folder):
+        folder = f"{folder_bazowy}_{licznik}"
+        licznik += 1
+    os.makedirs(folder)
+    with open(os.path.join(folder, 'przestrzen.json'), 'w', encoding='utf-8') as f:
+        json.dump(przestrzen, f, ensure_ascii=False, indent=2)
+    print(f"{len(konfiguracje)} konfiguracji, {liczba_zadan} równolegle po {workerow_na_zadanie} workerów -> {folder}")
+
+    plik_wynikow = os.path.join(folder, 'wyniki.csv')
+    wiersze = []
+    czas_startu = time.time()
+    with ProcessPoolExecutor(max_workers=liczba_zadan) as wykonawca:
+        zadania = [wykonawca.submit(uruchom_zadanie, (numer, konfiguracja,
+                                                      os.path.join(folder, f"zadanie_{numer:03d}"),
+                                                      workerow_na_zadanie, argumenty.ziarno + numer,
+                                                      argumenty.gier_weryfikacji))
+                   for numer, konfiguracja in enumerate(konfiguracje)]
+        for zadanie in as_completed(zadania):
+            wiersz = zadanie.result()
+            wiersze.append(wiersz)
+            # Tabela przepisywana po każdym zadaniu - przerwane strojenie zostawia wszystkie ukończone wyniki
+            zapisz_tabele(plik_wynikow, wiersze)
+            print(f"[{len(wiersze)}/{len(konfiguracje)}] zadanie {wiersz['zadanie']}: "
+                  f"{'DOSKONAŁY' if wiersz['doskonaly'] else 'niedoskonały'}, {wiersz['gry_treningowe']} gier, "
+                  f"{wiersz['czas_treningu_s']}s")
+
+    print(f"\nStrojenie zakończone w {(time.time() - czas_startu) / 60:.1f} minut. Wyniki: {plik_wynikow}\n")
+    drukuj_tabele(wiersze, sorted(przestrzen))
+    doskonale = [wiersz for wiersz in wiersze if wiersz['doskonaly']]
+    if doskonale:
+        najtanszy = min(doskonale, key=koszt)
+        print(f"\nNajtańszy doskonały: {{{', '.join(f'{p}: {najtanszy[p]}' for p in sorted(przestrzen))}}} "
+              f"({najtanszy['gry_treningowe']} gier, {najtanszy['czas_treningu_s']}s)")
+    else:
+        print("\nŻadna konfiguracja nie dała doskonałego agenta")
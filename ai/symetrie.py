@@ -0,0 +1,51 @@
+from functools import lru_cache
+from typing import Tuple, Optional
+import numpy as np
+
+LICZBA_SYMETRII = 8
+
+
+@lru_cache(maxsize=None)
+def permutacje_symetrii(rozmiar_planszy: int) -> np.ndarray:
+    # Wiersz t: plansza_po_transformacji.flat[j] == plansza.flat[permutacja[t, j]]
+    pola = np.arange(rozmiar_planszy * rozmiar_planszy).reshape(rozmiar_planszy, rozmiar_planszy)
+    permutacje = []
+    tymczasowa = pola
+    for _ in range(4):
+        permutacje.append(tymczasowa.flatten())
+        tymczasowa = np.rot90(tymczasowa)
+    tymczasowa = np.fliplr(pola)
+    for _ in range(4):
+        permutacje.append(tymczasowa.flatten())
+        tymczasowa = np.rot90(tymczasowa)
+    permutacje = np.array(permutacje)
+    permutacje.setflags(write=False)
+    return permutacje
+
+
+@lru_cache(maxsize=None)
+def odwrotne_permutacje(rozmiar_planszy: int) -> np.ndarray:
+    odwrotne = np.argsort(permutacje_symetrii(rozmiar_planszy), axis=1)
+    odwrotne.setflags(write=False)
+    return odwrotne
+
+
+def kanonizuj(plansza: np.ndarray, gracz: Optional[int] = None) -> Tuple[tuple, int]:
+    # Leksykograficznie najmniejsza z 8 symetrycznych plansz oraz numer transformacji, która ją daje.
+    # Z podanym graczem plansza jest najpierw mnożona przez niego (normalizacja koloru).
+    plaska = plansza.ravel()
+    if gracz is not None:
+        plaska = plaska * gracz
+    kandydaci = plaska[permutacje_symetrii(plansza.shape[0])].tolist()
+    transformacja = min(range(LICZBA_SYMETRII), key=kandydaci.__getitem__)
+    return tuple(kandydaci[transformacja]), transformacja
+
+
+def ruch_do_kanonicznego(ruch: Tuple[int, int], transformacja: int, rozmiar_planszy: int) -> Tuple[int, int]:
+    pole = int(odwrotne_permutacje(rozmiar_planszy)[transformacja, ruch[0] * rozmiar_planszy + ruch[1]])
+    return divmod(pole, rozmiar_planszy)
+
+
+def ruch_z_kanonicznego(ruch: Tuple[int, int], transformacja: int, rozmiar_planszy: int) -> Tuple[int, int]:
+    pole = int(permutacje_symetrii(rozmiar_planszy)[transformacja, ruch[0] * rozmiar_planszy + ruch[1]])
+    return divmod(pole, rozmiar_planszy)
@@ -0,0 +1,291 @@
+from multiprocessing import shared_memory, resource_tracker
+from typing import Tuple, Optional, Dict, List, Callable, Iterator, Iterable, NamedTuple
+import numpy as np
+from gra.logika import StanGry
+from gra.linie import indeks_linii
+
+
+class OpisPamieciQ(NamedTuple):
+    nazwa: str
+    pojemnosc: int
+    liczba_stanow: int
+    rozmiar_planszy: int
+
+
+class GestaTabelaQ:
+    # Tabela Q jako tablica float32 (stany x pola) z mapą klucz stanu -> wiersz.
+    # Zachowuje interfejs słownika {(klucz_stanu, (rzad, kolumna)): wartosc}, więc dict(tabela) daje stary format.
+    def __init__(self, rozmiar_planszy: int = 3, pojemnosc: int = 1024):
+        self.rozmiar_planszy = rozmiar_planszy
+        self.liczba_akcji = rozmiar_planszy * rozmiar_planszy
+        self.wartosci = np.zeros((pojemnosc, self.liczba_akcji), dtype=np.float32)
+        self.zapisane = np.zeros((pojemnosc, self.liczba_akcji), dtype=bool)
+        # Maska pustych pól każdego stanu - legalne akcje przy liczeniu maksimum następnego stanu
+        self.legalne = np.zeros((pojemnosc, self.liczba_akcji), dtype=bool)
+        self.indeksy_stanow: Dict[tuple, int] = {}
+        self.klucze: List[tuple] = []
+
+    @classmethod
+    def dla_stanow_osiagalnych(cls, funkcja_klucza: Callable[[np.ndarray, int], tuple], rozmiar_planszy: int = 3,
+                               warunek_wygranej: int = 3) -> 'GestaTabelaQ':
+        klucze = sorted(wylicz_klucze_osiagalne(funkcja_klucza, rozmiar_planszy, warunek_wygranej))
+        tabela = cls(rozmiar_planszy, pojemnosc=max(1, len(klucze)))
+        for klucz in klucze:
+            tabela.indeks_stanu(klucz, dodaj=True)
+        return tabela
+
+    @classmethod
+    def z_dict(cls, tabela_q: Dict, rozmiar_planszy: int = 3) -> 'GestaTabelaQ':
+        tabela = cls(rozmiar_planszy)
+        for (klucz, ruch), wartosc in tabela_q.items():
+            tabela[(klucz, ruch)] = wartosc
+        return tabela
+
+    @classmethod
+    def z_pamieci_wspoldzielonej(cls, opis: OpisPamieciQ) -> 'GestaTabelaQ':
+        # Widok tylko do odczytu bez kopiowania: wartości i maska wskazują bezpośrednio na blok pamięci uczącego
+        pamiec = _dolacz_pamiec(opis.nazwa)
+        wartosci, zapisane, klucze = _widoki_pamieci(pamiec, opis.pojemnosc, opis.rozmiar_planszy)
+        tabela = cls(opis.rozmiar_planszy, pojemnosc=0)
+        tabela._pamiec = pamiec
+        tabela.wartosci, tabela.zapisane = wartosci, zapisane
+        tabela.legalne = klucze == 0
+        tabela.klucze = [tuple(klucz) for klucz in klucze[:opis.liczba_stanow].tolist()]
+        tabela.indeksy_stanow = {klucz: i for i, klucz in enumerate(tabela.klucze)}
+        return tabela
+
+    def kopia_wartosci(self) -> 'GestaTabelaQ':
+        # Prywatna kopia wartości i maski przy wspólnych kluczach - późniejsze zapisy do źródła jej nie zmieniają
+        tabela = GestaTabelaQ(self.rozmiar_planszy, pojemnosc=0)
+        tabela.wartosci, tabela.zapisane = self.wartosci.copy(), self.zapisane.copy()
+        tabela.legalne, tabela.klucze, tabela.indeksy_stanow = self.legalne, self.klucze, self.indeksy_stanow
+        return tabela
+
+    def indeks_akcji(self, ruch: Tuple[int, int]) -> int:
+        return ruch[0] * self.rozmiar_planszy + ruch[1]
+
+    def indeks_stanu(self, klucz: tuple, dodaj: bool = False) -> Optional[int]:
+        indeks = self.indeksy_stanow.get(klucz)
+        if indeks is None and dodaj:
+            indeks = len(self.klucze)
+            if indeks == self.wartosci.shape[0]:
+                self._powieksz()
+            klucz = tuple(int(pole) for pole in klucz)
+            self.legalne[indeks] = np.array(klucz) == 0
+            self.indeksy_stanow[klucz] = indeks
+            self.klucze.append(klucz)
+        return indeks
+
+    def _powieksz(self) -> None:
+        nowa_pojemnosc = max(1, 2 * self.wartosci.shape[0])
+        for nazwa in ('wartosci', 'zapisane', 'legalne'):
+            stara = getattr(self, nazwa)
+            nowa = np.zeros((nowa_pojemnosc, self.liczba_akcji), dtype=stara.dtype)
+            nowa[:stara.shape[0]] = stara
+            setattr(self, nazwa, nowa)
+
+    def wiersz(self, klucz: tuple) -> Optional[np.ndarray]:
+        indeks = self.indeksy_stanow.get(klucz)
+        return None if indeks is None else self.wartosci[indeks]
+
+    def koduj_przejscia(self, przejscia: List[tuple]) -> Dict[str, object]:
+        # Krotki (klucz, ruch, nagroda, następny klucz, koniec) -> tablice numerów wierszy.
+        # Stany spoza tabeli dostają numery ujemne -(1 + j), gdzie j wskazuje klucz w 'nowe_klucze'.
+        nowe_klucze: Dict[tuple, int] = {}
+
+        def numer(klucz: tuple) -> int:
+            indeks = self.indeksy_stanow.get(klucz)
+            if indeks is None:
+                indeks = -1 - nowe_klucze.setdefault(klucz, len(nowe_klucze))
+            return indeks
+
+        return {
+            'stany': np.array([numer(p[0]) for p in przejscia], dtype=np.int64),
+            'akcje': np.array([self.indeks_akcji(p[1]) for p in przejscia], dtype=np.int64),
+            'nagrody': np.array([p[2] for p in przejscia], dtype=np.float32),
+            'nastepne': np.array([numer(p[3]) for p in przejscia], dtype=np.int64),
+            'zakonczone': np.array([p[4] for p in przejscia], dtype=bool),
+            'nowe_klucze': list(nowe_klucze),
+        }
+
+    def rozwiaz_indeksy(self, paczka: Dict[str, object]) -> Tuple[np.ndarray, np.ndarray]:
+        if not paczka['nowe_klucze']:
+            return paczka['stany'], paczka['nastepne']
+        nowe = np.array([self.indeks_stanu(klucz, dodaj=True) for klucz in paczka['nowe_klucze']], dtype=np.int64)
+        stany, nastepne = paczka['stany'], paczka['nastepne']
+        return (np.where(stany < 0, nowe[-1 - np.minimum(stany, -1)], stany),
+                np.where(nastepne < 0, nowe[-1 - np.minimum(nastepne, -1)], nastepne))
+
+    def scal_paczki(self, paczki: List[Dict[str, object]]) -> Dict[str, np.ndarray]:
+        # Zakodowane paczki z workerów -> jedna paczka z numerami wierszy tej tabeli
+        wynik = {}
+        for nazwa in ('stany', 'akcje', 'nagrody', 'nastepne', 'zakonczone'):
+            wynik[nazwa] = np.concatenate([paczka[nazwa] for paczka in paczki]) if paczki else np.zeros(0)
+        if paczki:
+            stany, nastepne = zip(*(self.rozwiaz_indeksy(paczka) for paczka in paczki))
+            wynik['stany'], wynik['nastepne'] = np.concatenate(stany), np.concatenate(nastepne)
+        for nazwa in ('stany', 'akcje', 'nastepne'):
+            wynik[nazwa] = wynik[nazwa].astype(np.int64)
+        wynik['zakonczone'] = wynik['zakonczone'].astype(bool)
+        return wynik
+
+    def aktualizuj_wsadowo(self, stany: np.ndarray, akcje: np.ndarray, nagrody: np.ndarray, nastepne: np.ndarray,
+                           zakonczone: np.ndarray, wspolczynnik_uczenia: float,
+                           wspolczynnik_dyskontujacy: float, wagi: Optional[np.ndarray] = None) -> np.ndarray:
+        # Wszystkie cele liczone z tabeli sprzed paczki. Para (stan, akcja) występująca k razy robi
+        # k kroków w stronę średniego celu: Q += (1 - (1 - lr)^k) * (średni cel - Q),
+        # co dla równych celów daje dokładnie wynik k kolejnych wywołań aktualizuj.
+        # Wagi (importance sampling z bufora powtórek) skalują krok: lr_i = lr * w_i, cel ważony w_i.
+        wiersze_nastepne = np.where(self.legalne[nastepne], self.wartosci[nastepne], -np.inf).max(axis=1)
+        wiersze_nastepne[~np.isfinite(wiersze_nastepne) | zakonczone] = 0.0
+        cele = nagrody + wspolczynnik_dyskontujacy * wiersze_nastepne
+        plaskie = stany * self.liczba_akcji + akcje
+        bledy_td = cele - self.wartosci.reshape(-1)[plaskie]
+
+        unikalne, odwrotne, liczby = np.unique(plaskie, return_inverse=True, return_counts=True)
+        if wagi is None:
+            sredni_blad = np.bincount(odwrotne, weights=bledy_td) / liczby
+            krok = 1.0 - (1.0 - wspolczynnik_uczenia) ** liczby
+        else:
+            sredni_blad = np.bincount(odwrotne, weights=wagi * bledy_td) / np.bincount(odwrotne, weights=wagi)
+            krok = 1.0 - np.exp(np.bincount(odwrotne, weights=np.log1p(-wspolczynnik_uczenia * wagi)))
+        self.wartosci.reshape(-1)[unikalne] += (krok * sredni_blad).astype(np.float32)
+        self.zapisane.reshape(-1)[unikalne] = True
+        return bledy_td
+
+    @property
+    def liczba_stanow(self) -> int:
+        return len(self.klucze)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(tablica[:self.liczba_stanow].nbytes for tablica in (self.wartosci, self.zapisane, self.legalne))
+
+    def get(self, klucz_i_ruch: Tuple[tuple, Tuple[int, int]], domyslna: float = 0.0) -> float:
+        klucz, ruch = klucz_i_ruch
+        indeks = self.indeksy_stanow.get(klucz)
+        if indeks is None:
+            return domyslna
+        akcja = self.indeks_akcji(ruch)
+        if not self.zapisane[indeks, akcja]:
+            return domyslna
+        return float(self.wartosci[indeks, akcja])
+
+    def __getitem__(self, klucz_i_ruch: Tuple[tuple, Tuple[int, int]]) -> float:
+        if klucz_i_ruch not in self:
+            raise KeyError(klucz_i_ruch)
+        return self.get(klucz_i_ruch)
+
+    def __setitem__(self, klucz_i_ruch: Tuple[tuple, Tuple[int, int]], wartosc: float) -> None:
+        klucz, ruch = klucz_i_ruch
+        indeks = self.indeks_stanu(klucz, dodaj=True)
+        akcja = self.indeks_akcji(ruch)
+        self.wartosci[indeks, akcja] = wartosc
+        self.zapisane[indeks, akcja] = True
+
+    def __contains__(self, klucz_i_ruch) -> bool:
+        klucz, ruch = klucz_i_ruch
+        indeks = self.indeksy_stanow.get(klucz)
+        return indeks is not None and bool(self.zapisane[indeks, self.indeks_akcji(ruch)])
+
+    def __len__(self) -> int:
+        return int(self.zapisane[:self.liczba_stanow].sum())
+
+    def keys(self) -> Iterator[Tuple[tuple, Tuple[int, int]]]:
+        for indeks, akcja in zip(*np.nonzero(self.zapisane[:self.liczba_stanow])):
+            yield self.klucze[indeks], divmod(int(akcja), self.rozmiar_planszy)
+
+    __iter__ = keys
+
+    def items(self) -> Iterable[Tuple[Tuple[tuple, Tuple[int, int]], float]]:
+        for indeks, akcja in zip(*np.nonzero(self.zapisane[:self.liczba_stanow])):
+            yield (self.klucze[indeks], divmod(int(akcja), self.rozmiar_planszy)), float(self.wartosci[indeks, akcja])
+
+
+def pozycje_osiagalne(rozmiar_planszy: int = 3, warunek_wygranej: int = 3) -> Iterator[StanGry]:
+    # Każda niekońcowa pozycja osiągalna od pustej planszy (zaczyna X) dokładnie raz. Przeszukiwanie idzie po
+    # surowych bajtach planszy, a wygrana sprawdzana jest tylko na liniach przez ostatni ruch - StanGry
+    # powstaje dopiero dla zwracanej pozycji
+    linie, _, linie_przez_pole = indeks_linii(rozmiar_planszy, warunek_wygranej)
+    linie_pola = [linie[list(ids)] for ids in linie_przez_pole]
+    pusta = np.zeros(rozmiar_planszy * rozmiar_planszy, dtype=np.int8)
+    odwiedzone = {pusta.tobytes()}
+    do_odwiedzenia = [(pusta, 1)]
+    while do_odwiedzenia:
+        plansza, gracz = do_odwiedzenia.pop()
+        stan_gry = StanGry(rozmiar_planszy, warunek_wygranej)
+        stan_gry.plansza = plansza.reshape(rozmiar_planszy, rozmiar_planszy).astype(int)
+        stan_gry.obecny_gracz = gracz
+        yield stan_gry
+        for pole in np.flatnonzero(plansza == 0).tolist():
+            nastepna = plansza.copy()
+            nastepna[pole] = gracz
+            klucz = nastepna.tobytes()
+            if klucz in odwiedzone:
+                continue
+            odwiedzone.add(klucz)
+            if (nastepna[linie_pola[pole]] == gracz).all(axis=1).any() or nastepna.all():
+                continue
+            do_odwiedzenia.append((nastepna, -gracz))
+
+
+def wylicz_klucze_osiagalne(funkcja_klucza: Callable[[np.ndarray, int], tuple], rozmiar_planszy: int = 3,
+                            warunek_wygranej: int = 3) -> set:
+    # Wszystkie niekońcowe pozycje osiągalne od pustej planszy po kanonizacji kluczem agenta
+    return {tuple(int(pole) for pole in funkcja_klucza(stan_gry.plansza, stan_gry.obecny_gracz))
+            for stan_gry in pozycje_osiagalne(rozmiar_planszy, warunek_wygranej)}
+
+
+def _widoki_pamieci(pamiec: shared_memory.SharedMemory, pojemnosc: int,
+                    rozmiar_planszy: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    ksztalt = (pojemnosc, rozmiar_planszy * rozmiar_planszy)
+    rozmiar = ksztalt[0] * ksztalt[1]
+    wartosci = np.ndarray(ksztalt, dtype=np.float32, buffer=pamiec.buf)
+    zapisane = np.ndarray(ksztalt, dtype=bool, buffer=pamiec.buf, offset=4 * rozmiar)
+    klucze = np.ndarray(ksztalt, dtype=np.int8, buffer=pamiec.buf, offset=5 * rozmiar)
+    return wartosci, zapisane, klucze
+
+
+def _dolacz_pamiec(nazwa: str) -> shared_memory.SharedMemory:
+    # Worker nie może rejestrować bloku w resource_trackerze - przy wyjściu usunąłby pamięć należącą do uczącego
+    try:
+        return shared_memory.SharedMemory(name=nazwa, track=False)
+    except TypeError:
+        rejestruj = resource_tracker.register
+        resource_tracker.register = lambda *args, **kwargs: None
+        try:
+            return shared_memory.SharedMemory(name=nazwa)
+        finally:
+            resource_tracker.register = rejestruj
+
+
+class WspoldzielonaTabelaQ:
+    # Strona uczącego: tabela publikowana raz na iterację, workerzy czytają ją przez OpisPamieciQ
+    def __init__(self):
+        self.pamiec: Optional[shared_memory.SharedMemory] = None
+        self.pojemnosc = 0
+        self.rozmiar_planszy = 0
+        self.liczba_stanow = 0
+
+    def opublikuj(self, tabela: GestaTabelaQ) -> OpisPamieciQ:
+        pojemnosc = tabela.wartosci.shape[0]
+        if self.pamiec is None or pojemnosc != self.pojemnosc or tabela.rozmiar_planszy != self.rozmiar_planszy:
+            self.zamknij()
+            rozmiar = max(1, pojemnosc * tabela.liczba_akcji * 6)
+            self.pamiec = shared_memory.SharedMemory(create=True, size=rozmiar)
+            self.pojemnosc = pojemnosc
+            self.rozmiar_planszy = tabela.rozmiar_planszy
+        wartosci, zapisane, klucze = _widoki_pamieci(self.pamiec, self.pojemnosc, self.rozmiar_planszy)
+        wartosci[:] = tabela.wartosci
+        zapisane[:] = tabela.zapisane
+        if tabela.liczba_stanow != self.liczba_stanow:
+            klucze[:tabela.liczba_stanow] = np.array(tabela.klucze, dtype=np.int8).reshape(-1, tabela.liczba_akcji)
+            self.liczba_stanow = tabela.liczba_stanow
+        return OpisPamieciQ(self.pamiec.name, self.pojemnosc, self.liczba_stanow, self.rozmiar_planszy)
+
+    def zamknij(self) -> None:
+        if self.pamiec is not None:
+            self.pamiec.close()
+            self.pamiec.unlink()
+            self.pamiec = None
+            self.liczba_stanow = 0
@@ -0,0 +1,127 @@
+import os
+import random
+from typing import Tuple, Optional, Dict, List
+import numpy as np
+from gra.logika import StanGry
+from ai.minimax import rozwiaz_dokladnie
+from ai.reguly import znajdz_najlepszy_ruch as reguly_najlepszy_ruch
+from ai.mcts import przytnij_tablice
+from ai.symetrie import kanonizuj, ruch_do_kanonicznego, ruch_z_kanonicznego
+from ai.tabela_q import pozycje_osiagalne
+
+RODZAJE_PRZECIWNIKOW = ('minimax', 'reguly')
+folder_tabel = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'q_tables', 'przeciwnicy')
+
+
+class TabelaPrzeciwnika:
+    # Zbiór ruchów deterministycznego przeciwnika dla każdej pozycji, zapisany jako maska bitowa pól (int
+    # Pythona, więc bez limitu rozmiaru planszy). Kluczem są bajty planszy i bajt gracza na ruchu.
+    # Minimax jest równoważny względem symetrii, więc klucz to plansza kanoniczna i maska w jej układzie;
+    # reguły rozstrzygają remisy kolejnością pól, więc są indeksowane surową planszą.
+    # Tabela wypełniana leniwie trzyma najwyżej limit_pozycji wpisów - najstarsze są usuwane.
+    def __init__(self, rodzaj: str, rozmiar_planszy: int = 3, warunek_wygranej: int = 3,
+                 limit_pozycji: int = 1_000_000):
+        if rodzaj not in RODZAJE_PRZECIWNIKOW:
+            raise ValueError(f"Nieznany przeciwnik: {rodzaj}")
+        self.rodzaj = rodzaj
+        self.rozmiar_planszy = rozmiar_planszy
+        self.warunek_wygranej = warunek_wygranej
+        self.symetryczna = rodzaj == 'minimax'
+        self.limit_pozycji = limit_pozycji
+        self.maski: Dict[bytes, int] = {}
+        self.tablica_rozwiazan: Dict = {}
+        self.zmieniona = False
+
+    def _klucz(self, stan_gry: StanGry) -> Tuple[bytes, int]:
+        if self.symetryczna:
+            plansza, transformacja = kanonizuj(stan_gry.plansza)
+        else:
+            plansza, transformacja = stan_gry.plansza.ravel(), 0
+        return np.append(np.asarray(plansza, dtype=np.int8), np.int8(stan_gry.obecny_gracz)).tobytes(), transformacja
+
+    def _policz_ruchy(self, stan_gry: StanGry) -> List[Tuple[int, int]]:
+        if self.rodzaj == 'minimax':
+            przytnij_tablice(self.tablica_rozwiazan, self.limit_pozycji)
+            return rozwiaz_dokladnie(stan_gry, self.tablica_rozwiazan)[1]
+        ruch = reguly_najlepszy_ruch(stan_gry)
+        return [ruch] if ruch else []
+
+    def ruchy(self, stan_gry: StanGry) -> List[Tuple[int, int]]:
+        klucz, transformacja = self._klucz(stan_gry)
+        maska = self.maski.get(klucz)
+        if maska is None:
+            maska = 0
+            for ruch in self._policz_ruchy(stan_gry):
+                if self.symetryczna:
+                    ruch = ruch_do_kanonicznego(ruch, transformacja, self.rozmiar_planszy)
+                maska |= 1 << (ruch[0] * self.rozmiar_planszy + ruch[1])
+            przytnij_tablice(self.maski, self.limit_pozycji)
+            self.maski[klucz] = maska
+            self.zmieniona = True
+        ruchy = [divmod(pole, self.rozmiar_planszy) for pole in range(self.rozmiar_planszy ** 2) if maska >> pole & 1]
+        if self.symetryczna:
+            ruchy = [ruch_z_kanonicznego(ruch, transformacja, self.rozmiar_planszy) for ruch in ruchy]
+        return ruchy
+
+    def wybierz_ruch(self, stan_gry: StanGry, generator: random.Random = random) -> Optional[Tuple[int, int]]:
+        ruchy = self.ruchy(stan_gry)
+        return generator.choice(ruchy) if ruchy else None
+
+    def wypelnij(self) -> None:
+        for stan_gry in pozycje_osiagalne(self.rozmiar_planszy, self.warunek_wygranej):
+            self.ruchy(stan_gry)
+
+    def zapisz(self, sciezka: str) -> None:
+        # Klucze jako wiersze bajtów, maski jako bajty little-endian - oba bez ograniczenia typem int64
+        liczba_pol = self.rozmiar_planszy * self.rozmiar_planszy
+        bajty_maski = (liczba_pol + 7) // 8
+        posortowane = sorted(self.maski)
+        klucze = np.frombuffer(b''.join(posortowane), dtype=np.int8).reshape(-1, liczba_pol + 1)
+        maski = np.frombuffer(b''.join(self.maski[klucz].to_bytes(bajty_maski, 'little') for klucz in posortowane),
+                              dtype=np.uint8).reshape(-1, bajty_maski)
+        os.makedirs(os.path.dirname(sciezka) or '.', exist_ok=True)
+        # Plik tymczasowy per proces - równoległe treningi mogą zapisywać tę samą tabelę jednocześnie
+        sciezka_tymczasowa = f"{sciezka}.{os.getpid()}.tmp.npz"
+        np.savez(sciezka_tymczasowa, klucze=klucze, maski=maski,
+                 parametry=np.array([self.rozmiar_planszy, self.warunek_wygranej]), rodzaj=np.array(self.rodzaj))
+        os.replace(sciezka_tymczasowa, sciezka)
+        self.zmieniona = False
+
+    @classmethod
+    def wczytaj(cls, sciezka: str) -> 'TabelaPrzeciwnika':
+        with np.load(sciezka, allow_pickle=False) as dane:
+            rozmiar_planszy, warunek_wygranej = (int(x) for x in dane['parametry'])
+            tabela = cls(str(dane['rodzaj']), rozmiar_planszy, warunek_wygranej)
+            tabela.maski = {klucz.tobytes(): int.from_bytes(maska.tobytes(), 'little')
+                            for klucz, maska in zip(dane['klucze'], dane['maski'])}
+        return tabela
+
+
+def sciezka_tabeli(rodzaj: str, rozmiar_planszy: int = 3, warunek_wygranej: int = 3) -> str:
+    return os.path.join(folder_tabel, f"{rodzaj}_{rozmiar_planszy}x{rozmiar_planszy}_k{warunek_wygranej}.npz")
+
+
+_tabele: Dict[Tuple[str, int, int], TabelaPrzeciwnika] = {}
+
+
+def tabela_przeciwnika(rodzaj: str, rozmiar_planszy: int = 3, warunek_wygranej: int = 3) -> TabelaPrzeciwnika:
+    # Jedna tabela na proces. Dla 3x3 liczona w całości przy pierwszym użyciu i zapisywana na dysk,
+    # większe plansze wypełniają się leniwie (zapis ręcznie przez zapisz).
+    klucz = (rodzaj, rozmiar_planszy, warunek_wygranej)
+    if klucz not in _tabele:
+        sciezka = sciezka_tabeli(*klucz)
+        if os.path.exists(sciezka):
+            tabela = TabelaPrzeciwnika.wczytaj(sciezka)
+        else:
+            tabela = TabelaPrzeciwnika(*klucz)
+            if rozmiar_planszy == 3:
+                tabela.wypelnij()
+                tabela.zapisz(sciezka)
+        _tabele[klucz] = tabela
+    return _tabele[klucz]
+
+
+if __name__ == "__main__":
+    for rodzaj in RODZAJE_PRZECIWNIKOW:
+        tabela = tabela_przeciwnika(rodzaj)
+        print(f"{rodzaj}: {len(tabela.maski)} pozycji -> {sciezka_tabeli(rodzaj)}")
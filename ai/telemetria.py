@@ -0,0 +1,143 @@
+import os
+import sys
+import json
+import time
+import pickle
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Tuple, Optional
+
+PLIK_TELEMETRII = 'telemetry.jsonl'
+
+
+class Telemetria:
+    # Jeden rekord JSON na linię w telemetry.jsonl obok training.log; plik otwierany na czas zapisu,
+    # więc przerwany trening zostawia wszystkie pełne rekordy.
+    # mierz_serializacje: bajty i czas pickle danych IPC oraz pamięć tabeli-słownika - pomiar kosztuje drugą
+    # serializację w uczącym i przejście po całym słowniku, więc jest opcjonalny
+    def __init__(self, folder: str, dopisz: bool = False, mierz_serializacje: bool = False):
+        self.sciezka = os.path.join(folder, PLIK_TELEMETRII)
+        self.mierz_serializacje = mierz_serializacje
+        if not dopisz:
+            open(self.sciezka, 'w', encoding='utf-8').close()
+
+    def zapisz(self, typ: str, **pola) -> None:
+        rekord = {'type': typ, 'timestamp': datetime.now().isoformat(timespec='milliseconds'), **pola}
+        with open(self.sciezka, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(rekord, ensure_ascii=False, default=float) + '\n')
+
+
+def rozmiar_serializacji(obiekt) -> Tuple[int, float]:
+    # Bajty i czas pickle - tyle samo kosztuje przesłanie obiektu między procesami puli
+    czas_startu = time.perf_counter()
+    bajty = len(pickle.dumps(obiekt, protocol=pickle.HIGHEST_PROTOCOL))
+    return bajty, time.perf_counter() - czas_startu
+
+
+def pamiec_tabeli(tabela_q, przejdz_slownik: bool = True) -> Optional[int]:
+    if hasattr(tabela_q, 'nbytes'):
+        return int(tabela_q.nbytes)
+    if not przejdz_slownik:
+        return None
+    # Słownik: przybliżenie z rozmiarów tablicy haszującej, kluczy i wartości
+    rozmiar = sys.getsizeof(tabela_q)
+    for (klucz, ruch), wartosc in tabela_q.items():
+        rozmiar += sys.getsizeof((klucz, ruch)) + sys.getsizeof(ruch) + sys.getsizeof(wartosc)
+    return rozmiar + sum(sys.getsizeof(klucz) for klucz in {klucz for klucz, _ in tabela_q.keys()})
+
+
+def pomiary_workerow(pomiary: List[Dict]) -> Dict:
+    # Sumy z paczek workerów: czasy na workera (rozrzut) i średnie opóźnienia ruchów
+    czasy = defaultdict(float)
+    for pomiar in pomiary:
+        czasy[pomiar['id_workera']] += pomiar['czas']
+    ruchy_przeciwnika = sum(pomiar['ruchy_przeciwnika'] for pomiar in pomiary)
+    ruchy_agenta = sum(pomiar['ruchy_agenta'] for pomiar in pomiary)
+    czasy_workerow = [czasy[id_workera] for id_workera in sorted(czasy)]
+    return {
+        'worker_times_s': czasy_workerow,
+        'worker_skew_s': max(czasy_workerow) - min(czasy_workerow) if czasy_workerow else 0.0,
+        'opponent_moves': ruchy_przeciwnika,
+        'opponent_move_ms': 1000 * sum(pomiar['czas_przeciwnika'] for pomiar in pomiary) / max(1, ruchy_przeciwnika),
+        'agent_moves': ruchy_agenta,
+        'agent_move_ms': 1000 * sum(pomiar['czas_agenta'] for pomiar in pomiary) / max(1, ruchy_agenta),
+    }
+
+
+def wczytaj(sciezka: str) -> List[Dict]:
+    if os.path.isdir(sciezka):
+        sciezka = os.path.join(sciezka, PLIK_TELEMETRII)
+    with open(sciezka, encoding='utf-8') as f:
+        return [json.loads(linia) for linia in f if linia.strip()]
+
+
+def podsumuj(rekordy: List[Dict]) -> Dict:
+    iteracje = [rekord for rekord in rekordy if rekord['type'] == 'iteration']
+    weryfikacje = [rekord for rekord in rekordy if rekord['type'] == 'verification']
+    starty = [rekord for rekord in rekordy if rekord['type'] == 'pool_start']
+    zbieznosc = [rekord for rekord in rekordy if rekord['type'] == 'convergence']
+
+    czasy = defaultdict(float)
+    for rekord in iteracje:
+        # Czas rozgrywki po stronie workerów to najwolniejszy worker; reszta czasu map to narzut IPC
+        czasy['gra (workery)'] += rekord.get('play_s', 0.0) - rekord.get('ipc_s', 0.0)
+        czasy['IPC i serializacja'] += rekord.get('ipc_s', 0.0)
+        czasy['aktualizacje Q'] += rekord.get('update_s', 0.0)
+        czasy['powtórki'] += rekord.get('replay_s', 0.0)
+        czasy['publikacja tabeli'] += rekord.get('publish_s', 0.0)
+    czasy['weryfikacja'] = sum(rekord['total_s'] for rekord in weryfikacje)
+    czasy['start puli'] = sum(rekord['startup_s'] for rekord in starty)
+
+    przeciwnicy = defaultdict(lambda: [0, 0.0])
+    for rekord in iteracje + weryfikacje:
+        przeciwnicy[rekord['opponent']][0] += rekord['opponent_moves']
+        przeciwnicy[rekord['opponent']][1] += rekord['opponent_moves'] * rekord['opponent_move_ms']
+
+    czas_iteracji = sum(rekord['total_s'] for rekord in iteracje)
+    return {
+        'iteracje': len(iteracje),
+        'gry': sum(rekord['games'] for rekord in iteracje),
+        'przejscia': sum(rekord['transitions'] for rekord in iteracje),
+        'gry_na_s': sum(rekord['games'] for rekord in iteracje) / czas_iteracji if czas_iteracji else 0.0,
+        'przejscia_na_s': sum(rekord['transitions'] for rekord in iteracje) / czas_iteracji if czas_iteracji else 0.0,
+        'czasy': dict(czasy),
+        'sredni_rozrzut_workerow_s': (sum(rekord['worker_skew_s'] for rekord in iteracje) / len(iteracje)
+                                      if iteracje else 0.0),
+        'bajty_ipc': sum(rekord.get('args_bytes', 0) + rekord.get('results_bytes', 0) for rekord in iteracje),
+        'ruch_przeciwnika_ms': {przeciwnik: czas / liczba for przeciwnik, (liczba, czas) in przeciwnicy.items()
+                                if liczba},
+        'rozmiar_tabeli_q': iteracje[-1]['q_table_size'] if iteracje else 0,
+        'pamiec_tabeli_q': iteracje[-1].get('q_table_bytes') if iteracje else None,
+        'fazy_zbiezne': [rekord['phase'] for rekord in zbieznosc if rekord['converged']],
+        'pokrycie': zbieznosc[-1]['pokrycie'] if zbieznosc else None,
+    }
+
+
+def drukuj_podsumowanie(podsumowanie: Dict) -> None:
+    print(f"Iteracje: {podsumowanie['iteracje']} | gry: {podsumowanie['gry']} "
+          f"({podsumowanie['gry_na_s']:.0f}/s) | przejścia: {podsumowanie['przejscia']} "
+          f"({podsumowanie['przejscia_na_s']:.0f}/s)")
+    calosc = sum(podsumowanie['czasy'].values()) or 1.0
+    print("\nGdzie idzie czas:")
+    for nazwa, czas in sorted(podsumowanie['czasy'].items(), key=lambda x: -x[1]):
+        print(f"  {nazwa:<20} {czas:9.1f}s  {100 * czas / calosc:5.1f}%")
+    print(f"\nŚredni rozrzut czasu workerów: {podsumowanie['sredni_rozrzut_workerow_s']:.2f}s")
+    if podsumowanie['bajty_ipc']:
+        print(f"Przesłane przez IPC: {podsumowanie['bajty_ipc'] / 1024 / 1024:.1f} MB")
+    print("Średni czas ruchu przeciwnika:")
+    for przeciwnik, czas in sorted(podsumowanie['ruch_przeciwnika_ms'].items(), key=lambda x: -x[1]):
+        print(f"  {przeciwnik:<14} {czas:8.3f} ms")
+    pamiec = podsumowanie['pamiec_tabeli_q']
+    print(f"Tabela Q: {podsumowanie['rozmiar_tabeli_q']} wpisów"
+          + (f", {pamiec / 1024:.1f} KB" if pamiec is not None else ""))
+    if podsumowanie['fazy_zbiezne']:
+        print(f"Fazy zakończone przez zbieżność: {', '.join(map(str, podsumowanie['fazy_zbiezne']))}")
+    if podsumowanie['pokrycie'] is not None:
+        print(f"Pokrycie stanów: {100 * podsumowanie['pokrycie']:.1f}%")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Użycie: python -m ai.telemetria <folder treningu | telemetry.jsonl>")
+        sys.exit(1)
+    drukuj_podsumowanie(podsumuj(wczytaj(sys.argv[1])))
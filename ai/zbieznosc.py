@@ -0,0 +1,78 @@
+from typing import Dict, List, Optional, NamedTuple
+import numpy as np
+
+
+class MigawkaPolityki(NamedTuple):
+    # Wartości Q (stany x pola) z NaN tam, gdzie nic nie zapisano, oraz maska legalnych akcji
+    klucze: List[tuple]
+    wartosci: np.ndarray
+    legalne: np.ndarray
+
+
+def migawka_z_tabeli(klucze: List[tuple], wartosci: np.ndarray, zapisane: np.ndarray,
+                     legalne: np.ndarray) -> MigawkaPolityki:
+    return MigawkaPolityki(list(klucze), np.where(zapisane, wartosci, np.nan).astype(np.float32), legalne.copy())
+
+
+def _zachlanne_akcje(wartosci: np.ndarray, legalne: np.ndarray) -> np.ndarray:
+    # Brak wpisu liczy się jak 0, tak jak przy wyborze akcji przez agenta
+    return np.where(legalne, np.nan_to_num(wartosci, nan=0.0), -np.inf).argmax(axis=1)
+
+
+def sygnaly_zbieznosci(przed: MigawkaPolityki, po: MigawkaPolityki,
+                       liczba_stanow_osiagalnych: Optional[int] = None) -> Dict[str, Optional[float]]:
+    # Wiersze poprzedniej migawki w kolejności stanów nowej; stan wcześniej nieznany to same NaN
+    indeksy_przed = {klucz: i for i, klucz in enumerate(przed.klucze)}
+    wiersze = np.array([indeksy_przed.get(klucz, -1) for klucz in po.klucze], dtype=np.int64)
+    poprzednie = np.full_like(po.wartosci, np.nan)
+    poprzednie[wiersze >= 0] = przed.wartosci[wiersze[wiersze >= 0]]
+
+    zapisane_po = ~np.isnan(po.wartosci)
+    odwiedzone_po = int(zapisane_po.any(axis=1).sum())
+    odwiedzone_przed = int((~np.isnan(przed.wartosci)).any(axis=1).sum())
+
+    # Zmiana Q na wpisach zapisanych teraz; wpis wcześniej pusty liczy się od 0
+    roznice = np.abs(np.nan_to_num(po.wartosci, nan=0.0) - np.nan_to_num(poprzednie, nan=0.0))[zapisane_po]
+    # Zmiana polityki tylko w stanach znanych już wcześniej - nowe stany mierzy przyrost pokrycia
+    znane = (~np.isnan(poprzednie)).any(axis=1)
+    zmienione = (_zachlanne_akcje(po.wartosci[znane], po.legalne[znane])
+                 != _zachlanne_akcje(poprzednie[znane], po.legalne[znane]))
+
+    pokrycie = przyrost_pokrycia = None
+    if liczba_stanow_osiagalnych:
+        pokrycie = odwiedzone_po / liczba_stanow_osiagalnych
+        przyrost_pokrycia = (odwiedzone_po - odwiedzone_przed) / liczba_stanow_osiagalnych
+    return {
+        'maks_delta_q': float(roznice.max()) if len(roznice) else 0.0,
+        'srednia_delta_q': float(roznice.mean()) if len(roznice) else 0.0,
+        'zmiana_polityki': float(zmienione.mean()) if len(zmienione) else 0.0,
+        'pokrycie': pokrycie,
+        'przyrost_pokrycia': przyrost_pokrycia,
+    }
+
+
+class KryteriumZbieznosci:
+    # Faza kończy się, gdy przez `cierpliwosc` kolejnych iteracji średnia zmiana Q, odsetek stanów ze zmienioną
+    # akcją zachłanną i przyrost pokrycia są poniżej progów. Maksymalna zmiana Q jest tylko raportowana:
+    # przy losowych przeciwnikach pojedyncze wpisy skaczą do końca treningu.
+    def __init__(self, prog_delta_q: float = 0.005, prog_zmiany_polityki: float = 0.01,
+                 prog_przyrostu_pokrycia: float = 0.002, cierpliwosc: int = 3, minimum_iteracji: int = 5):
+        self.prog_delta_q = prog_delta_q
+        self.prog_zmiany_polityki = prog_zmiany_polityki
+        self.prog_przyrostu_pokrycia = prog_przyrostu_pokrycia
+        self.cierpliwosc = cierpliwosc
+        self.minimum_iteracji = minimum_iteracji
+        self.resetuj()
+
+    def resetuj(self) -> None:
+        self.iteracje = 0
+        self.stabilne = 0
+
+    def aktualizuj(self, sygnaly: Dict[str, Optional[float]]) -> bool:
+        self.iteracje += 1
+        stabilna = (sygnaly['srednia_delta_q'] <= self.prog_delta_q
+                    and sygnaly['zmiana_polityki'] <= self.prog_zmiany_polityki
+                    and (sygnaly['przyrost_pokrycia'] is None
+                         or sygnaly['przyrost_pokrycia'] <= self.prog_przyrostu_pokrycia))
+        self.stabilne = self.stabilne + 1 if stabilna else 0
+        return self.iteracje >= self.minimum_iteracji and self.stabilne >= self.cierpliwosc
@@ -0,0 +1,133 @@
+import random
+from functools import lru_cache
+from typing import Tuple, Optional, List
+import numpy as np
+
+KIERUNKI = [(0, 1), (1, 0), (1, 1), (1, -1)]
+
+
+@lru_cache(maxsize=None)
+def indeks_linii(rozmiar_planszy: int, warunek_wygranej: int) -> Tuple[np.ndarray, Tuple[Tuple[int, ...], ...],
+                                                                     Tuple[Tuple[int, ...], ...]]:
+    # Każda linia to okno długości warunku wygranej; pola numerowane jako rzad * rozmiar + kolumna
+    linie = []
+    for rzad in range(rozmiar_planszy):
+        for kolumna in range(rozmiar_planszy):
+            for delta_rzad, delta_kolumna in KIERUNKI:
+                koniec_rzad = rzad + delta_rzad * (warunek_wygranej - 1)
+                koniec_kolumna = kolumna + delta_kolumna * (warunek_wygranej - 1)
+                if not (0 <= koniec_rzad < rozmiar_planszy and 0 <= koniec_kolumna < rozmiar_planszy):
+                    continue
+                linie.append([(rzad + delta_rzad * i) * rozmiar_planszy + kolumna + delta_kolumna * i
+                              for i in range(warunek_wygranej)])
+    linie = np.array(linie, dtype=np.int64).reshape(-1, warunek_wygranej)
+    linie.setflags(write=False)
+
+    pola_linii = tuple(tuple(pola) for pola in linie.tolist())
+    linie_przez_pole = [[] for _ in range(rozmiar_planszy * rozmiar_planszy)]
+    for id_linii, pola in enumerate(pola_linii):
+        for pole in pola:
+            linie_przez_pole[pole].append(id_linii)
+    return linie, pola_linii, tuple(tuple(ids) for ids in linie_przez_pole)
+
+
+@lru_cache(maxsize=None)
+def wagi_pozycyjne(rozmiar_planszy: int, warunek_wygranej: int) -> Tuple[int, ...]:
+    # Liczba linii przez pole minus jeden; dla 3x3 daje klasyczne środek 3, róg 2, krawędź 1
+    _, _, linie_przez_pole = indeks_linii(rozmiar_planszy, warunek_wygranej)
+    return tuple(max(1, len(ids) - 1) for ids in linie_przez_pole)
+
+
+def pole_wygranej_lub_bloku(plansza: np.ndarray, gracz: int, warunek_wygranej: int) -> Optional[int]:
+    # Jedno przejście po indeksie linii bez kopiowania planszy: linia z jednym pustym polem i resztą pionów
+    # jednego gracza daje temu graczowi wygraną. Najpierw własna wygrana, potem blok; przy kilku polach
+    # wybierane jest najmniejsze (pierwsze w kolejności rzędami).
+    linie, _, _ = indeks_linii(plansza.shape[0], warunek_wygranej)
+    wartosci = plansza.ravel()[linie]
+    puste = wartosci == 0
+    sumy = wartosci.sum(axis=1)
+    jedno_puste = puste.sum(axis=1) == 1
+    for strona in (gracz, -gracz):
+        gorace = np.flatnonzero(jedno_puste & (sumy == strona * (warunek_wygranej - 1)))
+        if len(gorace):
+            return int(linie[gorace, puste[gorace].argmax(axis=1)].min())
+    return None
+
+
+class LicznikiLinii:
+    def __init__(self, plansza: np.ndarray, warunek_wygranej: int):
+        self.rozmiar_planszy = plansza.shape[0]
+        self.warunek_wygranej = warunek_wygranej
+        self.linie, self.pola_linii, self.linie_przez_pole = indeks_linii(self.rozmiar_planszy, warunek_wygranej)
+        self.wagi = wagi_pozycyjne(self.rozmiar_planszy, warunek_wygranej)
+        self.maks_waga = max(self.wagi)
+
+        plaska = plansza.ravel()
+        self.pola: List[int] = plaska.tolist()
+        wartosci_linii = plaska[self.linie]
+        self.liczniki = {1: (wartosci_linii == 1).sum(axis=1).tolist(),
+                         -1: (wartosci_linii == -1).sum(axis=1).tolist()}
+        # Linie, w których graczowi brakuje jednego pola do wygranej, a przeciwnik ich nie blokuje
+        self.gorace = {gracz: {i for i, (wlasne, obce) in enumerate(zip(self.liczniki[gracz], self.liczniki[-gracz]))
+                               if wlasne == warunek_wygranej - 1 and obce == 0}
+                       for gracz in (1, -1)}
+        self.zwyciezca: Optional[int] = None
+        for gracz in (1, -1):
+            if warunek_wygranej in self.liczniki[gracz]:
+                self.zwyciezca = gracz
+
+        self.puste: List[int] = [pole for pole, wartosc in enumerate(self.pola) if wartosc == 0]
+        self.pozycje_pustych = {pole: i for i, pole in enumerate(self.puste)}
+
+    def wykonaj_ruch(self, pole: int, gracz: int) -> None:
+        self.pola[pole] = gracz
+        ostatni = self.puste.pop()
+        if ostatni != pole:
+            indeks = self.pozycje_pustych[pole]
+            self.puste[indeks] = ostatni
+            self.pozycje_pustych[ostatni] = indeks
+        del self.pozycje_pustych[pole]
+
+        wlasne, obce = self.liczniki[gracz], self.liczniki[-gracz]
+        gorace_wlasne, gorace_obce = self.gorace[gracz], self.gorace[-gracz]
+        for id_linii in self.linie_przez_pole[pole]:
+            wlasne[id_linii] += 1
+            gorace_obce.discard(id_linii)
+            if wlasne[id_linii] == self.warunek_wygranej:
+                self.zwyciezca = gracz
+            if obce[id_linii] == 0 and wlasne[id_linii] == self.warunek_wygranej - 1:
+                gorace_wlasne.add(id_linii)
+            else:
+                gorace_wlasne.discard(id_linii)
+
+    def cofnij_ruch(self, pole: int, gracz: int) -> None:
+        self.pola[pole] = 0
+        self.pozycje_pustych[pole] = len(self.puste)
+        self.puste.append(pole)
+        # Przeszukiwanie nigdy nie kontynuuje zakończonej partii, więc cofnięcie usuwa jedyną wygraną
+        self.zwyciezca = None
+
+        wlasne, obce = self.liczniki[gracz], self.liczniki[-gracz]
+        gorace_wlasne, gorace_obce = self.gorace[gracz], self.gorace[-gracz]
+        for id_linii in self.linie_przez_pole[pole]:
+            wlasne[id_linii] -= 1
+            if obce[id_linii] == 0 and wlasne[id_linii] == self.warunek_wygranej - 1:
+                gorace_wlasne.add(id_linii)
+            else:
+                gorace_wlasne.discard(id_linii)
+            if wlasne[id_linii] == 0 and obce[id_linii] == self.warunek_wygranej - 1:
+                gorace_obce.add(id_linii)
+
+    def ruch_wygrywajacy(self, gracz: int) -> Optional[int]:
+        for id_linii in self.gorace[gracz]:
+            for pole in self.pola_linii[id_linii]:
+                if self.pola[pole] == 0:
+                    return pole
+        return None
+
+    def losowe_pole_wazone(self, generator: random.Random = random) -> int:
+        # Losowanie z odrzuceniem: oczekiwany koszt zależy od stosunku wag, a nie od liczby pustych pól
+        while True:
+            pole = generator.choice(self.puste)
+            if generator.random() * self.maks_waga < self.wagi[pole]:
+                return pole
@@ -1,4 +1,5 @@
 
+import os
 import sys
 import random
 import numpy as np
@@ -43,7 +44,11 @@ class KontrolerKolkoKrzyzyk:
         
         self.agent = AgentQLearning()
         try:
-            self.agent.zaladuj_tabele_q('ai/gotowe_tabele/model.pkl')
+            # Binarny model otwiera się bez pickle i czyta z dysku tylko odpytywane stany
+            if os.path.exists('ai/gotowe_tabele/model.qtab'):
+                self.agent.zaladuj_tabele_q('ai/gotowe_tabele/model.qtab')
+            else:
+                self.agent.zaladuj_tabele_q('ai/gotowe_tabele/model.pkl')
         except Exception as e:
             print(f"⚠️  Nie znaleziono modelu: {e}")
         algorytmy = ["Minimax", "Reguły", "Q-learning", "MCTS"]
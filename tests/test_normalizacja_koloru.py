@@ -0,0 +1,40 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')))
+
+from ai.agent_q_learning import AgentQLearning, graj_partie_batch
+
+
+def graj_sam_ze_soba(agent: AgentQLearning, liczba_gier: int = 300) -> list:
+    # Losowe ruchy z tym samym ziarnem - każdy agent rozgrywa dokładnie te same partie
+    _, przejscia, _ = graj_partie_batch((agent.ladunek_dla_workerow(None), 'self', 1.0, liczba_gier, 0, False, False,
+                                         agent.konfiguracja(), (0, 0)))
+    return przejscia
+
+
+def test_klucze_z_perspektywy_gracza_na_ruchu():
+    agent = AgentQLearning(rownowaznosc_symetrii=True, normalizacja_koloru=True)
+    przejscia = graj_sam_ze_soba(agent)
+    klucze = [klucz for klucz, _, _, _, _ in przejscia] + [nastepny for _, _, _, nastepny, _ in przejscia]
+    # Gracz na ruchu (1 w kluczu) ma tyle samo znaków co przeciwnik albo o jeden mniej, także gdy rusza się O
+    assert {sum(klucz) for klucz in klucze} == {0, -1}
+
+
+def test_zamiana_kolorow_daje_ten_sam_klucz():
+    agent = AgentQLearning(rownowaznosc_symetrii=True, normalizacja_koloru=True)
+    plansza = np.array([[1, 0, 0], [0, -1, 0], [0, 0, 1]])
+    assert agent.pobierz_klucz_stanu(plansza, -1) == agent.pobierz_klucz_stanu(-plansza, 1)
+    bez_normalizacji = AgentQLearning(rownowaznosc_symetrii=True)
+    assert bez_normalizacji.pobierz_klucz_stanu(plansza, -1) != bez_normalizacji.pobierz_klucz_stanu(-plansza, 1)
+
+
+def test_tabela_mniejsza_w_grze_z_samym_soba():
+    tabele = {}
+    for nazwa, parametry in {'surowa': {}, 'kanoniczna': {'rownowaznosc_symetrii': True, 'normalizacja_koloru': True}}.items():
+        agent = AgentQLearning(**parametry)
+        agent.aktualizuj_paczki([graj_sam_ze_soba(agent)])
+        tabele[nazwa] = len(agent.tabela_q)
+    assert tabele['kanoniczna'] < tabele['surowa']